@@ -0,0 +1,149 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from quote_series import QuoteSeries
+
+# liczba sesji w roku – do annualizacji zmienności, Sharpe i Sortino
+TRADING_DAYS = 252
+
+
+def align_closes(
+    series: Dict[str, QuoteSeries],
+) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Wyrównuje ceny zamknięcia wielu instrumentów do wspólnej osi dat.
+
+    Zwraca (daty, symbole, macierz T x N), gdzie brak notowania danego
+    dnia to NaN.
+    """
+    symbols = list(series)
+    if not symbols:
+        return np.empty(0, dtype="datetime64[D]"), [], np.empty((0, 0))
+
+    dates = np.unique(np.concatenate([s.dates for s in series.values()]))
+    closes = np.full((len(dates), len(symbols)), np.nan)
+    for col, symbol in enumerate(symbols):
+        s = series[symbol]
+        closes[np.searchsorted(dates, s.dates), col] = s.close
+    return dates, symbols, closes
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """Uzupełnia NaN ostatnią znaną wartością w kolumnie (NaN przed pierwszą)."""
+    rows = np.arange(values.shape[0])[:, None]
+    last_valid = np.where(~np.isnan(values), rows, 0)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    # przed pierwszym notowaniem indeks 0 wskazuje na NaN, więc NaN zostaje
+    return values[last_valid, np.arange(values.shape[1])]
+
+
+def daily_returns(closes: np.ndarray) -> np.ndarray:
+    """
+    Stopy zwrotu między kolejnymi notowaniami każdego instrumentu (T x N).
+    Dni bez notowania (NaN) nie tworzą zerowych zwrotów – zwrot liczony jest
+    od poprzedniego istniejącego notowania.
+    """
+    returns = np.full(closes.shape, np.nan)
+    if closes.shape[0] < 2:
+        return returns
+
+    previous = _forward_fill(closes)[:-1]
+    current = closes[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[1:] = np.where(previous > 0, current / previous - 1.0, np.nan)
+    return returns
+
+
+def max_drawdown(closes: np.ndarray) -> np.ndarray:
+    """Maksymalny spadek od szczytu (ułamek <= 0) dla każdej kolumny."""
+    peaks = np.fmax.accumulate(closes, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = closes / peaks - 1.0
+    drawdowns[np.isnan(drawdowns)] = 0.0
+    return drawdowns.min(axis=0, initial=0.0)
+
+
+def compute_metrics(
+    dates: np.ndarray,
+    closes: np.ndarray,
+    benchmark_col: Optional[int] = None,
+    risk_free_rate: float = 0.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Metryki dla wszystkich kolumn macierzy cen (T x N, T >= 1) naraz.
+
+    Każda wartość w wyniku to tablica długości N; NaN oznacza metrykę
+    nieokreśloną (np. Sharpe przy zerowej zmienności, beta bez benchmarku).
+    `risk_free_rate` to roczna stopa wolna od ryzyka (np. 0.04).
+    """
+    n_rows, n_cols = closes.shape
+    valid = ~np.isnan(closes)
+    counts = valid.sum(axis=0)
+    cols = np.arange(n_cols)
+
+    first_idx = np.argmax(valid, axis=0)
+    last_idx = n_rows - 1 - np.argmax(valid[::-1], axis=0)
+    first = closes[first_idx, cols]
+    last = closes[last_idx, cols]
+    enough = counts >= 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_return = np.where(enough, last / first - 1.0, 0.0)
+
+        years = (dates[last_idx] - dates[first_idx]).astype(float) / 365.25
+        cagr = np.where(
+            enough & (years > 0) & (first > 0),
+            np.power(last / first, 1.0 / years) - 1.0,
+            np.nan,
+        )
+
+    returns = daily_returns(closes)
+    r_valid = ~np.isnan(returns)
+    r_counts = r_valid.sum(axis=0)
+    r_zeroed = np.where(r_valid, returns, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = r_zeroed.sum(axis=0) / r_counts
+        deviations = np.where(r_valid, returns - mean, 0.0)
+        std = np.sqrt((deviations ** 2).sum(axis=0) / r_counts)
+        std = np.where(r_counts >= 2, std, 0.0)
+
+        excess = mean - risk_free_rate / TRADING_DAYS
+        downside = np.where(r_valid, np.minimum(returns - risk_free_rate / TRADING_DAYS, 0.0), 0.0)
+        downside_dev = np.sqrt((downside ** 2).sum(axis=0) / r_counts)
+
+        sharpe = np.where(std > 0, excess / std * np.sqrt(TRADING_DAYS), np.nan)
+        sortino = np.where(downside_dev > 0, excess / downside_dev * np.sqrt(TRADING_DAYS), np.nan)
+
+        beta = np.full(n_cols, np.nan)
+        if benchmark_col is not None:
+            bench = returns[:, benchmark_col][:, None]
+            both = r_valid & ~np.isnan(bench)
+            n_both = both.sum(axis=0)
+            r_i = np.where(both, returns, 0.0)
+            r_b = np.where(both, bench, 0.0)
+            mean_i = r_i.sum(axis=0) / n_both
+            mean_b = r_b.sum(axis=0) / n_both
+            cov = np.where(both, (returns - mean_i) * (bench - mean_b), 0.0).sum(axis=0) / n_both
+            var_b = np.where(both, (bench - mean_b) ** 2, 0.0).sum(axis=0) / n_both
+            beta = np.where((n_both >= 2) & (var_b > 0), cov / var_b, np.nan)
+
+    return {
+        "return_pct": total_return * 100.0,
+        "volatility_pct": std * 100.0,
+        "annualized_volatility_pct": std * np.sqrt(TRADING_DAYS) * 100.0,
+        "max_drawdown_pct": np.where(enough, max_drawdown(closes), 0.0) * 100.0,
+        "cagr_pct": cagr * 100.0,
+        "sharpe_ratio": sharpe,
+        "sortino_ratio": sortino,
+        "beta": beta,
+    }
+
+
+def column_metrics(metrics: Dict[str, np.ndarray], col: int) -> Dict[str, Optional[float]]:
+    """Metryki jednej kolumny jako floaty (NaN -> None, gotowe do JSON)."""
+    return {
+        name: None if np.isnan(values[col]) else float(values[col])
+        for name, values in metrics.items()
+    }
@@ -0,0 +1,498 @@
+import asyncio
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from cache import get_generation
+from db import SessionLocal
+from log_storage import LogStorage
+from log_writer import log_writer
+from models import (
+    Alert,
+    HistoricalQuote,
+    IntradayBar,
+    LogEntry,
+    Portfolio,
+    Position,
+    QuoteRollup,
+)
+from quote_series import QuoteSeries, is_intraday
+from services import (
+    AlertService,
+    ExportService,
+    LogService,
+    MarketDataService,
+    PortfolioService,
+)
+
+T = TypeVar("T")
+
+# =========================
+# Blokujące zadania (yfinance)
+# =========================
+
+# Osobna pula na pobieranie z Yahoo i zapis wyników – wolne wywołania
+# yfinance nie blokują pętli zdarzeń ani domyślnej puli wątków Starlette.
+UPSTREAM_WORKERS = 16
+
+_upstream_executor = ThreadPoolExecutor(
+    max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream"
+)
+
+# zadania w puli pracują na zwykłej (synchronicznej) sesji
+_upstream_session_factory: sessionmaker = SessionLocal
+
+
+def configure_upstream_sessions(factory: sessionmaker) -> None:
+    """Podmienia fabrykę sesji dla zadań w puli (np. SQLite w testach)."""
+    global _upstream_session_factory
+    _upstream_session_factory = factory
+
+
+async def run_upstream(fn: Callable[[Session], T]) -> T:
+    """
+    Wykonuje fn(sesja) w puli upstream, na własnej synchronicznej sesji
+    zamykanej po zadaniu. Zwrócone obiekty ORM są odłączone od sesji
+    (expire_on_commit=False, więc ich atrybuty zostają wczytane).
+    """
+
+    def job() -> T:
+        db = _upstream_session_factory(expire_on_commit=False)
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_upstream_executor, job)
+
+
+# =========================
+# MARKET DATA
+# =========================
+
+class AsyncMarketDataService:
+    """
+    Asynchroniczny odpowiednik MarketDataService. Luki w pokryciu i odczyty
+    z bazy liczone są na AsyncSession (run_sync na tej samej logice co
+    wersja synchroniczna); do puli upstream trafiają tylko faktyczne
+    pobrania z Yahoo i ich zapis. Redis, dekodowanie szeregów i pliki
+    magazynu idą do domyślnej puli wątków – nie blokują pętli zdarzeń.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def ensure_history(
+        self,
+        symbol: str,
+        start: date,
+        end: date,
+        interval: str = "1d",
+    ) -> int:
+        """Dociąga brakujące luki [start, end] i zwraca id instrumentu."""
+
+        def plan(s: Session) -> Tuple[int, List[Tuple[date, date]]]:
+            result = MarketDataService(s).plan_history(symbol, start, end, interval)
+            s.commit()  # nie trzymamy transakcji w czasie pobierania z Yahoo
+            return result
+
+        instrument_id, gaps = await self.db.run_sync(plan)
+        if gaps:
+            await run_upstream(
+                lambda s: MarketDataService(s).ingest_history(
+                    instrument_id, symbol, gaps, start, end, interval
+                )
+            )
+        return instrument_id
+
+    async def _plan_histories(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date,
+        interval: str,
+    ) -> Dict[str, Tuple[int, List[Tuple[date, date]]]]:
+        def plan(s: Session) -> Dict[str, Tuple[int, List[Tuple[date, date]]]]:
+            result = MarketDataService(s).plan_histories(symbols, start, end, interval)
+            s.commit()
+            return result
+
+        return await self.db.run_sync(plan)
+
+    async def fetch_and_store_intraday(
+        self,
+        symbol: str,
+        start: date,
+        end: date,
+        interval: str = "5m",
+    ) -> List[IntradayBar]:
+        if not is_intraday(interval):
+            raise ValueError(f"Not an intraday interval: {interval}")
+        instrument_id = await self.ensure_history(symbol, start, end, interval)
+        return await self.db.run_sync(
+            lambda s: MarketDataService(s)._query_intraday(instrument_id, interval, start, end)
+        )
+
+    async def ensure_history_batch(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date,
+        interval: str = "1d",
+    ) -> None:
+        """Jak ensure_history dla wielu symboli (grupowe zapytania do Yahoo)."""
+        plans = await self._plan_histories(symbols, start, end, interval)
+        if any(gaps for _, gaps in plans.values()):
+            await run_upstream(
+                lambda s: MarketDataService(s).ingest_history_batch(symbols, plans, interval)
+            )
+
+    async def fetch_and_store_history_batch(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date,
+    ) -> Dict[str, List[Dict]]:
+        await self.ensure_history_batch(symbols, start, end)
+        return {symbol: await self.get_history_from_db(symbol, start, end) for symbol in symbols}
+
+    async def fetch_series_concurrent(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date,
+        interval: str = "1d",
+    ) -> Tuple[Dict[str, QuoteSeries], Dict[str, str]]:
+        """
+        Brakujące dane wielu symboli pobierane równolegle (ingest_concurrent),
+        zwracane jako kolumny wycięte z pełnych szeregów – z magazynu szeregów
+        albo cache, bez obiektów ORM (np. /api/compare). Zwraca (szeregi,
+        błędy per symbol).
+        """
+        plans = await self._plan_histories(symbols, start, end, interval)
+        errors: Dict[str, str] = {}
+        if any(gaps for _, gaps in plans.values()):
+            errors = await run_upstream(
+                lambda s: MarketDataService(s).ingest_concurrent(symbols, plans, interval)
+            )
+
+        series = {}
+        for symbol, (instrument_id, _) in plans.items():
+            if symbol in errors:
+                continue
+            if is_intraday(interval):
+                series[symbol] = await self.db.run_sync(
+                    lambda s, instrument_id=instrument_id: MarketDataService(s)._load_intraday_series(
+                        instrument_id, interval, start, end
+                    )
+                )
+                continue
+            full = await self._get_series(symbol)
+            series[symbol] = full.slice(start, end) if full is not None else QuoteSeries.empty()
+        return series, errors
+
+    async def refresh_recent_history(
+        self,
+        symbol: str,
+        days: int = 5,
+        interval: str = "1d",
+    ) -> None:
+        today = date.today()
+        await self.ensure_history(symbol, today - timedelta(days=days), today, interval)
+
+    async def _get_series(self, symbol: str, load: bool = True) -> Optional[QuoteSeries]:
+        """Jak MarketDataService._get_series: cache/magazyn w wątku, baza przez run_sync."""
+
+        def cached() -> Tuple[int, Optional[QuoteSeries]]:
+            # generacja przed odczytem z bazy – ingest w międzyczasie ją podbije
+            generation = get_generation(MarketDataService._cache_namespace(symbol))
+            return generation, MarketDataService.cached_series(symbol, generation)
+
+        generation, series = await asyncio.to_thread(cached)
+        if series is not None or not load:
+            return series
+
+        series = await self.db.run_sync(lambda s: MarketDataService(s).series_from_db(symbol))
+        if series is not None:
+            await asyncio.to_thread(MarketDataService.remember_series, symbol, generation, series)
+        return series
+
+    async def get_history_from_db(
+        self,
+        symbol: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[Dict]:
+        series = await self._get_series(symbol)
+        if series is None:
+            return []
+        return await asyncio.to_thread(lambda: series.slice(start, end).to_records())
+
+    async def get_history_rollup(
+        self,
+        symbol: str,
+        resolution: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[QuoteRollup]:
+        return await self.db.run_sync(
+            lambda s: MarketDataService(s).get_history_rollup(
+                symbol=symbol, resolution=resolution, start=start, end=end
+            )
+        )
+
+    async def get_latest_quote(self, symbol: str) -> Optional[HistoricalQuote]:
+        # ogon szeregu, jeśli jest już w cache – bez bazy
+        series = await self._get_series(symbol, load=False)
+        if series is not None and len(series):
+            return HistoricalQuote(**series.tail().to_records()[0])
+        return await self.db.run_sync(lambda s: MarketDataService(s).latest_quote_from_db(symbol))
+
+
+# =========================
+# EXPORT (UC3)
+# =========================
+
+class AsyncExportService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def iter_history_csv(
+        self,
+        symbol: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> AsyncIterator[str]:
+        """
+        CSV historii kawałkami po EXPORT_BATCH_SIZE wierszy z kursora po
+        stronie serwera – pamięć nie zależy od długości historii. Nie pobiera
+        z Yahoo – to robi wcześniej AsyncMarketDataService.ensure_history.
+        """
+        yield ExportService.history_csv_chunk([ExportService.HISTORY_CSV_HEADER])
+
+        stmt = ExportService.history_rows_query(symbol, start, end).execution_options(
+            yield_per=ExportService.EXPORT_BATCH_SIZE
+        )
+        result = await self.db.stream(stmt)
+        try:
+            async for rows in result.partitions():
+                yield ExportService.history_csv_chunk(ExportService.history_csv_rows(rows))
+        finally:
+            await result.close()
+
+
+    async def iter_history_columnar(
+        self,
+        symbols: List[str],
+        file_format: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Notowania wielu symboli jako jeden plik Parquet / Arrow IPC
+        (columnar_export.ColumnarWriter), kawałkami z kursora. Dane muszą
+        już być w bazie.
+        """
+        from columnar_export import ColumnarWriter
+
+        writer = ColumnarWriter(file_format, symbols)
+        stmt = ExportService.bundle_rows_query(symbols, start, end).execution_options(
+            yield_per=ExportService.EXPORT_BATCH_SIZE
+        )
+        result = await self.db.stream(stmt)
+        try:
+            async for rows in result.partitions():
+                data = writer.write_rows(rows)
+                if data:
+                    yield data
+        finally:
+            await result.close()
+        yield writer.close()
+
+
+async def gzip_chunks_async(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Kompresuje strumień tekstu do formatu gzip w locie."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> nagłówek gzip
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# =========================
+# PORTFOLIO (UC3)
+# =========================
+
+class AsyncPortfolioService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_or_create_default_portfolio(self) -> Portfolio:
+        return await self.db.run_sync(lambda s: PortfolioService(s).get_or_create_default_portfolio())
+
+    async def add_or_update_position(
+        self,
+        portfolio_id: int,
+        symbol: str,
+        quantity: float,
+        avg_open_price: float,
+    ) -> Position:
+        return await self.db.run_sync(
+            lambda s: PortfolioService(s).add_or_update_position(
+                portfolio_id=portfolio_id,
+                symbol=symbol,
+                quantity=quantity,
+                avg_open_price=avg_open_price,
+            )
+        )
+
+    async def get_portfolio_summary(self, portfolio_id: int) -> Dict:
+        return await self.db.run_sync(lambda s: PortfolioService(s).get_portfolio_summary(portfolio_id))
+
+
+# =========================
+# ALERTS (UC4)
+# =========================
+
+class AsyncAlertService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def list_alerts(self) -> list[Alert]:
+        return await self.db.run_sync(lambda s: AlertService(s).list_alerts())
+
+    async def create_alert(self, symbol: str, condition: str, threshold_price: float) -> Alert:
+        return await self.db.run_sync(
+            lambda s: AlertService(s).create_alert(
+                symbol=symbol, condition=condition, threshold_price=threshold_price
+            )
+        )
+
+    async def toggle_alert(self, alert_id: int) -> Alert:
+        return await self.db.run_sync(lambda s: AlertService(s).toggle_alert(alert_id))
+
+    async def delete_alert(self, alert_id: int) -> None:
+        await self.db.run_sync(lambda s: AlertService(s).delete_alert(alert_id))
+
+    async def check_alerts(self) -> list[Alert]:
+        # może pytać Yahoo o ceny – w puli upstream
+        return await run_upstream(lambda s: AlertService(s).check_alerts())
+
+
+# =========================
+# LOGI (UC6)
+# =========================
+
+class AsyncLogService:
+    EXPORT_BATCH_SIZE = 1000
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def add_log(
+        self,
+        message: str,
+        level: str = "INFO",
+        source: Optional[str] = None,
+        user_email: Optional[str] = None,
+        details: Optional[str] = None,
+    ) -> LogEntry:
+        # bez bazy – tylko kolejka LogWritera (LogService.add_log)
+        return LogService(self.db).add_log(
+            message=message,
+            level=level,
+            source=source,
+            user_email=user_email,
+            details=details,
+        )
+
+    async def log_stats(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        bucket: str = "hour",
+    ) -> List[Dict]:
+        await self.flush()
+        return await self.db.run_sync(
+            lambda s: LogService(s).log_stats(
+                date_from=date_from,
+                date_to=date_to,
+                level=level,
+                source=source,
+                bucket=bucket,
+                flush=False,
+            )
+        )
+
+    async def clear_logs(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> Dict:
+        # najpierw zapis zaległych wpisów z kolejki, żeby nie wróciły po resecie
+        await self.flush()
+        return await self.db.run_sync(
+            lambda s: LogStorage(s).clear(date_from=date_from, date_to=date_to)
+        )
+
+    async def flush(self) -> None:
+        """Czeka na zapis kolejki logów – poza pętlą zdarzeń."""
+        await asyncio.to_thread(log_writer.flush)
+
+    async def list_logs_page(
+        self,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> Tuple[List[LogEntry], Optional[str]]:
+        await self.flush()
+        return await self.db.run_sync(
+            lambda s: LogService(s).list_logs_page(
+                level=level,
+                source=source,
+                date_from=date_from,
+                date_to=date_to,
+                flush=False,
+                limit=limit,
+                cursor=cursor,
+                search=search,
+            )
+        )
+
+    async def stream_logs(
+        self,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        search: Optional[str] = None,
+    ) -> AsyncIterator[List[LogEntry]]:
+        """
+        Wszystkie pasujące logi paczkami po EXPORT_BATCH_SIZE, z kursora po
+        stronie serwera – pamięć nie rośnie z liczbą wierszy.
+        """
+        await self.flush()
+        stmt = LogService.logs_query(
+            level=level, source=source, date_from=date_from, date_to=date_to, search=search
+        ).execution_options(yield_per=self.EXPORT_BATCH_SIZE)
+
+        result = await self.db.stream_scalars(stmt)
+        try:
+            async for batch in result.partitions():
+                yield batch
+                # wysłane wpisy nie są już potrzebne w sesji
+                self.db.expunge_all()
+        finally:
+            await result.close()
@@ -1,27 +1,386 @@
-import redis
 import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable
+
+import redis
+
+# Adres Redisa (w Dockerze) – pusty REDIS_URL wyłącza warstwę Redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# prefiks naszych kluczy w Redisie – clear_cache usuwa tylko je
+KEY_PREFIX = "market:"
+
+# liczniki generacji (patrz get_generation) – nie są czyszczone przez clear_cache,
+# żeby po czyszczeniu nie wróciły stare numery
+GENERATION_PREFIX = "gen:"
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Cache LRU z TTL w pamięci procesu (ograniczona liczba wpisów).
+    Wartości nie są kopiowane – traktujemy je jako niezmienne.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl_seconds: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """
+    Warstwa Redis (JSON). Gdy Redis jest niedostępny, warstwa wyłącza się
+    na `retry_after` sekund zamiast spowalniać każde zapytanie.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        retry_after: float = 30.0,
+        binary_client: redis.Redis | None = None,
+    ):
+        self.client = client
+        # klient bez decode_responses – dla wartości binarnych (get_bytes/set_bytes)
+        self.binary_client = binary_client or client
+        self.retry_after = retry_after
+        self._down_until = 0.0
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self) -> None:
+        self._down_until = time.monotonic() + self.retry_after
+
+    def get(self, key: str):
+        """Zwraca (wartość, pozostały TTL w sekundach) albo (_MISSING, 0)."""
+        if not self._available():
+            return _MISSING, 0
+        try:
+            pipe = self.client.pipeline()
+            pipe.get(KEY_PREFIX + key)
+            pipe.pttl(KEY_PREFIX + key)
+            value, ttl_ms = pipe.execute()
+        except redis.RedisError:
+            self._mark_down()
+            return _MISSING, 0
+        if value is None:
+            return _MISSING, 0
+        return json.loads(value), max(ttl_ms, 0) / 1000.0
+
+    def set(self, key: str, value, ttl_seconds: float) -> None:
+        if not self._available():
+            return
+        try:
+            self.client.set(
+                KEY_PREFIX + key,
+                json.dumps(value, default=str),
+                ex=max(int(ttl_seconds), 1),
+            )
+        except redis.RedisError:
+            self._mark_down()
+
+    def get_bytes(self, key: str):
+        """Jak get, ale zwraca surowe bajty (bez JSON)."""
+        if not self._available():
+            return _MISSING, 0
+        try:
+            pipe = self.binary_client.pipeline()
+            pipe.get(KEY_PREFIX + key)
+            pipe.pttl(KEY_PREFIX + key)
+            value, ttl_ms = pipe.execute()
+        except redis.RedisError:
+            self._mark_down()
+            return _MISSING, 0
+        if value is None:
+            return _MISSING, 0
+        return value, max(ttl_ms, 0) / 1000.0
+
+    def set_bytes(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        if not self._available():
+            return
+        try:
+            self.binary_client.set(KEY_PREFIX + key, value, ex=max(int(ttl_seconds), 1))
+        except redis.RedisError:
+            self._mark_down()
+
+    def get_int(self, key: str) -> int | None:
+        if not self._available():
+            return None
+        try:
+            value = self.client.get(KEY_PREFIX + key)
+        except redis.RedisError:
+            self._mark_down()
+            return None
+        return int(value) if value is not None else 0
+
+    def incr(self, key: str) -> int | None:
+        if not self._available():
+            return None
+        try:
+            return int(self.client.incr(KEY_PREFIX + key))
+        except redis.RedisError:
+            self._mark_down()
+            return None
+
+    def try_lock(self, name: str, token: str, ttl_seconds: float) -> bool | None:
+        """True = mamy lock, False = trzyma go ktoś inny, None = Redis niedostępny."""
+        if not self._available():
+            return None
+        try:
+            return bool(self.client.set(KEY_PREFIX + name, token, nx=True, px=int(ttl_seconds * 1000)))
+        except redis.RedisError:
+            self._mark_down()
+            return None
+
+    def unlock(self, name: str, token: str) -> None:
+        """Zwalnia lock tylko, jeśli nadal należy do nas (WATCH + MULTI)."""
+        if not self._available():
+            return
+        key = KEY_PREFIX + name
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.watch(key)
+                if pipe.get(key) == token:
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except redis.WatchError:
+            pass  # lock wygasł i przejął go ktoś inny
+        except redis.RedisError:
+            self._mark_down()
+
+    def clear(self) -> None:
+        if not self._available():
+            return
+        generations = KEY_PREFIX + GENERATION_PREFIX
+        try:
+            batch = []
+            for key in self.client.scan_iter(match=KEY_PREFIX + "*", count=1000):
+                if key.startswith(generations):
+                    continue
+                batch.append(key)
+                if len(batch) >= 1000:
+                    self.client.delete(*batch)
+                    batch = []
+            if batch:
+                self.client.delete(*batch)
+        except redis.RedisError:
+            self._mark_down()
+
+
+class TieredCache:
+    """
+    Dwie warstwy: LRU w procesie przed (opcjonalnym) Redisem.
+    Odczyt z Redisa zasila warstwę lokalną na czas nie dłuższy niż
+    `local_ttl` ani niż pozostały TTL klucza w Redisie.
+    """
+
+    def __init__(
+        self,
+        local: LocalCache,
+        remote: RedisCache | None = None,
+        local_ttl: float = 30.0,
+        generation_ttl: float = 1.0,
+    ):
+        self.local = local
+        self.remote = remote
+        self.local_ttl = local_ttl
+        # jak długo proces ufa swojej kopii licznika generacji z Redisa
+        self.generation_ttl = generation_ttl
+        # liczniki tego procesu – poza LRU, żeby nie zostały wyrzucone
+        self._generations: dict[str, int] = {}
+        self._generations_lock = threading.Lock()
+
+    def get(self, key: str, decode: Callable[[bytes], Any] | None = None):
+        """
+        Z `decode` Redis trzyma bajty, a warstwa lokalna – zdekodowany obiekt
+        (trafienie lokalne nie dekoduje ponownie).
+        """
+        value = self.local.get(key)
+        if value is not _MISSING:
+            return value
+        if self.remote is None:
+            return None
+
+        value, ttl = self.remote.get_bytes(key) if decode else self.remote.get(key)
+        if value is _MISSING:
+            return None
+        if decode:
+            value = decode(value)
+        if ttl > 0:
+            self.local.set(key, value, min(ttl, self.local_ttl))
+        return value
+
+    def set(
+        self,
+        key: str,
+        value,
+        ttl_seconds: float,
+        encode: Callable[[Any], bytes] | None = None,
+    ) -> None:
+        self.local.set(key, value, min(ttl_seconds, self.local_ttl))
+        if self.remote is None:
+            return
+        if encode:
+            self.remote.set_bytes(key, encode(value), ttl_seconds)
+        else:
+            self.remote.set(key, value, ttl_seconds)
+
+    def clear(self) -> None:
+        self.local.clear()
+        if self.remote is not None:
+            self.remote.clear()
+
+    def generation(self, namespace: str) -> int:
+        key = GENERATION_PREFIX + namespace
+        value = self.local.get(key)
+        if value is not _MISSING:
+            return value
+
+        generation = self._generations.get(namespace, 0)
+        if self.remote is not None:
+            remote = self.remote.get_int(key)
+            if remote is not None:
+                generation = max(generation, remote)
+        self.local.set(key, generation, self.generation_ttl)
+        return generation
+
+    def bump_generation(self, namespace: str) -> int:
+        key = GENERATION_PREFIX + namespace
+        remote = self.remote.incr(key) if self.remote is not None else None
+        with self._generations_lock:
+            generation = max(self._generations.get(namespace, 0) + 1, remote or 0)
+            self._generations[namespace] = generation
+        self.local.set(key, generation, self.generation_ttl)
+        return generation
+
+    @contextmanager
+    def lock(self, name: str, ttl_seconds: float, wait_seconds: float, poll_seconds: float = 0.05):
+        if self.remote is None:
+            yield False
+            return
+
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait_seconds
+        acquired = self.remote.try_lock(name, token, ttl_seconds)
+        while acquired is False and time.monotonic() < deadline:
+            time.sleep(poll_seconds)
+            acquired = self.remote.try_lock(name, token, ttl_seconds)
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                self.remote.unlock(name, token)
+
 
 # Połączenie z Redis w Dockerze
-redis_client = redis.Redis(
-    host="localhost",
-    port=6379,
-    db=0,
-    decode_responses=True,  # zwracaj stringi zamiast bajtów
+redis_client = (
+    redis.Redis.from_url(
+        REDIS_URL,
+        decode_responses=True,  # zwracaj stringi zamiast bajtów
+        socket_connect_timeout=0.5,
+        socket_timeout=0.5,
+    )
+    if REDIS_URL
+    else None
+)
+
+redis_binary_client = (
+    redis.Redis(connection_pool=redis.ConnectionPool.from_url(
+        REDIS_URL,
+        socket_connect_timeout=0.5,
+        socket_timeout=0.5,
+    ))
+    if REDIS_URL
+    else None
 )
 
+_cache = TieredCache(
+    LocalCache(),
+    RedisCache(redis_client, binary_client=redis_binary_client) if redis_client is not None else None,
+)
+
+
+def configure_cache(backend: TieredCache) -> None:
+    """Podmienia backend cache (np. tylko LocalCache w testach/dev)."""
+    global _cache
+    _cache = backend
+
+
 def cache_get(key: str):
-    value = redis_client.get(key)
-    if value:
-        return json.loads(value)
-    return None
+    return _cache.get(key)
+
 
 def cache_set(key: str, value, ttl_seconds=300):
-    redis_client.set(
-        key,
-        json.dumps(value, default=str),
-        ex=ttl_seconds
-    )
+    _cache.set(key, value, ttl_seconds)
+
+
+def cache_get_encoded(key: str, decode: Callable[[bytes], Any]):
+    """
+    Odczyt obiektu zapisanego przez cache_set_encoded (np. QuoteSeries):
+    w procesie gotowy obiekt, z Redisa – bajty przepuszczone przez `decode`.
+    """
+    return _cache.get(key, decode=decode)
+
+
+def cache_set_encoded(key: str, value, encode: Callable[[Any], bytes], ttl_seconds=300):
+    _cache.set(key, value, ttl_seconds, encode=encode)
+
+
+def get_generation(namespace: str) -> int:
+    """
+    Aktualna generacja przestrzeni kluczy (np. symbolu). Wpisy z generacją
+    w kluczu unieważnia się w O(1) przez bump_generation – bez skanowania.
+    """
+    return _cache.generation(namespace)
+
+
+def bump_generation(namespace: str) -> int:
+    return _cache.bump_generation(namespace)
+
+
+def distributed_lock(name: str, ttl_seconds: float = 30, wait_seconds: float = 30):
+    """
+    Lock między workerami (SET NX PX w Redisie), używany jako
+    `with distributed_lock(...) as acquired:`. Gdy trzyma go inny worker,
+    czeka na zwolnienie (maks. wait_seconds). Bez Redisa działa jak no-op
+    (acquired=False) – wtedy wystarcza koordynacja w obrębie procesu.
+    """
+    return _cache.lock(f"lock:{name}", ttl_seconds, wait_seconds)
+
 
 def clear_cache():
-    global CACHE
-    CACHE = {}  # szybkie wyczyszczenie wszystkiego
\ No newline at end of file
+    # czyści obie warstwy (w Redisie tylko klucze z KEY_PREFIX)
+    _cache.clear()
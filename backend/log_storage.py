@@ -0,0 +1,287 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, select, text, true
+from sqlalchemy.orm import Session
+
+from log_writer import log_record, log_writer
+from models import LOG_FTS_DDL, LogEntry, LogRollup
+
+# ile pełnych miesięcy logów trzymamy poza bieżącym (0 = bez limitu)
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "12"))
+
+_PARTITION_NAME = re.compile(r"^logs_p(\d{4})(\d{2})$")
+
+# klucz pg_advisory_xact_lock dla zmian partycji – workery startujące
+# równocześnie tworzą je po kolei zamiast ścigać się o CREATE/ATTACH
+PARTITION_LOCK_KEY = 0x6C6F6773  # "logs"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"logs_p{month:%Y%m}"
+
+
+class LogStorage:
+    """
+    Przechowywanie logów w miesięcznych partycjach.
+
+    PostgreSQL: tabela `logs` jest partycjonowana po `timestamp`
+    (PARTITION BY RANGE), partycja na miesiąc + `logs_default`; retencja
+    i czyszczenie całych miesięcy to DROP/TRUNCATE partycji, a filtry po
+    dacie w zapytaniach ograniczają skan do pasujących partycji.
+
+    SQLite: partycje są emulowane – miesiąc to zakres po indeksie na
+    `timestamp`, usuwany paczkami DELETE, żeby nie blokować tabeli na długo.
+    """
+
+    PARTITIONS_AHEAD = 2
+    DELETE_CHUNK_SIZE = 10_000
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def partitioned(self) -> bool:
+        """
+        PostgreSQL z partycjonowaną tabelą logs. Baza sprzed partycjonowania
+        (zwykła tabela) działa dalej jak SQLite – bez DROP/TRUNCATE partycji.
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            return False
+        relkind = self.db.execute(text(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass('logs')"
+        )).scalar()
+        return relkind == "p"
+
+    def _lock_partitions(self) -> None:
+        """Blokada do końca transakcji (zwalniana przez commit/rollback)."""
+        self.db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+
+    # --- partycje ---
+
+    def partitions(self) -> List[date]:
+        """Początki miesięcy, dla których istnieją partycje (albo dane na SQLite)."""
+        if self.partitioned:
+            names = self.db.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = 'logs'"
+            )).scalars()
+            months = []
+            for name in names:
+                match = _PARTITION_NAME.match(name)
+                if match:
+                    months.append(date(int(match.group(1)), int(match.group(2)), 1))
+            return sorted(months)
+
+        first, last = self.db.execute(
+            select(func.min(LogEntry.timestamp), func.max(LogEntry.timestamp))
+        ).one()
+        if first is None:
+            return []
+        months = []
+        month = month_start(_as_date(first))
+        while month <= _as_date(last):
+            months.append(month)
+            month = add_months(month, 1)
+        return months
+
+    def ensure_partitions(self, today: Optional[date] = None) -> List[date]:
+        """
+        Tworzy brakujące partycje od bieżącego miesiąca do PARTITIONS_AHEAD
+        naprzód (tylko PostgreSQL). Wiersze z danego miesiąca, które już
+        trafiły do logs_default, są przenoszone do nowej partycji.
+        """
+        if not self.partitioned:
+            if self.db.get_bind().dialect.name == "postgresql":
+                log_writer.submit(log_record(
+                    message="Tabela logs nie jest partycjonowana – pomijam tworzenie partycji "
+                            "(wymaga ręcznej migracji)",
+                    level="WARNING",
+                    source="LOG_STORAGE",
+                ))
+            return []
+
+        self._lock_partitions()
+        current = month_start(today or date.today())
+        existing = set(self.partitions())
+        created = []
+        for offset in range(self.PARTITIONS_AHEAD + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            self._create_partition(month)
+            created.append(month)
+        self.db.commit()
+        return created
+
+    def _create_partition(self, month: date) -> None:
+        name = partition_name(month)
+        bounds = {"start": datetime.combine(month, datetime.min.time()),
+                  "end": datetime.combine(add_months(month, 1), datetime.min.time())}
+        # tabela obok, przeniesienie wierszy z logs_default, dopiero potem ATTACH –
+        # inaczej PostgreSQL odrzuci partycję, gdy default ma wiersze z tego zakresu
+        self.db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} (LIKE logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        self.db.execute(text(
+            f"INSERT INTO {name} SELECT * FROM logs_default "
+            "WHERE timestamp >= :start AND timestamp < :end"
+        ), bounds)
+        self.db.execute(text(
+            "DELETE FROM logs_default WHERE timestamp >= :start AND timestamp < :end"
+        ), bounds)
+        self.db.execute(text(
+            f"ALTER TABLE logs ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+        ))
+
+    # --- wyszukiwanie pełnotekstowe ---
+
+    def ensure_search_index(self) -> bool:
+        """
+        Tworzy brakujący indeks pełnotekstowy logów (models.LOG_FTS_DDL) –
+        after_create działa tylko przy zakładaniu tabeli, więc baza sprzed
+        indeksu dostaje go tutaj, przy starcie. Na SQLite nowa tabela
+        logs_fts jest wypełniana istniejącymi wpisami (FTS5 'rebuild').
+        Zwraca True, jeśli coś trzeba było utworzyć.
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            if self.db.execute(text("SELECT to_regclass('ix_logs_fts')")).scalar() is not None:
+                return False
+            # workery startujące równocześnie nie budują indeksu dwa razy
+            self._lock_partitions()
+        elif dialect == "sqlite":
+            existing = self.db.execute(text(
+                "SELECT count(*) FROM sqlite_master "
+                "WHERE name IN ('logs_fts', 'logs_fts_ai', 'logs_fts_ad', 'logs_fts_au')"
+            )).scalar()
+            if existing == 4:
+                return False
+        else:
+            return False
+
+        for statement in LOG_FTS_DDL[dialect]:
+            self.db.execute(text(statement))
+        if dialect == "sqlite":
+            self.db.execute(text("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')"))
+        self.db.commit()
+        return True
+
+    # --- retencja i czyszczenie ---
+
+    def apply_retention(
+        self,
+        months: int = LOG_RETENTION_MONTHS,
+        today: Optional[date] = None,
+    ) -> List[date]:
+        """
+        Usuwa miesiące starsze niż `months` pełnych miesięcy przed bieżącym.
+        Zwraca usunięte miesiące.
+        """
+        if months <= 0:
+            return []
+        cutoff = add_months(month_start(today or date.today()), -months)
+        expired = [m for m in self.partitions() if m < cutoff]
+
+        if self.partitioned:
+            self._lock_partitions()
+            for month in expired:
+                self.db.execute(text(f"DROP TABLE IF EXISTS {partition_name(month)}"))
+            self.db.commit()
+
+        # SQLite: całe wygasłe miesiące; PostgreSQL: stare wiersze z logs_default
+        self._delete_in_chunks(LogEntry.timestamp < _start_of(cutoff))
+        return expired
+
+    def clear(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> Dict:
+        """
+        Usuwa logi z zakresu [date_from, date_to] (bez granic = wszystkie).
+        Na PostgreSQL całe miesiące w zakresie są czyszczone TRUNCATE-m
+        partycji (ich wierszy nie liczymy), reszta – DELETE paczkami.
+        """
+        self._clear_rollups(date_from, date_to)
+
+        truncated: List[date] = []
+        if self.partitioned:
+            if date_from is None and date_to is None:
+                self.db.execute(text("TRUNCATE logs"))
+                self.db.commit()
+                return {"deleted": 0, "truncated_partitions": self.partitions()}
+
+            for month in self.partitions():
+                inside_from = date_from is None or _start_of(month) >= date_from
+                inside_to = date_to is None or _start_of(add_months(month, 1)) <= date_to
+                if inside_from and inside_to:
+                    self.db.execute(text(f"TRUNCATE {partition_name(month)}"))
+                    truncated.append(month)
+            self.db.commit()
+
+        conditions = []
+        if date_from is not None:
+            conditions.append(LogEntry.timestamp >= date_from)
+        if date_to is not None:
+            conditions.append(LogEntry.timestamp <= date_to)
+        deleted = self._delete_in_chunks(and_(*conditions) if conditions else true())
+        return {"deleted": deleted, "truncated_partitions": truncated}
+
+    def _clear_rollups(
+        self,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+    ) -> None:
+        """
+        Usuwa liczniki godzin leżących w całości w zakresie; godziny brzegowe
+        zostają (statystyki mają dokładność do godziny). Retencja nie rusza
+        log_rollups – agregaty zostają dla starszych okresów.
+        """
+        stmt = delete(LogRollup)
+        if date_from is not None:
+            stmt = stmt.where(LogRollup.bucket >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(LogRollup.bucket <= date_to - timedelta(hours=1))
+        self.db.execute(stmt)
+        self.db.commit()
+
+    def _delete_in_chunks(self, condition) -> int:
+        """DELETE paczkami z commitem po każdej – krótkie blokady zamiast jednej długiej."""
+        total = 0
+        while True:
+            ids = (
+                select(LogEntry.id)
+                .where(condition)
+                .limit(self.DELETE_CHUNK_SIZE)
+                .scalar_subquery()
+            )
+            deleted = self.db.execute(
+                delete(LogEntry).where(LogEntry.id.in_(ids), condition)
+            ).rowcount
+            self.db.commit()
+            total += deleted
+            if deleted < self.DELETE_CHUNK_SIZE:
+                return total
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _start_of(month: date) -> datetime:
+    return datetime.combine(month, datetime.min.time())
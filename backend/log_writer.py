@@ -0,0 +1,224 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from db import SessionLocal, upsert_insert
+from models import LogEntry, LogRollup
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _Flush:
+    """Znacznik w kolejce – writer zapisuje wszystko przed nim i ustawia `done`."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class LogWriter:
+    """
+    Kolejka logów opróżniana przez wątek w tle: wpisy trafiają do bazy
+    jednym INSERT-em na paczkę (po `batch_size` wpisach albo co
+    `flush_interval` sekund), a request nie czeka na zapis.
+
+    Kolejka jest ograniczona (`max_queue`). Polityka przy pełnej kolejce:
+      - "drop"  – wpis jest pomijany od razu (request nigdy nie czeka),
+      - "block" – czeka do `block_timeout` sekund, potem pomija.
+    Liczba pominiętych wpisów (także z paczek, których nie udało się
+    zapisać) trafia do bazy jako osobny WARNING.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        max_queue: int = 10_000,
+        policy: str = "drop",
+        block_timeout: float = 0.1,
+    ):
+        if policy not in ("drop", "block"):
+            raise ValueError("Policy must be 'drop' or 'block'")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    # --- API dla producentów ---
+
+    def submit(self, entry: Dict) -> bool:
+        """Dodaje wpis (słownik kolumn LogEntry). False = wpis pominięty."""
+        self._ensure_started()
+        try:
+            if self.policy == "block":
+                self._queue.put(entry, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Czeka, aż wszystko dodane przed wywołaniem trafi do bazy."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        marker = _Flush()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Zapisuje zaległe wpisy i zatrzymuje wątek (np. przy zamknięciu aplikacji)."""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+            thread.join(timeout)
+            self._thread = None
+
+    # --- wątek zapisujący ---
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        batch: List[Dict] = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = _MISSING
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+            # paczka pełna, minął czas, flush albo stop – zapisujemy
+            self._write(batch)
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, _Flush):
+                item.done.set()
+            elif item is None:
+                return
+
+    def _write(self, batch: List[Dict]) -> None:
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        lost = len(batch) + dropped
+        if dropped:
+            batch.append(log_record(
+                message=f"Pominięto {dropped} wpisów logu (pełna kolejka lub błąd zapisu)",
+                level="WARNING",
+                source="LOG_WRITER",
+            ))
+        if not batch:
+            return
+
+        db = self.session_factory()
+        try:
+            db.execute(insert(LogEntry), batch)
+            _add_to_rollups(db, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # logi nie mogą zatrzymać writera – paczka przepada, ale liczymy
+            # ją jak wpisy z pełnej kolejki, więc kolejny zapis ją zgłosi
+            with self._dropped_lock:
+                self._dropped += lost
+            logger.exception("LogWriter: nie zapisano %d wpisów", lost)
+        finally:
+            db.close()
+
+
+def rollup_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_to_rollups(db: Session, batch: List[Dict]) -> None:
+    """Dolicza paczkę do log_rollups (w tej samej transakcji co INSERT logów)."""
+    counts = Counter(
+        (rollup_bucket(e["timestamp"]), e["level"], e["source"] or "") for e in batch
+    )
+    rows = [
+        {"bucket": bucket, "level": level, "source": source, "count": count}
+        for (bucket, level, source), count in counts.items()
+    ]
+
+    insert_ = upsert_insert(db)
+    if insert_ is None:
+        for row in rows:
+            rollup = db.get(LogRollup, (row["bucket"], row["level"], row["source"]))
+            if rollup is None:
+                db.add(LogRollup(**row))
+            else:
+                rollup.count += row["count"]
+        return
+
+    stmt = insert_(LogRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket", "level", "source"],
+        set_={"count": LogRollup.count + stmt.excluded["count"]},
+    )
+    db.execute(stmt)
+
+
+def log_record(
+    message: str,
+    level: str = "INFO",
+    source: Optional[str] = None,
+    user_email: Optional[str] = None,
+    details: Optional[str] = None,
+) -> Dict:
+    """Wiersz tabeli logs – znacznik czasu z chwili zdarzenia, nie zapisu."""
+    return {
+        "timestamp": datetime.utcnow() + timedelta(hours=1),
+        "level": level,
+        "source": source,
+        "message": message,
+        "user_email": user_email,
+        "details": details,
+    }
+
+
+log_writer = LogWriter(SessionLocal)
+
+atexit.register(lambda: log_writer.close())
+
+
+def configure_log_writer(session_factory: sessionmaker) -> None:
+    """Podmienia fabrykę sesji writera (np. SQLite w testach)."""
+    log_writer.flush()
+    log_writer.session_factory = session_factory
@@ -2,34 +2,48 @@ from datetime import date, datetime
 from typing import List, Dict, Optional, Literal
 import csv
 import io
-import statistics
 
-from fastapi import FastAPI, Depends, Query, HTTPException
+from fastapi import FastAPI, Depends, Query, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import delete
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import Base, engine, get_db
+from db import Base, engine, get_db, get_async_db
+import analytics
+import columnar_export
 import models
-from models import LogEntry
 from services import (
     MarketDataService,
-    ExportService,
-    PortfolioService,
     AlertService,
     LogService,
 )
+from async_services import (
+    AsyncMarketDataService,
+    AsyncExportService,
+    AsyncPortfolioService,
+    AsyncAlertService,
+    AsyncLogService,
+    gzip_chunks_async,
+)
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from cache import clear_cache
+from log_writer import log_writer
+from quote_series import QuoteSeries, period_start
 
 from db import SessionLocal
+from log_storage import LogStorage
 
 # Utworzenie tabel w bazie
 Base.metadata.create_all(bind=engine)
 
+# partycje logów na bieżący i najbliższe miesiące (PostgreSQL) oraz indeks
+# pełnotekstowy, jeśli tabela logs powstała przed jego wprowadzeniem
+with SessionLocal() as _db:
+    LogStorage(_db).ensure_partitions()
+    LogStorage(_db).ensure_search_index()
+
 app = FastAPI(title="Market Analysis Backend")
 
 # CORS (frontend na innym porcie)
@@ -39,6 +53,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # kursor następnej strony logów (/api/logs) – inaczej niewidoczny dla frontendu
+    expose_headers=["X-Next-Cursor"],
 )
 
 scheduler = BackgroundScheduler()
@@ -67,12 +83,18 @@ class InstrumentMetricsDTO(BaseModel):
     return_pct: float          # zwrot w % w okresie
     volatility_pct: float      # odchylenie std dziennych zwrotów w %
     max_drawdown_pct: float    # maksymalny spadek od szczytu w %
+    annualized_volatility_pct: float         # zmienność roczna (x sqrt(252)) w %
+    cagr_pct: float | None = None            # średnioroczna stopa zwrotu w %
+    sharpe_ratio: float | None = None        # roczny, względem risk_free_rate
+    sortino_ratio: float | None = None       # roczny, względem risk_free_rate
+    beta: float | None = None                # względem benchmarku (jeśli podano)
 
 
 class ComparisonResponse(BaseModel):
     symbols: List[str]
     series: Dict[str, List[ComparisonPointDTO]]
     metrics: List[InstrumentMetricsDTO]
+    errors: Dict[str, str] = {}  # symbol -> powód pominięcia
 
 
 class HistoryResponse(BaseModel):
@@ -80,6 +102,26 @@ class HistoryResponse(BaseModel):
     quotes: List[QuoteDTO]
 
 
+class IntradayBarDTO(BaseModel):
+    timestamp: datetime
+    open: float | None = None
+    high: float | None = None
+    low: float | None = None
+    close: float
+    volume: int | None = None
+
+
+class IntradayHistoryResponse(BaseModel):
+    symbol: str
+    interval: str
+    bars: List[IntradayBarDTO]
+
+
+class BatchHistoryResponse(BaseModel):
+    symbols: List[str]
+    series: Dict[str, List[QuoteDTO]]
+
+
 class CurrentQuoteResponse(BaseModel):
     symbol: str
     quote: QuoteDTO
@@ -142,74 +184,180 @@ class LogEntryDTO(BaseModel):
         orm_mode = True
 
 
+class LogStatsDTO(BaseModel):
+    bucket: datetime           # początek godziny / dnia
+    level: str
+    source: Optional[str] = None
+    count: int
+
+
 # ========================
 # UC2 – Historia notowań
 # ========================
 
 @app.get("/api/history", response_model=HistoryResponse)
-def get_history(
+async def get_history(
     symbol: str = Query(..., description="Ticker, np. AAPL"),
     start: date = Query(..., description="Początek zakresu (YYYY-MM-DD)"),
     end: date = Query(..., description="Koniec zakresu (YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    resolution: Literal["day", "week", "month", "quarter", "year"] = Query(
+        "day", description="Świece dzienne albo zbiorcze (data = początek okresu)"
+    ),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     UC2: Analiza trendów historycznych.
-    Pobiera dane z Yahoo, zapisuje do bazy, i zwraca zakres dat.
+    Pobiera dane z Yahoo, zapisuje do bazy, i zwraca zakres dat. Dla
+    resolution innego niż "day" zwraca świece zbiorcze z quote_rollups.
     """
     if not symbol or symbol.strip() == "":
         raise HTTPException(422, detail="Symbol cannot be empty")
     if start > end:
         raise HTTPException(422, detail="Start date cannot be after end date")
-    service = MarketDataService(db)
-    service.fetch_and_store_history(symbol=symbol, start=start, end=end)
-    quotes = service.get_history_from_db(symbol=symbol, start=start, end=end)
+    service = AsyncMarketDataService(db)
+    # pierwsza świeca zbiorcza obejmuje cały okres zawierający `start` –
+    # pobieramy go w całości, żeby nie powstała z części notowań
+    fetch_start = start if resolution == "day" else period_start(start, resolution)
+    await service.ensure_history(symbol=symbol, start=fetch_start, end=end)
+    if resolution == "day":
+        records = await service.get_history_from_db(symbol=symbol, start=start, end=end)
+        quotes = [QuoteDTO(**record) for record in records]
+    else:
+        rollups = await service.get_history_rollup(
+            symbol=symbol, resolution=resolution, start=start, end=end
+        )
+        quotes = [
+            QuoteDTO(
+                date=q.period_start,
+                open=q.open,
+                high=q.high,
+                low=q.low,
+                close=q.close,
+                volume=q.volume,
+            )
+            for q in rollups
+        ]
 
     # LOG
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Pobrano historię {symbol} od {start} do {end}",
         level="INFO",
         source="UC2_HISTORY",
     )
 
-    return HistoryResponse(
+    return HistoryResponse(symbol=symbol, quotes=quotes)
+
+
+@app.get("/api/history/intraday", response_model=IntradayHistoryResponse)
+async def get_intraday_history(
+    symbol: str = Query(..., description="Ticker, np. AAPL"),
+    start: date = Query(..., description="Początek zakresu (YYYY-MM-DD)"),
+    end: date = Query(..., description="Koniec zakresu (YYYY-MM-DD)"),
+    interval: Literal["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"] = Query(
+        "5m", description="Interwał świec"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    UC2: Świece śródsesyjne (czas świecy w UTC). Yahoo udostępnia je tylko
+    dla ostatnich dni (1m: 7 dni, pozostałe: 60 dni).
+    """
+    if not symbol or symbol.strip() == "":
+        raise HTTPException(422, detail="Symbol cannot be empty")
+    if start > end:
+        raise HTTPException(422, detail="Start date cannot be after end date")
+    service = AsyncMarketDataService(db)
+    bars = await service.fetch_and_store_intraday(
+        symbol=symbol, start=start, end=end, interval=interval
+    )
+
+    # LOG
+    await AsyncLogService(db).add_log(
+        message=f"Pobrano świece {interval} {symbol} od {start} do {end}",
+        level="INFO",
+        source="UC2_HISTORY",
+    )
+
+    return IntradayHistoryResponse(
         symbol=symbol,
-        quotes=[
-            QuoteDTO(
-                date=q.date,
-                open=q.open,
-                high=q.high,
-                low=q.low,
-                close=q.close,
-                volume=q.volume,
+        interval=interval,
+        bars=[
+            IntradayBarDTO(
+                timestamp=b.timestamp,
+                open=b.open,
+                high=b.high,
+                low=b.low,
+                close=b.close,
+                volume=b.volume,
             )
-            for q in quotes
+            for b in bars
         ],
     )
 
 
+@app.get("/api/history/batch", response_model=BatchHistoryResponse)
+async def get_history_batch(
+    symbols: str = Query(
+        ...,
+        description="Lista symboli oddzielona przecinkami, np. AAPL,MSFT,TSLA",
+    ),
+    start: date = Query(..., description="Początek zakresu (YYYY-MM-DD)"),
+    end: date = Query(..., description="Koniec zakresu (YYYY-MM-DD)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    UC2: Historia wielu instrumentów naraz (np. lista obserwowanych).
+    Brakujące dane pobierane są z Yahoo jednym zapytaniem.
+    """
+    symbols_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not symbols_list:
+        raise HTTPException(422, detail="Symbols cannot be empty")
+    if start > end:
+        raise HTTPException(422, detail="Start date cannot be after end date")
+
+    service = AsyncMarketDataService(db)
+    quotes_by_symbol = await service.fetch_and_store_history_batch(
+        symbols=symbols_list, start=start, end=end
+    )
+
+    # LOG
+    await AsyncLogService(db).add_log(
+        message=f"Pobrano historię {', '.join(symbols_list)} od {start} do {end}",
+        level="INFO",
+        source="UC2_HISTORY",
+    )
+
+    return BatchHistoryResponse(
+        symbols=symbols_list,
+        series={
+            sym: [QuoteDTO(**record) for record in records]
+            for sym, records in quotes_by_symbol.items()
+        },
+    )
+
+
 # ========================
 # UC1 – Bieżące dane
 # ========================
 
 @app.get("/api/current", response_model=CurrentQuoteResponse)
-def get_current(
+async def get_current(
     symbol: str = Query(..., description="Ticker, np. AAPL"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     UC1: Przegląd bieżących danych rynkowych.
     Dociąga ostatnie dni danych i zwraca najnowszą świecę.
     """
-    service = MarketDataService(db)
-    service.refresh_recent_history(symbol=symbol, days=5)
+    service = AsyncMarketDataService(db)
+    await service.refresh_recent_history(symbol=symbol, days=5)
 
-    latest = service.get_latest_quote(symbol=symbol)
+    latest = await service.get_latest_quote(symbol=symbol)
     if latest is None:
         raise HTTPException(status_code=404, detail="Brak danych dla podanego symbolu")
 
     # LOG
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Pobrano bieżące dane dla {symbol}",
         level="INFO",
         source="UC1_CURRENT",
@@ -233,29 +381,48 @@ def get_current(
 # ========================
 
 @app.get("/api/export/csv")
-def export_history_csv(
+async def export_history_csv(
     symbol: str = Query(..., description="Ticker, np. AAPL"),
     start: date = Query(..., description="Początek zakresu (YYYY-MM-DD)"),
     end: date = Query(..., description="Koniec zakresu (YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    gzip: bool = Query(False, description="Kompresja gzip (plik .csv.gz)"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     UC3: Eksport danych / raportu.
-    Zwraca plik CSV z danymi historycznymi dla danego instrumentu.
+    Zwraca plik CSV z danymi historycznymi dla danego instrumentu –
+    strumieniowo, kawałkami czytanymi z bazy.
     """
-    export_service = ExportService(db)
-    csv_data = export_service.export_history_to_csv(symbol=symbol, start=start, end=end)
+    # brakujące dane z Yahoo przed pierwszym bajtem odpowiedzi
+    await AsyncMarketDataService(db).ensure_history(symbol=symbol, start=start, end=end)
     filename = f"{symbol}_{start.isoformat()}_{end.isoformat()}.csv"
 
     # LOG
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Eksport CSV dla {symbol} od {start} do {end} (plik {filename})",
         level="INFO",
         source="UC3_EXPORT",
     )
 
+    async def generate():
+        try:
+            async for chunk in AsyncExportService(db).iter_history_csv(
+                symbol=symbol, start=start, end=end
+            ):
+                yield chunk
+        finally:
+            # sesja z Depends mogła już zostać zamknięta – zwalniamy połączenie sami
+            await db.close()
+
+    if gzip:
+        return StreamingResponse(
+            gzip_chunks_async(generate()),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'},
+        )
+
     return StreamingResponse(
-        io.StringIO(csv_data),
+        generate(),
         media_type="text/csv",
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"'
@@ -263,14 +430,73 @@ def export_history_csv(
     )
 
 
+@app.get("/api/export/{file_format}")
+async def export_history_columnar(
+    file_format: Literal["parquet", "arrow"],
+    symbols: str = Query(
+        ...,
+        description="Symbol albo lista symboli oddzielona przecinkami, np. AAPL,MSFT",
+    ),
+    start: date = Query(..., description="Początek zakresu (YYYY-MM-DD)"),
+    end: date = Query(..., description="Koniec zakresu (YYYY-MM-DD)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    UC3: Eksport kolumnowy (Parquet / Arrow IPC) jednego albo wielu
+    instrumentów w jednym pliku: kolumny symbol (słownikowa), date, OHLCV.
+    """
+    symbols_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not symbols_list:
+        raise HTTPException(422, detail="Symbols cannot be empty")
+    if start > end:
+        raise HTTPException(422, detail="Start date cannot be after end date")
+
+    service = AsyncMarketDataService(db)
+    if len(symbols_list) == 1:
+        await service.ensure_history(symbol=symbols_list[0], start=start, end=end)
+    else:
+        await service.ensure_history_batch(symbols=symbols_list, start=start, end=end)
+
+    name = symbols_list[0] if len(symbols_list) == 1 else f"bundle_{len(symbols_list)}"
+    filename = (
+        f"{name}_{start.isoformat()}_{end.isoformat()}."
+        f"{columnar_export.file_extension(file_format)}"
+    )
+
+    # LOG
+    await AsyncLogService(db).add_log(
+        message=(
+            f"Eksport {file_format} dla {', '.join(symbols_list)} "
+            f"od {start} do {end} (plik {filename})"
+        ),
+        level="INFO",
+        source="UC3_EXPORT",
+    )
+
+    async def generate():
+        try:
+            async for chunk in AsyncExportService(db).iter_history_columnar(
+                symbols=symbols_list, file_format=file_format, start=start, end=end
+            ):
+                yield chunk
+        finally:
+            await db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type=columnar_export.content_type(file_format),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 # ========================
 # UC3 – Portfel (demo)
 # ========================
 
 @app.post("/api/portfolio/positions", response_model=PortfolioSummaryResponse)
-def add_position(
+async def add_position(
     payload: PositionCreateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Dodanie/aktualizacja pozycji w portfelu demo.
@@ -279,18 +505,18 @@ def add_position(
     if payload.quantity <= 0:
         raise HTTPException(400, detail="Quantity must be positive")
 
-    service = PortfolioService(db)
-    portfolio = service.get_or_create_default_portfolio()
-    service.add_or_update_position(
+    service = AsyncPortfolioService(db)
+    portfolio = await service.get_or_create_default_portfolio()
+    await service.add_or_update_position(
         portfolio_id=portfolio.id,
         symbol=payload.symbol,
         quantity=payload.quantity,
         avg_open_price=payload.avg_open_price,
     )
-    summary = service.get_portfolio_summary(portfolio.id)
+    summary = await service.get_portfolio_summary(portfolio.id)
 
     # LOG
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=(
             f"Dodano/zaktualizowano pozycję w portfelu: "
             f"{payload.symbol.upper()}, ilość={payload.quantity}, cena={payload.avg_open_price}"
@@ -309,18 +535,18 @@ def add_position(
 
 
 @app.get("/api/portfolio", response_model=PortfolioSummaryResponse)
-def get_portfolio(
-    db: Session = Depends(get_db),
+async def get_portfolio(
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Podsumowanie portfela demo.
     """
-    service = PortfolioService(db)
-    portfolio = service.get_or_create_default_portfolio()
-    summary = service.get_portfolio_summary(portfolio.id)
+    service = AsyncPortfolioService(db)
+    portfolio = await service.get_or_create_default_portfolio()
+    summary = await service.get_portfolio_summary(portfolio.id)
 
     # LOG
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message="Wyświetlono podsumowanie portfela demo",
         level="INFO",
         source="UC3_PORTFOLIO_VIEW",
@@ -340,19 +566,25 @@ def get_portfolio(
 # ========================
 
 @app.get("/api/compare", response_model=ComparisonResponse)
-def compare_instruments(
+async def compare_instruments(
     symbols: str = Query(
         ...,
         description="Lista symboli oddzielona przecinkami, np. AAPL,MSFT,TSLA",
     ),
     start: date = Query(..., description="Początek zakresu (YYYY-MM-DD)"),
     end: date = Query(..., description="Koniec zakresu (YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    benchmark: Optional[str] = Query(
+        None, description="Symbol odniesienia do wyliczenia bety, np. SPY"
+    ),
+    risk_free_rate: float = Query(
+        0.0, description="Roczna stopa wolna od ryzyka dla Sharpe/Sortino, np. 0.04"
+    ),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Porównanie kilku instrumentów w zadanym okresie + metryki.
     """
-    service = MarketDataService(db)
+    service = AsyncMarketDataService(db)
 
     symbols_list = [s.strip().upper() for s in symbols.split(",") if s.strip()]
     if len(symbols_list) < 2:
@@ -361,75 +593,75 @@ def compare_instruments(
             detail="Podaj co najmniej dwa symbole, np. AAPL,MSFT",
         )
 
+    benchmark = benchmark.strip().upper() if benchmark and benchmark.strip() else None
+    fetch_symbols = symbols_list
+    if benchmark and benchmark not in symbols_list:
+        fetch_symbols = symbols_list + [benchmark]
+
+    series_by_symbol, errors = await service.fetch_series_concurrent(
+        symbols=fetch_symbols, start=start, end=end
+    )
+
+    columns: Dict[str, QuoteSeries] = {}
+    for sym in fetch_symbols:
+        quotes = series_by_symbol.get(sym)
+        if quotes is None or not len(quotes):
+            errors.setdefault(sym, f"Brak danych dla symbolu {sym} w podanym zakresie")
+            continue
+        columns[sym] = quotes
+
     series: Dict[str, List[ComparisonPointDTO]] = {}
     metrics: List[InstrumentMetricsDTO] = []
 
-    for sym in symbols_list:
-        quotes = service.fetch_and_store_history(symbol=sym, start=start, end=end)
-        if not quotes:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Brak danych dla symbolu {sym} w podanym zakresie",
-            )
+    if columns:
+        dates, aligned_symbols, closes = analytics.align_closes(columns)
+        col_of = {sym: col for col, sym in enumerate(aligned_symbols)}
+        values = analytics.compute_metrics(
+            dates,
+            closes,
+            benchmark_col=col_of.get(benchmark),
+            risk_free_rate=risk_free_rate,
+        )
 
-        closes = [q.close for q in quotes]
-        base_price = closes[0] if closes[0] > 0 else 1.0
-
-        points: List[ComparisonPointDTO] = []
-        for q in quotes:
-            normalized = (q.close / base_price) * 100.0
-            points.append(
-                ComparisonPointDTO(
-                    date=q.date,
-                    close=q.close,
-                    normalized=normalized,
+        for sym in symbols_list:
+            if sym not in columns:
+                continue
+            quotes = columns[sym]
+            base_price = quotes.close[0] if quotes.close[0] > 0 else 1.0
+            normalized = quotes.close / base_price * 100.0
+            series[sym] = [
+                ComparisonPointDTO(date=d, close=c, normalized=n)
+                for d, c, n in zip(
+                    quotes.dates.astype(object), quotes.close.tolist(), normalized.tolist()
                 )
-            )
-        series[sym] = points
-
-        if len(closes) >= 2:
-            total_return = (closes[-1] / closes[0] - 1.0) * 100.0
-
-            daily_returns = [
-                (closes[i] / closes[i - 1] - 1.0)
-                for i in range(1, len(closes))
-                if closes[i - 1] > 0
             ]
-            if len(daily_returns) >= 2:
-                volatility_pct = statistics.pstdev(daily_returns) * 100.0
-            else:
-                volatility_pct = 0.0
-
-            peak = closes[0]
-            max_drawdown_pct = 0.0
-            for c in closes:
-                if c > peak:
-                    peak = c
-                drawdown = (c / peak - 1.0) * 100.0
-                if drawdown < max_drawdown_pct:
-                    max_drawdown_pct = drawdown
-        else:
-            total_return = 0.0
-            volatility_pct = 0.0
-            max_drawdown_pct = 0.0
-
-        metrics.append(
-            InstrumentMetricsDTO(
-                symbol=sym,
-                return_pct=total_return,
-                volatility_pct=volatility_pct,
-                max_drawdown_pct=max_drawdown_pct,
+            metrics.append(
+                InstrumentMetricsDTO(
+                    symbol=sym,
+                    **analytics.column_metrics(values, col_of[sym]),
+                )
             )
+
+    if not series:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Brak danych dla symboli {', '.join(symbols_list)} w podanym zakresie",
         )
 
     # LOG
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Porównanie instrumentów: {', '.join(symbols_list)} od {start} do {end}",
-        level="INFO",
+        level="INFO" if not errors else "WARNING",
         source="UC4_COMPARE",
+        details="; ".join(f"{sym}: {reason}" for sym, reason in errors.items()) or None,
     )
 
-    return ComparisonResponse(symbols=symbols_list, series=series, metrics=metrics)
+    return ComparisonResponse(
+        symbols=list(series),
+        series=series,
+        metrics=metrics,
+        errors=errors,
+    )
 
 
 # ========================
@@ -437,7 +669,8 @@ def compare_instruments(
 # ========================
 
 @app.get("/api/logs", response_model=List[LogEntryDTO])
-def get_logs(
+async def get_logs(
+    response: Response,
     level: Optional[str] = Query(
         None, description="Poziom logu: INFO / WARNING / ERROR"
     ),
@@ -450,35 +683,77 @@ def get_logs(
     date_to: Optional[datetime] = Query(
         None, description="Koniec zakresu (ISO 8601)"
     ),
-    db: Session = Depends(get_db),
+    limit: int = Query(
+        500, ge=1, le=5000, description="Maksymalna liczba wpisów na stronie"
+    ),
+    cursor: Optional[str] = Query(
+        None, description="Kursor następnej strony (nagłówek X-Next-Cursor)"
+    ),
+    search: Optional[str] = Query(
+        None, description="Szukane słowa w treści logu (wszystkie muszą wystąpić), np. AAPL"
+    ),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    UC6 – Panel logów: pobranie listy logów z filtrami.
+    UC6 – Panel logów: pobranie listy logów z filtrami, od najnowszych.
+    Gdy są kolejne wpisy, nagłówek X-Next-Cursor zawiera kursor następnej strony.
     """
-    service = LogService(db)
-    logs = service.list_logs(
-        level=level, source=source, date_from=date_from, date_to=date_to
-    )
+    service = AsyncLogService(db)
+    try:
+        logs, next_cursor = await service.list_logs_page(
+            level=level,
+            source=source,
+            date_from=date_from,
+            date_to=date_to,
+            limit=limit,
+            cursor=cursor,
+            search=search,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return logs
 
 
+@app.get("/api/logs/stats", response_model=List[LogStatsDTO])
+async def get_log_stats(
+    date_from: Optional[datetime] = Query(None, description="Początek zakresu (ISO 8601)"),
+    date_to: Optional[datetime] = Query(None, description="Koniec zakresu (ISO 8601)"),
+    level: Optional[str] = Query(None),
+    source: Optional[str] = Query(None),
+    bucket: Literal["hour", "day"] = Query("hour", description="Szerokość przedziału"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    UC6 – statystyki logów: liczba wpisów per przedział czasu, poziom i źródło
+    (z zagregowanej tabeli log_rollups, bez pobierania samych logów).
+    """
+    return await AsyncLogService(db).log_stats(
+        date_from=date_from,
+        date_to=date_to,
+        level=level,
+        source=source,
+        bucket=bucket,
+    )
+
+
 @app.get("/api/logs/export")
-def export_logs_csv(
+async def export_logs_csv(
     level: Optional[str] = Query(None),
     source: Optional[str] = Query(None),
     date_from: Optional[datetime] = Query(None),
     date_to: Optional[datetime] = Query(None),
-    db: Session = Depends(get_db),
+    search: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    UC6 – eksport logów do pliku CSV.
+    UC6 – eksport logów do pliku CSV (strumieniowo, paczkami z kursora).
     """
-    service = LogService(db)
-    logs = service.list_logs(
-        level=level, source=source, date_from=date_from, date_to=date_to
-    )
+    service = AsyncLogService(db)
 
-    def generate():
+    async def generate():
         output = io.StringIO()
         writer = csv.writer(output)
 
@@ -487,20 +762,31 @@ def export_logs_csv(
         output.seek(0)
         output.truncate(0)
 
-        for l in logs:
-            writer.writerow(
-                [
-                    l.id,
-                    l.timestamp.isoformat() if l.timestamp else "",
-                    l.level,
-                    l.source or "",
-                    l.message,
-                    l.user_email or "",
-                ]
-            )
-            yield output.getvalue()
-            output.seek(0)
-            output.truncate(0)
+        try:
+            async for batch in service.stream_logs(
+                level=level,
+                source=source,
+                date_from=date_from,
+                date_to=date_to,
+                search=search,
+            ):
+                for l in batch:
+                    writer.writerow(
+                        [
+                            l.id,
+                            l.timestamp.isoformat() if l.timestamp else "",
+                            l.level,
+                            l.source or "",
+                            l.message,
+                            l.user_email or "",
+                        ]
+                    )
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+        finally:
+            # sesja z Depends mogła już zostać zamknięta – zwalniamy połączenie sami
+            await db.close()
 
     return StreamingResponse(
         generate(),
@@ -510,14 +796,27 @@ def export_logs_csv(
 
 
 @app.delete("/api/logs")
-def clear_logs(db: Session = Depends(get_db)):
+async def clear_logs(
+    date_from: Optional[datetime] = Query(
+        None, description="Usuń logi od (ISO 8601); bez zakresu – wszystkie"
+    ),
+    date_to: Optional[datetime] = Query(None, description="Usuń logi do (ISO 8601)"),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    UC6 – Reset logów: usuń wszystkie wpisy z tabeli logs.
+    UC6 – Reset logów: usuń wpisy z tabeli logs (całość albo zakres dat).
+    Całe miesiące w zakresie są czyszczone przez partycje – `deleted`
+    liczy tylko wiersze usunięte DELETE-m.
     """
-    total = db.query(LogEntry).count()
-    db.execute(delete(LogEntry))
-    db.commit()
-    return {"status": "OK", "deleted": total}
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(422, detail="date_from cannot be after date_to")
+
+    result = await AsyncLogService(db).clear_logs(date_from=date_from, date_to=date_to)
+    return {
+        "status": "OK",
+        "deleted": result["deleted"],
+        "truncated_partitions": [m.strftime("%Y-%m") for m in result["truncated_partitions"]],
+    }
 
 
 # ========================
@@ -525,14 +824,14 @@ def clear_logs(db: Session = Depends(get_db)):
 # ========================
 
 @app.get("/api/alerts", response_model=List[AlertResponse])
-def list_alerts(db: Session = Depends(get_db)):
+async def list_alerts(db: AsyncSession = Depends(get_async_db)):
     """
     Zwraca listę wszystkich alertów zapisanych w systemie.
     """
-    service = AlertService(db)
-    alerts = service.list_alerts()
+    service = AsyncAlertService(db)
+    alerts = await service.list_alerts()
 
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Pobrano listę alertów (liczba={len(alerts)})",
         level="INFO",
         source="UC4_ALERTS",
@@ -542,19 +841,19 @@ def list_alerts(db: Session = Depends(get_db)):
 
 
 @app.post("/api/alerts", response_model=AlertResponse)
-def create_alert(payload: AlertCreate, db: Session = Depends(get_db)):
+async def create_alert(payload: AlertCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Dodanie nowego alertu.
     """
-    service = AlertService(db)
+    service = AsyncAlertService(db)
     try:
-        alert = service.create_alert(
+        alert = await service.create_alert(
             symbol=payload.symbol,
             condition=payload.condition,
             threshold_price=payload.threshold_price,
         )
 
-        LogService(db).add_log(
+        await AsyncLogService(db).add_log(
             message=(
                 f"Utworzono alert: {alert.symbol} {alert.condition} "
                 f"{alert.threshold_price}"
@@ -569,15 +868,15 @@ def create_alert(payload: AlertCreate, db: Session = Depends(get_db)):
 
 
 @app.post("/api/alerts/{alert_id}/toggle", response_model=AlertResponse)
-def toggle_alert(alert_id: int, db: Session = Depends(get_db)):
+async def toggle_alert(alert_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Włączenie / wyłączenie monitorowania alertu.
     """
-    service = AlertService(db)
-    alert = service.toggle_alert(alert_id)
+    service = AsyncAlertService(db)
+    alert = await service.toggle_alert(alert_id)
 
     status_txt = "aktywowany" if alert.active else "dezaktywowany"
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Zmieniono status alertu id={alert_id} ({status_txt})",
         level="INFO",
         source="UC4_ALERTS",
@@ -587,14 +886,14 @@ def toggle_alert(alert_id: int, db: Session = Depends(get_db)):
 
 
 @app.delete("/api/alerts/{alert_id}", status_code=204)
-def delete_alert(alert_id: int, db: Session = Depends(get_db)):
+async def delete_alert(alert_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Usunięcie alertu.
     """
-    service = AlertService(db)
-    service.delete_alert(alert_id)
+    service = AsyncAlertService(db)
+    await service.delete_alert(alert_id)
 
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Usunięto alert id={alert_id}",
         level="WARNING",
         source="UC4_ALERTS",
@@ -604,14 +903,14 @@ def delete_alert(alert_id: int, db: Session = Depends(get_db)):
 
 
 @app.post("/api/alerts/check", response_model=AlertCheckResponse)
-def check_alerts(db: Session = Depends(get_db)):
+async def check_alerts(db: AsyncSession = Depends(get_async_db)):
     """
     Sprawdzenie alertów (monitoring w tle).
     """
-    service = AlertService(db)
-    triggered = service.check_alerts()
+    service = AsyncAlertService(db)
+    triggered = await service.check_alerts()
 
-    LogService(db).add_log(
+    await AsyncLogService(db).add_log(
         message=f"Sprawdzono alerty (wyzwolone: {len(triggered)})",
         level="INFO",
         source="UC4_ALERTS_CHECK",
@@ -629,6 +928,7 @@ def start_scheduler():
 def stop_scheduler():
     scheduler.shutdown()
     print("APScheduler stopped")
+    log_writer.close()
 
 def fetch_daily_popular():
     for symbol in ["AAPL", "MSFT", "GOOGL"]:
@@ -641,11 +941,31 @@ def backup_db():
 def check_alerts():
     db = SessionLocal()
     try:
-        service = MarketDataService(db)
+        service = AlertService(db)
         service.check_alerts()
     finally:
         db.close()
 
+def maintain_log_storage():
+    """Nowe partycje logów na kolejne miesiące + retencja (LOG_RETENTION_MONTHS)."""
+    db = SessionLocal()
+    try:
+        storage = LogStorage(db)
+        storage.ensure_partitions()
+        expired = storage.apply_retention()
+        if expired:
+            LogService(db).add_log(
+                message=(
+                    "Usunięto logi z miesięcy: "
+                    + ", ".join(m.strftime("%Y-%m") for m in expired)
+                ),
+                level="INFO",
+                source="LOG_RETENTION",
+            )
+    finally:
+        db.close()
+
 scheduler.add_job(fetch_daily_popular, "cron", hour=2)  # codziennie o 02:00
+scheduler.add_job(maintain_log_storage, "cron", hour=3)  # codziennie o 03:00
 scheduler.add_job(check_alerts, "interval", minutes=1)
 scheduler.add_job(backup_db, "cron", hour=0)  # codziennie o północy
\ No newline at end of file
@@ -10,9 +10,15 @@ from sqlalchemy import (
     Boolean,
     ForeignKey,   
     UniqueConstraint,
+    Index,
+    BigInteger,
 )
+from sqlalchemy import DDL, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import PrimaryKeyConstraint
 
 from db import Base
 
@@ -59,6 +65,80 @@ class HistoricalQuote(Base):
     )
 
 
+class QuoteRollup(Base):
+    """
+    Świece tygodniowe/miesięczne/kwartalne/roczne wyliczone z historical_quotes
+    (period_start = poniedziałek / pierwszy dzień okresu). Przeliczane dla
+    dotkniętych lat przy każdym zapisie notowań dziennych.
+    """
+    __tablename__ = "quote_rollups"
+
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), primary_key=True)
+    resolution = Column(String(7), primary_key=True)  # week, month, quarter, year
+    period_start = Column(Date, primary_key=True)
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=True)
+
+
+class IntradayBar(Base):
+    """
+    Świece śródsesyjne (1m, 5m, 1h, ...) – osobno od dziennych
+    historical_quotes, bo tam klucz (instrument, data) skleja je w jeden
+    wiersz na dzień. Klucz główny (instrument, interwał, czas) jest zarazem
+    indeksem pod odczyt zakresu czasu jednego instrumentu; bez sztucznego
+    id, ceny jako REAL (4 B), żeby wiersz był jak najmniejszy.
+    """
+    __tablename__ = "intraday_bars"
+
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), primary_key=True)
+    interval = Column(String(3), primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)  # początek świecy, UTC
+    open = Column(Float(precision=24), nullable=True)
+    high = Column(Float(precision=24), nullable=True)
+    low = Column(Float(precision=24), nullable=True)
+    close = Column(Float(precision=24), nullable=False)
+    volume = Column(BigInteger, nullable=True)
+
+
+class LatestQuote(Base):
+    """
+    Najnowsze notowanie instrumentu – utrzymywane przy zapisie historii,
+    żeby bieżąca cena nie wymagała czytania całej tabeli historical_quotes.
+    """
+    __tablename__ = "latest_quotes"
+
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), primary_key=True)
+    date = Column(Date, nullable=False)
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class HistoryCoverage(Base):
+    """
+    Rejestr zakresów dat (włącznie), które zostały już pobrane z Yahoo
+    dla danego instrumentu i interwału. Zakresy są scalane przy zapisie,
+    więc dla pary (instrument, interwał) nie nachodzą na siebie.
+    """
+    __tablename__ = "history_coverage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=False)
+    interval = Column(String(10), nullable=False, default="1d")
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index("ix_coverage_instrument_interval", "instrument_id", "interval", "start_date"),
+    )
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -118,6 +198,16 @@ from sqlalchemy import Column, Integer, String, DateTime, Text
 
 class LogEntry(Base):
     __tablename__ = "logs"
+    __table_args__ = (
+        # stronicowanie keyset: ORDER BY timestamp DESC, id DESC
+        Index("ix_logs_timestamp_id", "timestamp", "id"),
+        {
+            # na PostgreSQL: partycje miesięczne (patrz log_storage.LogStorage);
+            # SQLite nie partycjonuje – miesiące to zakresy po indeksie na timestamp
+            "postgresql_partition_by": "RANGE (timestamp)",
+            "info": {"partition_columns": ("timestamp",)},
+        },
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     from zoneinfo import ZoneInfo
@@ -132,4 +222,121 @@ class LogEntry(Base):
     source = Column(String(50), nullable=True, index=True)  # np. "UC1", "UC4", "PORTFOLIO"
     message = Column(Text, nullable=False)
     user_email = Column(String(255), nullable=True)
-    details = Column(Text, nullable=True)
\ No newline at end of file
+    details = Column(Text, nullable=True)
+
+
+class LogRollup(Base):
+    """
+    Liczba wpisów logu na godzinę / poziom / źródło, aktualizowana przy
+    zapisie każdej paczki przez LogWriter. Brak źródła zapisujemy jako "".
+    """
+
+    __tablename__ = "log_rollups"
+
+    bucket = Column(DateTime, primary_key=True)  # początek godziny
+    level = Column(String(20), primary_key=True)
+    source = Column(String(50), primary_key=True, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _primary_key_with_partition_columns(constraint, compiler, **kw):
+    """
+    PostgreSQL wymaga, żeby klucz główny tabeli partycjonowanej zawierał
+    kolumny partycjonowania – dopisujemy te z info["partition_columns"].
+    Model (i SQLite) zostaje przy samym id.
+    """
+    text = compiler.visit_primary_key_constraint(constraint, **kw)
+    extra = [
+        name
+        for name in constraint.table.info.get("partition_columns", ())
+        if name not in constraint.columns
+    ]
+    if not text or not extra:
+        return text
+    end = text.rindex(")")
+    columns = ", ".join(compiler.preparer.quote(name) for name in extra)
+    return f"{text[:end]}, {columns}{text[end:]}"
+
+
+# wiersze spoza utworzonych partycji miesięcznych trafiają do partycji domyślnej
+event.listen(
+    LogEntry.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS logs_default PARTITION OF logs DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
+# =========================
+# Wyszukiwanie pełnotekstowe w logach (message + details)
+# =========================
+
+# wyrażenie indeksu GIN na PostgreSQL – zapytania muszą używać identycznego
+LOG_TSVECTOR_SQL = "to_tsvector('simple', coalesce(message, '') || ' ' || coalesce(details, ''))"
+
+
+def fts5_query(text: str) -> str:
+    """Słowa jako frazy FTS5 (w cudzysłowach) – wszystkie muszą wystąpić."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class log_text_match(FunctionElement):
+    """
+    Warunek WHERE: wpis logu zawiera wszystkie słowa z `text`.
+    PostgreSQL – tsvector/GIN, SQLite – tabela FTS5 `logs_fts`.
+    """
+
+    type = Boolean()
+    inherit_cache = True
+    name = "log_text_match"
+
+    def __init__(self, text: str):
+        # oba warianty jako parametry – kompilacja bierze ten dla swojego dialektu
+        super().__init__(text, fts5_query(text))
+
+
+@compiles(log_text_match, "postgresql")
+def _log_text_match_postgresql(element, compiler, **kw):
+    text, _ = element.clauses
+    return f"{LOG_TSVECTOR_SQL} @@ plainto_tsquery('simple', {compiler.process(text, **kw)})"
+
+
+@compiles(log_text_match, "sqlite")
+def _log_text_match_sqlite(element, compiler, **kw):
+    _, query = element.clauses
+    return f"logs.id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH {compiler.process(query, **kw)})"
+
+
+# indeks per dialekt: PostgreSQL – GIN nad LOG_TSVECTOR_SQL, SQLite – FTS5
+# nad tabelą logs (external content) + triggery synchronizujące. Tworzony
+# przy create_all, a dla istniejących baz przez LogStorage.ensure_search_index.
+LOG_FTS_DDL = {
+    "postgresql": (
+        f"CREATE INDEX IF NOT EXISTS ix_logs_fts ON logs USING gin ({LOG_TSVECTOR_SQL})",
+    ),
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts "
+        "USING fts5(message, details, content='logs', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS logs_fts_ai AFTER INSERT ON logs BEGIN "
+        "INSERT INTO logs_fts(rowid, message, details) VALUES (new.id, new.message, new.details); END",
+        "CREATE TRIGGER IF NOT EXISTS logs_fts_ad AFTER DELETE ON logs BEGIN "
+        "INSERT INTO logs_fts(logs_fts, rowid, message, details) "
+        "VALUES ('delete', old.id, old.message, old.details); END",
+        "CREATE TRIGGER IF NOT EXISTS logs_fts_au AFTER UPDATE ON logs BEGIN "
+        "INSERT INTO logs_fts(logs_fts, rowid, message, details) "
+        "VALUES ('delete', old.id, old.message, old.details); "
+        "INSERT INTO logs_fts(rowid, message, details) VALUES (new.id, new.message, new.details); END",
+    ),
+}
+
+for _dialect, _statements in LOG_FTS_DDL.items():
+    for _statement in _statements:
+        event.listen(LogEntry.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+
+event.listen(
+    LogEntry.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS logs_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,267 @@
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# kolumny liczbowe w kolejności OHLCV
+FIELDS = ("open", "high", "low", "close", "volume")
+
+# nazwy kolumn w DataFrame zwracanym przez yfinance
+_FRAME_COLUMNS = {
+    "open": "Open",
+    "high": "High",
+    "low": "Low",
+    "close": "Close",
+    "volume": "Volume",
+}
+
+
+# interwały yfinance krótsze niż dzień – świece z godziną, nie tylko datą
+INTRADAY_INTERVALS = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h")
+
+
+def is_intraday(interval: str) -> bool:
+    return interval in INTRADAY_INTERVALS
+
+
+# agregacje świec dziennych (QuoteSeries.resample)
+RESOLUTIONS = ("week", "month", "quarter", "year")
+
+
+def period_starts(dates: np.ndarray, resolution: str) -> np.ndarray:
+    """Początek okresu (poniedziałek / 1. dzień miesiąca, kwartału, roku) dla każdej daty."""
+    dates = dates.astype("datetime64[D]")
+    if resolution == "week":
+        # 1970-01-01 to czwartek -> dzień tygodnia (pon = 0) to (dni + 3) % 7
+        weekday = (dates.astype("int64") + 3) % 7
+        return dates - weekday.astype("timedelta64[D]")
+    if resolution == "month":
+        return dates.astype("datetime64[M]").astype("datetime64[D]")
+    if resolution == "quarter":
+        months = dates.astype("datetime64[M]").astype("int64")
+        return (months - months % 3).astype("datetime64[M]").astype("datetime64[D]")
+    if resolution == "year":
+        return dates.astype("datetime64[Y]").astype("datetime64[D]")
+    raise ValueError(f"Unsupported resolution: {resolution}")
+
+
+def period_start(value: date, resolution: str) -> date:
+    """Początek okresu zawierającego jedną datę (jak period_starts)."""
+    return period_starts(np.array([value], dtype="datetime64[D]"), resolution)[0].astype(object)
+
+
+# Format binarny (to_bytes): nagłówek 16 B = magic, wersja, flagi, liczba świec,
+# potem kolumny float64 OHLCV i daty jako int32 (dni od 1970-01-01), little-endian.
+_BINARY_MAGIC = b"QSER"
+_BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<4sBBxxQ")
+_FLAG_ZLIB = 0x01
+
+
+def _nan_to_none(values: np.ndarray) -> np.ndarray:
+    """float64 -> tablica obiektów z None w miejscu NaN (bez pętli po wierszach)."""
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out
+
+
+@dataclass(frozen=True)
+class QuoteSeries:
+    """
+    Kolumnowy szereg notowań OHLCV:
+    - dates: datetime64[D], rosnąco (świece śródsesyjne: datetime64[s], UTC),
+    - open/high/low/close/volume: float64, NaN = brak wartości.
+
+    Tablice traktujemy jako niezmienne – metody zwracają nowe obiekty.
+    """
+
+    dates: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "QuoteSeries":
+        return cls(
+            np.empty(0, dtype="datetime64[D]"),
+            *(np.empty(0, dtype="float64") for _ in FIELDS),
+        )
+
+    @classmethod
+    def from_frame(cls, df, intraday: bool = False) -> "QuoteSeries":
+        """
+        DataFrame z yfinance (indeks Date/Datetime, kolumny Open..Volume).
+        Świece bez ceny zamknięcia są pomijane. `intraday` zachowuje czas
+        świecy (UTC, z dokładnością do sekundy) zamiast samej daty sesji.
+        """
+        if df is None or df.empty:
+            return cls.empty()
+
+        index = df.index
+        if intraday:
+            if getattr(index, "tz", None) is not None:
+                index = index.tz_convert("UTC").tz_localize(None)
+            dates = index.values.astype("datetime64[s]")
+        else:
+            if getattr(index, "tz", None) is not None:
+                # czas lokalny giełdy -> data sesji
+                index = index.tz_localize(None)
+            dates = index.values.astype("datetime64[D]")
+
+        columns = {
+            field: df[column].to_numpy(dtype="float64", na_value=np.nan)
+            for field, column in _FRAME_COLUMNS.items()
+        }
+
+        valid = ~np.isnan(columns["close"])
+        if not valid.all():
+            dates = dates[valid]
+            columns = {field: values[valid] for field, values in columns.items()}
+
+        return cls(dates=dates, **columns)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "QuoteSeries":
+        """Lista słowników (format `simple_yahoo_api.get_history`) -> kolumny."""
+        records = list(records)
+        if not records:
+            return cls.empty()
+        return cls(
+            dates=np.array([r["date"] for r in records], dtype="datetime64[D]"),
+            **{
+                field: np.array([r[field] for r in records], dtype="float64")
+                for field in FIELDS
+            },
+        )
+
+    @classmethod
+    def concat(cls, parts: Iterable["QuoteSeries"]) -> "QuoteSeries":
+        """Sklejenie kilku szeregów (bez sortowania – patrz deduplicated)."""
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(
+            dates=np.concatenate([part.dates for part in parts]),
+            **{
+                field: np.concatenate([getattr(part, field) for part in parts])
+                for field in FIELDS
+            },
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def slice(self, start=None, end=None) -> "QuoteSeries":
+        """Podzakres [start, end] (włącznie) wyznaczony bisekcją po datach."""
+        lo = 0
+        hi = len(self)
+        if start is not None:
+            lo = int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(self.dates, np.datetime64(end, "D"), side="right"))
+        return QuoteSeries(
+            dates=self.dates[lo:hi],
+            **{field: getattr(self, field)[lo:hi] for field in FIELDS},
+        )
+
+    def tail(self, n: int = 1) -> "QuoteSeries":
+        """Ostatnie `n` świec."""
+        lo = max(len(self) - n, 0)
+        return QuoteSeries(
+            dates=self.dates[lo:],
+            **{field: getattr(self, field)[lo:] for field in FIELDS},
+        )
+
+    def to_bytes(self, compress: bool = True) -> bytes:
+        """Zwarta reprezentacja binarna (opcjonalnie zlib) – np. do Redisa."""
+        body = b"".join(
+            [getattr(self, field).astype("<f8").tobytes() for field in FIELDS]
+            + [self.dates.astype("<i4").tobytes()]
+        )
+        flags = 0
+        if compress:
+            body = zlib.compress(body, 1)
+            flags |= _FLAG_ZLIB
+        return _BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION, flags, len(self)) + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "QuoteSeries":
+        """Odwrotność to_bytes; kolumny float64 są widokami na bufor (bez kopiowania)."""
+        magic, version, flags, count = _BINARY_HEADER.unpack_from(data)
+        if magic != _BINARY_MAGIC or version != _BINARY_VERSION:
+            raise ValueError("Nieobsługiwany format QuoteSeries")
+
+        body = memoryview(data)[_BINARY_HEADER.size:]
+        if flags & _FLAG_ZLIB:
+            body = zlib.decompress(body)
+
+        columns = {}
+        offset = 0
+        for field in FIELDS:
+            columns[field] = np.frombuffer(body, dtype="<f8", count=count, offset=offset)
+            offset += 8 * count
+        days = np.frombuffer(body, dtype="<i4", count=count, offset=offset)
+        return cls(dates=days.astype("datetime64[D]"), **columns)
+
+    def deduplicated(self) -> "QuoteSeries":
+        """Jedna świeca na dzień (ostatnia wygrywa), posortowane po dacie."""
+        if len(self) < 2 or (np.diff(self.dates) > np.timedelta64(0, "D")).all():
+            return self
+
+        # np.unique na odwróconych datach daje indeks ostatniego wystąpienia
+        _, first_from_end = np.unique(self.dates[::-1], return_index=True)
+        keep = len(self) - 1 - first_from_end
+        return QuoteSeries(
+            dates=self.dates[keep],
+            **{field: getattr(self, field)[keep] for field in FIELDS},
+        )
+
+    def resample(self, resolution: str) -> "QuoteSeries":
+        """
+        Świece dzienne -> tygodniowe/miesięczne/kwartalne/roczne (daty = początki
+        okresów): open pierwszej świecy, high/low skrajne, close ostatniej,
+        volume suma. Braki (NaN) są pomijane; szereg musi być posortowany.
+        """
+        if not len(self):
+            return QuoteSeries.empty()
+
+        keys = period_starts(self.dates, resolution)
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        last = np.r_[first[1:], len(self)] - 1
+
+        open_ = self.open[first]
+        for group in np.flatnonzero(np.isnan(open_)):
+            # pierwsza świeca okresu bez open – bierzemy pierwszy znany
+            values = self.open[first[group]:last[group] + 1]
+            known = values[~np.isnan(values)]
+            if len(known):
+                open_[group] = known[0]
+
+        known_volume = np.add.reduceat((~np.isnan(self.volume)).astype("int64"), first)
+        volume = np.add.reduceat(np.nan_to_num(self.volume), first)
+        volume[known_volume == 0] = np.nan
+
+        return QuoteSeries(
+            dates=keys[first],
+            open=open_,
+            high=np.fmax.reduceat(self.high, first),
+            low=np.fmin.reduceat(self.low, first),
+            close=self.close[last],
+            volume=volume,
+        )
+
+    def to_records(self) -> List[Dict]:
+        """Kolumny -> lista słowników z `datetime.date` i None zamiast NaN."""
+        if not len(self):
+            return []
+        keys = ("date",) + FIELDS
+        columns = [self.dates.astype(object)]
+        columns += [_nan_to_none(getattr(self, field)) for field in FIELDS]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
@@ -1,25 +1,68 @@
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, timedelta, datetime
-from typing import List, Dict, Optional
-
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
+import base64
+import csv
+import io
+import threading
+
+import numpy as np
+from sqlalchemy import Select, and_, func, or_, select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 import yfinance as yf
 from zoneinfo import ZoneInfo
 
+from db import upsert_insert
+
 # 🔥 WAŻNE – importujemy modele BEZ "import models"
 from models import (
     Instrument,
     HistoricalQuote,
+    HistoryCoverage,
+    IntradayBar,
+    LatestQuote,
+    QuoteRollup,
     Currency,
     User,
     Portfolio,
     Position,
     Alert,
     LogEntry,
+    LogRollup,
+    log_text_match,
 )
 
 # 🔥 Cache
-from cache import cache_get, cache_set
+from cache import (
+    bump_generation,
+    cache_get,
+    cache_get_encoded,
+    cache_set,
+    cache_set_encoded,
+    distributed_lock,
+    get_generation,
+)
+from log_writer import log_record, log_writer, rollup_bucket
+from quote_series import FIELDS, RESOLUTIONS, QuoteSeries, is_intraday, period_start
+from singleflight import SingleFlight
+from tsstore import get_time_series_store
+
+# Współbieżne pobrania tych samych luk (symbol, interwał, zakresy) w procesie
+# są łączone w jedno zapytanie do Yahoo / jeden zapis do bazy.
+_upstream_flights = SingleFlight()
+
+
+# Funkcje wołane po zapisaniu (i commicie) nowych notowań:
+# listener(db, symbol, series) – `series` to świeżo pobrane świece.
+_quote_listeners: List[Callable[[Session, str, QuoteSeries], None]] = []
+
+
+def register_quote_listener(listener: Callable[[Session, str, QuoteSeries], None]):
+    """Rejestruje hook wywoływany przy każdym ingeście notowań (np. alerty)."""
+    _quote_listeners.append(listener)
+    return listener
 
 
 class MarketDataService:
@@ -50,6 +93,23 @@ class MarketDataService:
 
     # --- Historia ---
 
+    # Ostatnie dni są zawsze pobierane ponownie, nawet jeśli rejestr pokrycia
+    # twierdzi, że już je mamy (świeca z bieżącego dnia, korekty Yahoo).
+    HOT_TAIL_DAYS = 3
+    # ...ale nie częściej niż co tyle sekund (wpis w cache z pobranym
+    # fragmentem ogona, wspólny dla workerów przez Redis).
+    HOT_TAIL_REFRESH_SECONDS = 300
+
+    # Liczba wierszy w jednym INSERT ... ON CONFLICT (7 parametrów na wiersz,
+    # starsze SQLite mają limit 999 parametrów na zapytanie).
+    UPSERT_CHUNK_SIZE = 140
+    # to samo dla intraday_bars (8 parametrów na wiersz) i quote_rollups (8)
+    INTRADAY_UPSERT_CHUNK_SIZE = 120
+    ROLLUP_UPSERT_CHUNK_SIZE = 120
+
+    # Maksymalna liczba równoległych zapytań do Yahoo (np. w /api/compare).
+    MAX_CONCURRENT_FETCHES = 8
+
     def fetch_and_store_history(
         self,
         symbol: str,
@@ -57,106 +117,903 @@ class MarketDataService:
         end: date,
         interval: str = "1d",
     ) -> List[HistoricalQuote]:
+        """
+        Dociąga z Yahoo tylko brakujące fragmenty zakresu [start, end]
+        (wg rejestru HistoryCoverage) i zwraca wszystkie notowania z zakresu.
+        Interwały śródsesyjne idą do intraday_bars (fetch_and_store_intraday).
+        """
+        if is_intraday(interval):
+            return self.fetch_and_store_intraday(symbol, start, end, interval)
+        instrument = self.get_or_create_instrument(symbol)
+        self._ensure_history(instrument.id, symbol, start, end, interval)
+        return self._query_range(instrument.id, start, end)
+
+    def fetch_and_store_intraday(
+        self,
+        symbol: str,
+        start: date,
+        end: date,
+        interval: str = "5m",
+    ) -> List[IntradayBar]:
+        """Jak fetch_and_store_history, ale dla świec śródsesyjnych (tabela intraday_bars)."""
+        if not is_intraday(interval):
+            raise ValueError(f"Not an intraday interval: {interval}")
         instrument = self.get_or_create_instrument(symbol)
+        self._ensure_history(instrument.id, symbol, start, end, interval)
+        return self._query_intraday(instrument.id, interval, start, end)
+
+    def _ensure_history(
+        self,
+        instrument_id: int,
+        symbol: str,
+        start: date,
+        end: date,
+        interval: str,
+    ) -> None:
+        gaps = self._missing_ranges(instrument_id, start, end, interval)
+        if gaps:
+            self.ingest_history(instrument_id, symbol, gaps, start, end, interval)
+
+    def plan_history(
+        self,
+        symbol: str,
+        start: date,
+        end: date,
+        interval: str = "1d",
+    ) -> Tuple[int, List[Tuple[date, date]]]:
+        """
+        Id instrumentu i luki w pokryciu [start, end] – bez pobierania.
+        Wersja async liczy to na AsyncSession, a do puli upstream wysyła
+        tylko faktyczne pobrania (ingest_history).
+        """
+        instrument = self.get_or_create_instrument(symbol)
+        return instrument.id, self._missing_ranges(instrument.id, start, end, interval)
+
+    def ingest_history(
+        self,
+        instrument_id: int,
+        symbol: str,
+        gaps: List[Tuple[date, date]],
+        start: date,
+        end: date,
+        interval: str = "1d",
+    ) -> None:
+        """
+        Pobiera z Yahoo luki wyznaczone przez plan_history. Równoległe żądania
+        o te same luki czekają na jedno pobranie (single-flight).
+        """
+        _upstream_flights.do(
+            ("ingest", symbol, interval, tuple(gaps)),
+            lambda: self._ingest_missing(instrument_id, symbol, start, end, interval),
+        )
+
+    def _ingest_missing(
+        self,
+        instrument_id: int,
+        symbol: str,
+        start: date,
+        end: date,
+        interval: str,
+    ) -> None:
+        """
+        Pobiera i zapisuje luki pod lockiem między workerami. Luki wyznaczane
+        są ponownie już pod lockiem – inny worker mógł je właśnie uzupełnić.
+        """
+        with distributed_lock(f"ingest:{symbol}:{interval}"):
+            gaps = self._missing_ranges(instrument_id, start, end, interval)
+            downloads = self._download_ranges(symbol, gaps, interval)
+            changed = self._store_downloads(instrument_id, interval, downloads)
+            self.db.commit()
+
+        if changed:
+            self._notify_quotes_stored({symbol: QuoteSeries.concat(s for _, s in downloads)}, interval)
+
+    def plan_histories(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date,
+        interval: str = "1d",
+    ) -> Dict[str, Tuple[int, List[Tuple[date, date]]]]:
+        """plan_history dla wielu symboli: symbol -> (id instrumentu, luki)."""
+        return {symbol: self.plan_history(symbol, start, end, interval) for symbol in symbols}
+
+    def ingest_concurrent(
+        self,
+        symbols: List[str],
+        plans: Dict[str, Tuple[int, List[Tuple[date, date]]]],
+        interval: str = "1d",
+    ) -> Dict[str, str]:
+        """
+        Równolegle pobiera luki z plan_histories (co najwyżej
+        MAX_CONCURRENT_FETCHES zapytań do Yahoo naraz, np. /api/compare)
+        i zapisuje je w bieżącym wątku, więc sesja nie jest współdzielona.
+        Zwraca błędy per symbol – błąd jednego symbolu nie przerywa pozostałych.
+        """
+        to_fetch = [symbol for symbol in symbols if plans[symbol][1]]
+
+        errors: Dict[str, str] = {}
+        stored: Dict[str, QuoteSeries] = {}
+        if to_fetch:
+            workers = min(self.MAX_CONCURRENT_FETCHES, len(to_fetch))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(self._download_ranges, symbol, plans[symbol][1], interval): symbol
+                    for symbol in to_fetch
+                }
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        downloads = future.result()
+                    except Exception as e:
+                        errors[symbol] = str(e) or e.__class__.__name__
+                        continue
+                    if self._store_downloads(plans[symbol][0], interval, downloads):
+                        stored[symbol] = QuoteSeries.concat(s for _, s in downloads)
+
+        self.db.commit()
+        self._notify_quotes_stored(stored, interval)
+        return errors
+
+    def _download_ranges(
+        self,
+        symbol: str,
+        gaps: List[Tuple[date, date]],
+        interval: str,
+    ) -> List[Tuple[Tuple[date, date], QuoteSeries]]:
+        """
+        Pobiera luki z Yahoo. Nie dotyka bazy – można wołać z innych wątków;
+        równoległe pobrania tych samych luk dzielą jeden wynik.
+        """
+        if not gaps:
+            return []
+        return _upstream_flights.do(
+            ("download", symbol, interval, tuple(gaps)),
+            lambda: self._download_ranges_now(symbol, gaps, interval),
+        )
 
-        # pobranie z Yahoo
+    def _download_ranges_now(
+        self,
+        symbol: str,
+        gaps: List[Tuple[date, date]],
+        interval: str,
+    ) -> List[Tuple[Tuple[date, date], QuoteSeries]]:
         import simple_yahoo_api
-        raw_data = simple_yahoo_api.get_history(symbol, start=start, end=end, interval=interval)
+        downloads = []
+        for gap_start, gap_end in gaps:
+            # yfinance traktuje `end` jako wyłączny, stąd +1 dzień
+            series = simple_yahoo_api.get_history_columns(
+                symbol,
+                start=gap_start,
+                end=gap_end + timedelta(days=1),
+                interval=interval,
+            )
+            downloads.append(((gap_start, gap_end), series))
+        return downloads
+
+    def _store_downloads(
+        self,
+        instrument_id: int,
+        interval: str,
+        downloads: List[Tuple[Tuple[date, date], QuoteSeries]],
+    ) -> bool:
+        """Zapisuje pobrane luki; True = zmienił się choć jeden wiersz."""
+        changed = False
+        for (gap_start, gap_end), series in downloads:
+            changed |= self._store_series(instrument_id, interval, series)
+            received = self._received_range(gap_start, gap_end, series)
+            if received is not None:
+                self._mark_covered(instrument_id, interval, *received)
+            self._mark_tail_fetched(instrument_id, interval, gap_start, gap_end)
+        return changed
+
+    def _received_range(
+        self,
+        gap_start: date,
+        gap_end: date,
+        series: QuoteSeries,
+    ) -> Optional[Tuple[date, date]]:
+        """
+        Część luki, którą można uznać za pobraną. yfinance przy chwilowym
+        błędzie / limicie zwraca często pustą ramkę zamiast wyjątku, więc
+        pusta odpowiedź dla luki z dniem roboczym -> None (pobierzemy ponownie).
+
+        Niepusta odpowiedź dla luki starszej niż hot tail pokrywa całą lukę –
+        brak świec na jej końcu to święto giełdowe albo zawieszony / wycofany
+        symbol, a nie niedokończony dzień. W ogonie zakres kończy się na
+        ostatniej świecy, a dni bez świec za nią są dołączane tylko, jeśli to
+        same weekendy.
+        """
+        if not len(series):
+            last = gap_start - timedelta(days=1)
+        elif gap_end <= date.today() - timedelta(days=self.HOT_TAIL_DAYS):
+            last = gap_end
+        else:
+            last = min(series.dates[-1].astype("datetime64[D]").astype(object), gap_end)
+        if np.busday_count(last + timedelta(days=1), gap_end + timedelta(days=1)) == 0:
+            last = gap_end
+        if last < gap_start:
+            return None
+        return gap_start, last
+
+    def _notify_quotes_stored(self, stored: Dict[str, QuoteSeries], interval: str = "1d") -> None:
+        """
+        Unieważnia cache symboli z nowymi danymi i woła zarejestrowane hooki
+        (`stored` zawiera tylko symbole, których wiersze faktycznie się zmieniły);
+        błędy hooków nie psują samego ingestu. Świece śródsesyjne nie zmieniają
+        szeregu dziennego, więc cache i magazyn szeregów zostają bez zmian.
+        """
+        for symbol, series in stored.items():
+            if not len(series):
+                continue
+            if not is_intraday(interval):
+                generation = bump_generation(self._cache_namespace(symbol))
+                self._sync_time_series_store(symbol, series, generation)
+            for listener in _quote_listeners:
+                try:
+                    listener(self.db, symbol, series)
+                except Exception as e:
+                    self.db.rollback()
+                    LogService(self.db).add_log(
+                        message=f"Błąd hooka ingestu dla {symbol}: {e}",
+                        level="ERROR",
+                        source="INGEST_HOOK",
+                    )
+
+    def _sync_time_series_store(self, symbol: str, series: QuoteSeries, generation: int) -> None:
+        """
+        Dokłada zapisane świece do lokalnego magazynu szeregów (jeśli włączony).
+        Gdy się nie uda, wpis zostaje w starej generacji – odczyt przeładuje go z bazy.
+        """
+        store = get_time_series_store()
+        if store is None:
+            return
+        try:
+            store.merge(symbol, series, generation, base_generation=generation - 1)
+        except OSError as e:
+            LogService(self.db).add_log(
+                message=f"Błąd zapisu magazynu szeregów dla {symbol}: {e}",
+                level="ERROR",
+                source="TSSTORE",
+            )
+
+    @staticmethod
+    def _cache_namespace(symbol: str) -> str:
+        return f"symbol:{symbol}"
+
+    def ingest_history_batch(
+        self,
+        symbols: List[str],
+        plans: Dict[str, Tuple[int, List[Tuple[date, date]]]],
+        interval: str = "1d",
+    ) -> None:
+        """Pobiera luki z plan_histories grupami symboli i zapisuje je w jednej transakcji."""
+        gaps = {symbol: plans[symbol][1] for symbol in symbols}
+
+        # np. hot tail całej listy obserwowanych to jedna grupa, nowy symbol – osobna
+        groups: Dict[Tuple[Tuple[date, date], ...], List[str]] = {}
+        for symbol in symbols:
+            if gaps[symbol]:
+                groups.setdefault(tuple(gaps[symbol]), []).append(symbol)
+
+        import simple_yahoo_api
+        received: Dict[str, List[QuoteSeries]] = {}
+        changed: set = set()
+        for group_gaps, group in groups.items():
+            for gap_start, gap_end in group_gaps:
+                batch = simple_yahoo_api.get_history_batch(
+                    group,
+                    start=gap_start,
+                    end=gap_end + timedelta(days=1),  # `end` wyłączny w yfinance
+                    interval=interval,
+                )
+                for symbol in group:
+                    # brak symbolu w odpowiedzi (zły ticker, błąd yfinance) = pusty szereg
+                    series = batch.get(symbol, QuoteSeries.empty())
+                    instrument_id = plans[symbol][0]
+                    if self._store_series(instrument_id, interval, series):
+                        changed.add(symbol)
+                    covered = self._received_range(gap_start, gap_end, series)
+                    if covered is not None:
+                        self._mark_covered(instrument_id, interval, *covered)
+                    self._mark_tail_fetched(instrument_id, interval, gap_start, gap_end)
+                    received.setdefault(symbol, []).append(series)
+
+        stored = {
+            symbol: QuoteSeries.concat(parts)
+            for symbol, parts in received.items()
+            if symbol in changed
+        }
 
-        quotes: List[HistoricalQuote] = []
-        for item in raw_data:
+        self.db.commit()
+        self._notify_quotes_stored(stored, interval)
+
+    def _missing_ranges(
+        self,
+        instrument_id: int,
+        start: date,
+        end: date,
+        interval: str,
+    ) -> List[Tuple[date, date]]:
+        """
+        Zwraca luki (włącznie) w pokryciu zakresu [start, end]. Ogon
+        (ostatnie HOT_TAIL_DAYS dni) jest luką, chyba że pobrano go w ciągu
+        HOT_TAIL_REFRESH_SECONDS.
+        """
+        today = date.today()
+        end = min(end, today)  # przyszłości nie ma sensu pobierać
+        if start > end:
+            return []
+
+        covered_until = today - timedelta(days=self.HOT_TAIL_DAYS)
+        fresh_tail = self._fresh_tail(instrument_id, interval)
+
+        coverage = (
+            self.db.query(HistoryCoverage)
+            .filter(
+                HistoryCoverage.instrument_id == instrument_id,
+                HistoryCoverage.interval == interval,
+                HistoryCoverage.start_date <= end,
+                HistoryCoverage.end_date >= start,
+            )
+            .order_by(HistoryCoverage.start_date.asc())
+            # świeże wartości, nawet jeśli zakres jest już w sesji
+            # (inny wątek/worker mógł go w międzyczasie rozszerzyć)
+            .populate_existing()
+            .all()
+        )
+
+        ranges = [(cov.start_date, min(cov.end_date, covered_until)) for cov in coverage]
+        if fresh_tail is not None:
+            ranges = sorted(ranges + [fresh_tail])
+
+        gaps: List[Tuple[date, date]] = []
+        cursor = start
+        for cov_start, cov_end in ranges:
+            if cov_end < cov_start or cov_end < cursor:
+                continue
+            if cov_start > cursor:
+                gaps.append((cursor, cov_start - timedelta(days=1)))
+            cursor = cov_end + timedelta(days=1)
+            if cursor > end:
+                break
+
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    @staticmethod
+    def _tail_key(instrument_id: int, interval: str) -> str:
+        return f"tail:{instrument_id}:{interval}"
+
+    def _fresh_tail(self, instrument_id: int, interval: str) -> Optional[Tuple[date, date]]:
+        """Fragment ogona pobrany w ciągu HOT_TAIL_REFRESH_SECONDS (albo None)."""
+        cached = cache_get(self._tail_key(instrument_id, interval))
+        if not cached:
+            return None
+        return date.fromisoformat(cached[0]), date.fromisoformat(cached[1])
+
+    def _mark_tail_fetched(self, instrument_id: int, interval: str, start: date, end: date) -> None:
+        """
+        Zapamiętuje, że [start, end] ∩ ogon pobrano właśnie z Yahoo (także
+        przy pustej odpowiedzi – ponowimy po HOT_TAIL_REFRESH_SECONDS).
+        HOT_TAIL_REFRESH_SECONDS = 0 – ogon pobierany przy każdym żądaniu.
+        """
+        if self.HOT_TAIL_REFRESH_SECONDS <= 0:
+            return
+        start = max(start, date.today() - timedelta(days=self.HOT_TAIL_DAYS - 1))
+        if start > end:
+            return
+        fresh = self._fresh_tail(instrument_id, interval)
+        if fresh is not None and fresh[0] <= end + timedelta(days=1) and fresh[1] >= start - timedelta(days=1):
+            start, end = min(start, fresh[0]), max(end, fresh[1])
+        cache_set(
+            self._tail_key(instrument_id, interval),
+            [start.isoformat(), end.isoformat()],
+            ttl_seconds=self.HOT_TAIL_REFRESH_SECONDS,
+        )
+
+    def _mark_covered(
+        self,
+        instrument_id: int,
+        interval: str,
+        start: date,
+        end: date,
+    ) -> None:
+        """Dopisuje [start, end] do rejestru, scalając sąsiednie i nachodzące zakresy."""
+        end = min(end, date.today())
+        if start > end:
+            return
+
+        overlapping = (
+            self.db.query(HistoryCoverage)
+            .filter(
+                HistoryCoverage.instrument_id == instrument_id,
+                HistoryCoverage.interval == interval,
+                HistoryCoverage.start_date <= end + timedelta(days=1),
+                HistoryCoverage.end_date >= start - timedelta(days=1),
+            )
+            .all()
+        )
+        for cov in overlapping:
+            start = min(start, cov.start_date)
+            end = max(end, cov.end_date)
+            self.db.delete(cov)
+
+        self.db.add(
+            HistoryCoverage(
+                instrument_id=instrument_id,
+                interval=interval,
+                start_date=start,
+                end_date=end,
+            )
+        )
+        # kolejne luki z tego samego wywołania muszą widzieć scalony zakres
+        self.db.flush()
+
+    def _store_series(self, instrument_id: int, interval: str, series: QuoteSeries) -> bool:
+        """Upsert świec; True = wstawiono albo zmieniono choć jeden wiersz."""
+        if is_intraday(interval):
+            return self._store_intraday_bars(instrument_id, interval, series)
+        return self._store_quotes(instrument_id, series)
+
+    def _store_intraday_bars(self, instrument_id: int, interval: str, series: QuoteSeries) -> bool:
+        """Zbiorczy upsert świec śródsesyjnych po kluczu (instrument, interwał, czas)."""
+        series = series.deduplicated()
+        if not len(series):
+            return False
+        timestamps = series.dates.astype("datetime64[s]").astype(object)
+        volumes = series.volume
+        rows = [
+            {
+                "instrument_id": instrument_id,
+                "interval": interval,
+                "timestamp": timestamps[i],
+                "open": record["open"],
+                "high": record["high"],
+                "low": record["low"],
+                "close": record["close"],
+                "volume": None if np.isnan(volumes[i]) else int(volumes[i]),
+            }
+            for i, record in enumerate(series.to_records())
+        ]
+
+        insert = upsert_insert(self.db)
+        if insert is None:
+            changed = False
+            for row in rows:
+                existing = self.db.get(IntradayBar, (row["instrument_id"], row["interval"], row["timestamp"]))
+                if existing is None or any(getattr(existing, f) != row[f] for f in FIELDS):
+                    self.db.merge(IntradayBar(**row))
+                    changed = True
+            return changed
+
+        changed = 0
+        for i in range(0, len(rows), self.INTRADAY_UPSERT_CHUNK_SIZE):
+            stmt = insert(IntradayBar).values(rows[i:i + self.INTRADAY_UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["instrument_id", "interval", "timestamp"],
+                set_={field: stmt.excluded[field] for field in FIELDS},
+                where=self._row_differs(IntradayBar, stmt),
+            )
+            changed += self.db.execute(stmt).rowcount
+        return changed > 0
+
+    @staticmethod
+    def _row_differs(model, stmt):
+        """
+        WHERE dla ON CONFLICT DO UPDATE: aktualizuj tylko wiersze, których
+        OHLCV się zmieniło – rowcount liczy wtedy tylko faktyczne zmiany.
+        """
+        return or_(*(model.__table__.c[field].is_distinct_from(stmt.excluded[field]) for field in FIELDS))
+
+    def _store_quotes(self, instrument_id: int, series: QuoteSeries) -> bool:
+        """
+        Zbiorczy upsert notowań po `uq_instrument_date`
+        (INSERT ... ON CONFLICT DO UPDATE), dzielony na paczki. Zwraca True,
+        gdy wstawiono albo zmieniono choć jeden wiersz – ponowne pobranie
+        tych samych świec (hot tail) nie rusza snapshotu ani rollupów.
+        """
+        # jeden wiersz na datę – przy interwałach < 1d ostatnia świeca wygrywa,
+        # a ON CONFLICT nie może dotknąć tego samego wiersza dwa razy
+        rows = series.deduplicated().to_records()
+        for row in rows:
+            row["instrument_id"] = instrument_id
+        if not rows:
+            return False
+
+        insert = upsert_insert(self.db)
+        if insert is None:
+            if not self._store_quotes_row_by_row(rows):
+                return False
+            self._update_latest_snapshot(rows[-1])
+            self._update_rollups(instrument_id, rows[0]["date"], rows[-1]["date"])
+            return True
+
+        changed = 0
+        for i in range(0, len(rows), self.UPSERT_CHUNK_SIZE):
+            stmt = insert(HistoricalQuote).values(rows[i:i + self.UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["instrument_id", "date"],
+                set_={
+                    "open": stmt.excluded.open,
+                    "high": stmt.excluded.high,
+                    "low": stmt.excluded.low,
+                    "close": stmt.excluded.close,
+                    "volume": stmt.excluded.volume,
+                },
+                where=self._row_differs(HistoricalQuote, stmt),
+            )
+            changed += self.db.execute(stmt).rowcount
+        if not changed:
+            return False
+
+        # rows są posortowane po dacie – ostatni to najnowszy
+        self._update_latest_snapshot(rows[-1])
+        self._update_rollups(instrument_id, rows[0]["date"], rows[-1]["date"])
+        return True
+
+    def _update_rollups(self, instrument_id: int, first: date, last: date) -> None:
+        """
+        Przelicza świece zbiorcze (QuoteRollup) dla lat, w które trafiły nowe
+        notowania – z notowań dziennych w bazie, więc korekty starszych świec
+        też są uwzględniane. Hot tail to jeden rok (~250 świec), nie cała historia.
+        """
+        # notowania z bieżącej transakcji (ścieżka ORM) muszą być widoczne
+        self.db.flush()
+
+        # lata rozszerzone do pełnych tygodni – tydzień na przełomie roku
+        # musi być liczony ze świec z obu lat
+        year_start = date(first.year, 1, 1)
+        year_end = date(last.year, 12, 31)
+        load_start = period_start(year_start, "week")
+        load_end = year_end + timedelta(days=6 - year_end.weekday())
+        series = self._load_series_range(instrument_id, load_start, load_end)
+
+        rows = []
+        for resolution in RESOLUTIONS:
+            # tylko okresy zaczynające się w zakresie – wcześniejsze (grudzień
+            # poprzedniego roku) i późniejsze (styczeń) są wczytane częściowo
+            periods = series.resample(resolution).slice(load_start, year_end)
+            for record in periods.to_records():
+                record["period_start"] = record.pop("date")
+                rows.append({"instrument_id": instrument_id, "resolution": resolution, **record})
+        if not rows:
+            return
+
+        insert = upsert_insert(self.db)
+        if insert is None:
+            for row in rows:
+                self.db.merge(QuoteRollup(**row))
+            return
+
+        for i in range(0, len(rows), self.ROLLUP_UPSERT_CHUNK_SIZE):
+            stmt = insert(QuoteRollup).values(rows[i:i + self.ROLLUP_UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["instrument_id", "resolution", "period_start"],
+                set_={field: stmt.excluded[field] for field in FIELDS},
+            )
+            self.db.execute(stmt)
+
+    def _update_latest_snapshot(self, row: Dict) -> None:
+        """Przesuwa LatestQuote do `row`, o ile nie jest starszy niż obecny."""
+        values = {
+            "instrument_id": row["instrument_id"],
+            "date": row["date"],
+            "open": row["open"],
+            "high": row["high"],
+            "low": row["low"],
+            "close": row["close"],
+            "volume": row["volume"],
+            "updated_at": datetime.utcnow(),
+        }
+
+        insert = upsert_insert(self.db)
+        if insert is None:
+            snapshot = self.db.get(LatestQuote, row["instrument_id"])
+            if snapshot is None:
+                self.db.add(LatestQuote(**values))
+            elif snapshot.date <= row["date"]:
+                for key, value in values.items():
+                    setattr(snapshot, key, value)
+            return
+
+        stmt = insert(LatestQuote).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["instrument_id"],
+            set_={key: stmt.excluded[key] for key in values if key != "instrument_id"},
+            # backfill starszej historii nie cofa snapshotu
+            where=LatestQuote.date <= stmt.excluded.date,
+        )
+        self.db.execute(stmt)
+
+    def latest_closes(self, instrument_ids: List[int]) -> Dict[int, float]:
+        """
+        Ostatnie ceny zamknięcia z historical_quotes (jedno zapytanie) – dla
+        instrumentów, które nie mają jeszcze wpisu w LatestQuote.
+        """
+        if not instrument_ids:
+            return {}
+        newest = (
+            self.db.query(
+                HistoricalQuote.instrument_id.label("instrument_id"),
+                func.max(HistoricalQuote.date).label("date"),
+            )
+            .filter(HistoricalQuote.instrument_id.in_(instrument_ids))
+            .group_by(HistoricalQuote.instrument_id)
+            .subquery()
+        )
+        rows = (
+            self.db.query(HistoricalQuote.instrument_id, HistoricalQuote.close)
+            .join(
+                newest,
+                and_(
+                    HistoricalQuote.instrument_id == newest.c.instrument_id,
+                    HistoricalQuote.date == newest.c.date,
+                ),
+            )
+            .all()
+        )
+        return {instrument_id: close for instrument_id, close in rows}
+
+    def _store_quotes_row_by_row(self, rows: List[Dict]) -> bool:
+        """Wolniejsza ścieżka dla baz bez ON CONFLICT."""
+        changed = False
+        for row in rows:
             existing = (
                 self.db.query(HistoricalQuote)
                 .filter(
-                    HistoricalQuote.instrument_id == instrument.id,
-                    HistoricalQuote.date == item["date"],
+                    HistoricalQuote.instrument_id == row["instrument_id"],
+                    HistoricalQuote.date == row["date"],
                 )
                 .first()
             )
             if existing:
-                existing.open = item["open"]
-                existing.high = item["high"]
-                existing.low = item["low"]
-                existing.close = item["close"]
-                existing.volume = item["volume"]
-                quotes.append(existing)
+                if all(getattr(existing, field) == row[field] for field in FIELDS):
+                    continue
+                existing.open = row["open"]
+                existing.high = row["high"]
+                existing.low = row["low"]
+                existing.close = row["close"]
+                existing.volume = row["volume"]
             else:
-                quote = HistoricalQuote(
-                    instrument_id=instrument.id,
-                    date=item["date"],
-                    open=item["open"],
-                    high=item["high"],
-                    low=item["low"],
-                    close=item["close"],
-                    volume=item["volume"],
-                )
-                self.db.add(quote)
-                quotes.append(quote)
+                self.db.add(HistoricalQuote(**row))
+            changed = True
+        return changed
 
-        self.db.commit()
-        return quotes
+    def _query_range(
+        self,
+        instrument_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[HistoricalQuote]:
+        query = self.db.query(HistoricalQuote).filter(
+            HistoricalQuote.instrument_id == instrument_id
+        )
+
+        if start:
+            query = query.filter(HistoricalQuote.date >= start)
+        if end:
+            query = query.filter(HistoricalQuote.date <= end)
+
+        return query.order_by(HistoricalQuote.date.asc()).all()
+
+    def _intraday_range_query(
+        self,
+        columns,
+        instrument_id: int,
+        interval: str,
+        start: Optional[date],
+        end: Optional[date],
+    ):
+        query = self.db.query(*columns).filter(
+            IntradayBar.instrument_id == instrument_id,
+            IntradayBar.interval == interval,
+        )
+        # [start, end] to dni – świece od północy `start` do końca dnia `end` (UTC)
+        if start:
+            query = query.filter(IntradayBar.timestamp >= datetime.combine(start, datetime.min.time()))
+        if end:
+            query = query.filter(
+                IntradayBar.timestamp < datetime.combine(end + timedelta(days=1), datetime.min.time())
+            )
+        return query.order_by(IntradayBar.timestamp.asc())
+
+    def _query_intraday(
+        self,
+        instrument_id: int,
+        interval: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[IntradayBar]:
+        return self._intraday_range_query([IntradayBar], instrument_id, interval, start, end).all()
+
+    def _load_intraday_series(
+        self,
+        instrument_id: int,
+        interval: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> QuoteSeries:
+        """Świece śródsesyjne z zakresu jako kolumny (daty: datetime64[s])."""
+        rows = self._intraday_range_query(
+            [
+                IntradayBar.timestamp,
+                IntradayBar.open,
+                IntradayBar.high,
+                IntradayBar.low,
+                IntradayBar.close,
+                IntradayBar.volume,
+            ],
+            instrument_id,
+            interval,
+            start,
+            end,
+        ).all()
+        if not rows:
+            return QuoteSeries.empty()
+        columns = list(zip(*rows))
+        return QuoteSeries(
+            dates=np.array(columns[0], dtype="datetime64[s]"),
+            **{
+                field: np.array(values, dtype="float64")
+                for field, values in zip(FIELDS, columns[1:])
+            },
+        )
 
     def get_history_from_db(
         self,
         symbol: str,
         start: Optional[date] = None,
         end: Optional[date] = None,
-    ) -> List[HistoricalQuote]:
+    ) -> List[Dict]:
+        """
+        Notowania z zakresu jako rekordy (date + OHLCV), wycięte z jednego
+        zcache'owanego szeregu symbolu (wspólnego dla wszystkich zakresów
+        i get_latest_quote) – bez budowania obiektów ORM.
+        """
+        series = self._get_series(symbol)
+        if series is None:
+            return []
+        return series.slice(start, end).to_records()
+
+    @staticmethod
+    def _series_cache_key(symbol: str, generation: int) -> str:
+        # generacja symbolu rośnie przy każdym zapisie notowań
+        return f"series:{symbol}:g{generation}"
+
+    def _get_series(self, symbol: str, load: bool = True) -> Optional[QuoteSeries]:
+        """
+        Pełny szereg dzienny symbolu z cache; przy braku (i load=True) czytany
+        z bazy i zapisywany do cache. None = nieznany instrument / brak w cache.
+        Z włączonym magazynem szeregów (TS_STORE_DIR) zamiast cache jest magazyn.
+        """
+        # generacja przed odczytem z bazy – ingest w międzyczasie ją podbije
+        generation = get_generation(self._cache_namespace(symbol))
+        series = self.cached_series(symbol, generation)
+        if series is not None or not load:
+            return series
+
+        series = self.series_from_db(symbol)
+        if series is not None:
+            self.remember_series(symbol, generation, series)
+        return series
+
+    @classmethod
+    def cached_series(cls, symbol: str, generation: int) -> Optional[QuoteSeries]:
+        """
+        Szereg z magazynu (memmap, bez kopiowania) albo z cache. Bez bazy –
+        wersja async woła to w wątku (Redis, dekodowanie, pliki).
+        """
+        store = get_time_series_store()
+        if store is not None:
+            return store.read(symbol, generation)
+
+        # Cache READ – w procesie zdekodowany szereg, w Redisie binarnie
+        # (kolumny float64 + dni jako int32, zlib)
+        return cache_get_encoded(cls._series_cache_key(symbol, generation), QuoteSeries.from_bytes)
+
+    @classmethod
+    def remember_series(cls, symbol: str, generation: int, series: QuoteSeries) -> None:
+        """Zapis wczytanego z bazy szeregu do magazynu albo cache (bez bazy)."""
+        store = get_time_series_store()
+        if store is not None:
+            try:
+                store.replace(symbol, series, generation)
+            except OSError:
+                pass  # magazyn to tylko kopia – zostaje odczyt z bazy
+            return
 
-        # Cache READ
-        cache_key = f"history:{symbol}:{start}:{end}"
-        cached = cache_get(cache_key)
-        if cached:
-            return [
-                HistoricalQuote(
-                    date=item["date"],
-                    open=item["open"],
-                    high=item["high"],
-                    low=item["low"],
-                    close=item["close"],
-                    volume=item["volume"],
-                )
-                for item in cached
-            ]
+        # Cache WRITE
+        cache_set_encoded(
+            cls._series_cache_key(symbol, generation),
+            series,
+            QuoteSeries.to_bytes,
+            ttl_seconds=6 * 3600,  # unieważniane generacją
+        )
 
-        # DB
+    def series_from_db(self, symbol: str) -> Optional[QuoteSeries]:
         instrument = (
             self.db.query(Instrument)
             .filter(Instrument.symbol == symbol)
             .first()
         )
         if instrument is None:
-            return []
+            return None
+        return self._load_series(instrument.id)
 
-        query = self.db.query(HistoricalQuote).filter(
-            HistoricalQuote.instrument_id == instrument.id
-        )
+    def _load_series(self, instrument_id: int) -> QuoteSeries:
+        """Cała historia instrumentu jako kolumny (bez budowania obiektów ORM)."""
+        return self._load_series_range(instrument_id)
 
+    def _load_series_range(
+        self,
+        instrument_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> QuoteSeries:
+        query = self.db.query(
+            HistoricalQuote.date,
+            HistoricalQuote.open,
+            HistoricalQuote.high,
+            HistoricalQuote.low,
+            HistoricalQuote.close,
+            HistoricalQuote.volume,
+        ).filter(HistoricalQuote.instrument_id == instrument_id)
         if start:
             query = query.filter(HistoricalQuote.date >= start)
         if end:
             query = query.filter(HistoricalQuote.date <= end)
+        rows = query.order_by(HistoricalQuote.date.asc()).all()
+        return QuoteSeries.from_records(row._asdict() for row in rows)
 
-        results = query.order_by(HistoricalQuote.date.asc()).all()
+    def get_history_rollup(
+        self,
+        symbol: str,
+        resolution: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[QuoteRollup]:
+        """
+        Świece zbiorcze (week/month/quarter/year) z quote_rollups. Okres
+        zawierający `start` jest zwracany w całości (nie jest przycinany) –
+        jego notowania musi wcześniej pobrać wywołujący (patrz /api/history).
+        Instrumenty zapisane przed wprowadzeniem rollupów są przeliczane
+        przy pierwszym odczycie.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unsupported resolution: {resolution}")
+        instrument = (
+            self.db.query(Instrument)
+            .filter(Instrument.symbol == symbol)
+            .first()
+        )
+        if instrument is None:
+            return []
 
-        # Cache WRITE
-        cache_set(
-            cache_key,
-            [
-                {
-                    "date": str(q.date),
-                    "open": q.open,
-                    "high": q.high,
-                    "low": q.low,
-                    "close": q.close,
-                    "volume": q.volume,
-                }
-                for q in results
-            ],
-            ttl_seconds=300
+        query = self.db.query(QuoteRollup).filter(
+            QuoteRollup.instrument_id == instrument.id,
+            QuoteRollup.resolution == resolution,
         )
+        if not self.db.query(query.exists()).scalar():
+            self._backfill_rollups(instrument.id)
 
-        return results
+        if start:
+            query = query.filter(QuoteRollup.period_start >= period_start(start, resolution))
+        if end:
+            query = query.filter(QuoteRollup.period_start <= end)
+        return query.order_by(QuoteRollup.period_start.asc()).all()
+
+    def _backfill_rollups(self, instrument_id: int) -> None:
+        first, last = (
+            self.db.query(func.min(HistoricalQuote.date), func.max(HistoricalQuote.date))
+            .filter(HistoricalQuote.instrument_id == instrument_id)
+            .one()
+        )
+        if first is None:
+            return
+        self._update_rollups(instrument_id, first, last)
+        self.db.commit()
 
     def refresh_recent_history(
         self,
@@ -170,40 +1027,39 @@ class MarketDataService:
 
     def get_latest_quote(self, symbol: str) -> Optional[HistoricalQuote]:
 
-        # Cache READ
-        cache_key = f"current:{symbol}"
-        cached = cache_get(cache_key)
-        if cached:
-            return HistoricalQuote(
-                date=cached["date"],
-                open=cached["open"],
-                high=cached["high"],
-                low=cached["low"],
-                close=cached["close"],
-                volume=cached["volume"],
-            )
-
-        # DB
-        quotes = self.get_history_from_db(symbol=symbol)
-        if not quotes:
-            return None
-
-        last = quotes[-1]
-
-        # Cache WRITE
-        cache_set(
-            cache_key,
-            {
-                "date": str(last.date),
-                "open": last.open,
-                "high": last.high,
-                "low": last.low,
-                "close": last.close,
-                "volume": last.volume,
-            },
-            ttl_seconds=150
+        # Cache READ – ogon szeregu z _get_series, jeśli już jest w cache
+        series = self._get_series(symbol, load=False)
+        if series is not None and len(series):
+            return HistoricalQuote(**series.tail().to_records()[0])
+        return self.latest_quote_from_db(symbol)
+
+    def latest_quote_from_db(self, symbol: str) -> Optional[HistoricalQuote]:
+        # DB – snapshot zamiast całej historii
+        row = (
+            self.db.query(LatestQuote)
+            .join(Instrument, Instrument.id == LatestQuote.instrument_id)
+            .filter(Instrument.symbol == symbol)
+            .first()
         )
-
+        if row is not None:
+            last = HistoricalQuote(
+                instrument_id=row.instrument_id,
+                date=row.date,
+                open=row.open,
+                high=row.high,
+                low=row.low,
+                close=row.close,
+                volume=row.volume,
+            )
+        else:
+            # instrument sprzed wprowadzenia snapshotów
+            last = (
+                self.db.query(HistoricalQuote)
+                .join(Instrument, Instrument.id == HistoricalQuote.instrument_id)
+                .filter(Instrument.symbol == symbol)
+                .order_by(HistoricalQuote.date.desc())
+                .first()
+            )
         return last
 
 
@@ -212,44 +1068,82 @@ class MarketDataService:
 # =========================
 
 class ExportService:
+    HISTORY_CSV_HEADER = ["date", "open", "high", "low", "close", "volume"]
+    # ile wierszy na raz czytamy z kursora (i wysyłamy jednym kawałkiem CSV)
+    EXPORT_BATCH_SIZE = 5000
+
     def __init__(self, db: Session):
         self.db = db
 
-    def export_history_to_csv(
-        self,
+    @staticmethod
+    def history_rows_query(
         symbol: str,
         start: Optional[date] = None,
         end: Optional[date] = None,
-    ) -> str:
-
-        import csv
-        import io
-
-        market_service = MarketDataService(self.db)
-
-        if start and end:
-            market_service.fetch_and_store_history(symbol=symbol, start=start, end=end)
-
-        quotes = market_service.get_history_from_db(symbol=symbol, start=start, end=end)
-
-        output = io.StringIO()
-        writer = csv.writer(output)
+    ) -> Select:
+        stmt = (
+            select(
+                HistoricalQuote.date,
+                HistoricalQuote.open,
+                HistoricalQuote.high,
+                HistoricalQuote.low,
+                HistoricalQuote.close,
+                HistoricalQuote.volume,
+            )
+            .join(Instrument, Instrument.id == HistoricalQuote.instrument_id)
+            .where(Instrument.symbol == symbol)
+            .order_by(HistoricalQuote.date.asc())
+        )
+        if start:
+            stmt = stmt.where(HistoricalQuote.date >= start)
+        if end:
+            stmt = stmt.where(HistoricalQuote.date <= end)
+        return stmt
 
-        writer.writerow(["date", "open", "high", "low", "close", "volume"])
+    @staticmethod
+    def bundle_rows_query(
+        symbols: List[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> Select:
+        """(symbol, date, OHLCV) dla listy symboli, po symbolu i dacie."""
+        stmt = (
+            select(
+                Instrument.symbol,
+                HistoricalQuote.date,
+                HistoricalQuote.open,
+                HistoricalQuote.high,
+                HistoricalQuote.low,
+                HistoricalQuote.close,
+                HistoricalQuote.volume,
+            )
+            .join(Instrument, Instrument.id == HistoricalQuote.instrument_id)
+            .where(Instrument.symbol.in_(symbols))
+            .order_by(Instrument.symbol.asc(), HistoricalQuote.date.asc())
+        )
+        if start:
+            stmt = stmt.where(HistoricalQuote.date >= start)
+        if end:
+            stmt = stmt.where(HistoricalQuote.date <= end)
+        return stmt
 
-        for q in quotes:
+    @staticmethod
+    def history_csv_rows(rows) -> Iterator[list]:
+        for q in rows:
             date_value = q.date.isoformat() if hasattr(q.date, "isoformat") else str(q.date)
-            writer.writerow(
-                [
-                    date_value,
-                    q.open or "",
-                    q.high or "",
-                    q.low or "",
-                    q.close,
-                    q.volume or "",
-                ]
-            )
+            yield [
+                date_value,
+                q.open or "",
+                q.high or "",
+                q.low or "",
+                q.close,
+                q.volume or "",
+            ]
 
+    @staticmethod
+    def history_csv_chunk(rows: Iterable[list]) -> str:
+        output = io.StringIO()
+        csv.writer(output).writerows(rows)
         return output.getvalue()
 
 
@@ -364,31 +1258,41 @@ class PortfolioService:
         if portfolio is None:
             raise ValueError("Portfolio not found")
 
-        positions = (
-            self.db.query(Position)
+        # pozycje + symbole + ostatnie ceny jednym zapytaniem
+        rows = (
+            self.db.query(
+                Position.instrument_id,
+                Position.quantity,
+                Position.avg_open_price,
+                Instrument.symbol,
+                LatestQuote.close,
+            )
+            .join(Instrument, Instrument.id == Position.instrument_id)
+            .outerjoin(LatestQuote, LatestQuote.instrument_id == Position.instrument_id)
             .filter(Position.portfolio_id == portfolio_id)
+            .order_by(Position.id)
             .all()
         )
 
-        market = MarketDataService(self.db)
+        missing = [row.instrument_id for row in rows if row.close is None]
+        fallback = MarketDataService(self.db).latest_closes(missing)
 
         items = []
         total_value = 0.0
 
-        for pos in positions:
-            instrument = pos.instrument
-            quotes = market.get_history_from_db(instrument.symbol)
-            last = quotes[-1] if quotes else None
-            current_price = last.close if last else pos.avg_open_price
+        for row in rows:
+            current_price = row.close
+            if current_price is None:
+                current_price = fallback.get(row.instrument_id, row.avg_open_price)
 
-            value = current_price * pos.quantity
+            value = current_price * row.quantity
             total_value += value
 
             items.append(
                 {
-                    "instrument": instrument.symbol,
-                    "quantity": pos.quantity,
-                    "avg_open_price": pos.avg_open_price,
+                    "instrument": row.symbol,
+                    "quantity": row.quantity,
+                    "avg_open_price": row.avg_open_price,
                     "current_price": current_price,
                     "position_value": value,
                 }
@@ -407,7 +1311,65 @@ class PortfolioService:
 # ALERTS (UC4)
 # =========================
 
+class AlertIndex:
+    """
+    Indeks alertów per symbol: posortowane progi "above" i "below".
+    Wyzwolone alerty dla danej ceny wyznaczane są bisekcją, a nie skanem.
+    """
+
+    def __init__(self, alerts: Iterable[Alert] = ()):
+        # symbol -> (progi rosnąco, id alertów w tej samej kolejności)
+        self._above: Dict[str, Tuple[List[float], List[int]]] = {}
+        self._below: Dict[str, Tuple[List[float], List[int]]] = {}
+
+        grouped: Dict[Tuple[str, str], List[Tuple[float, int]]] = {}
+        for alert in alerts:
+            grouped.setdefault((alert.condition, alert.symbol), []).append(
+                (alert.threshold_price, alert.id)
+            )
+        for (condition, symbol), pairs in grouped.items():
+            pairs.sort()
+            target = self._above if condition == "above" else self._below
+            target[symbol] = ([p[0] for p in pairs], [p[1] for p in pairs])
+
+    def symbols(self) -> List[str]:
+        return sorted(set(self._above) | set(self._below))
+
+    def triggered(self, symbol: str, price: float) -> List[int]:
+        """Id alertów spełnionych przy cenie `price`."""
+        ids: List[int] = []
+
+        # above: cena >= próg -> wszystkie progi <= cena
+        thresholds, above_ids = self._above.get(symbol, ([], []))
+        ids.extend(above_ids[:bisect_right(thresholds, price)])
+
+        # below: cena <= próg -> wszystkie progi >= cena
+        thresholds, below_ids = self._below.get(symbol, ([], []))
+        ids.extend(below_ids[bisect_left(thresholds, price):])
+
+        return ids
+
+
+# Wspólny dla procesu indeks aktywnych alertów (budowany leniwie z bazy,
+# unieważniany przy każdej zmianie alertów) oraz ostatnie ceny z ingestu.
+_alert_index: Optional[AlertIndex] = None
+_alert_index_lock = threading.Lock()
+_last_prices: Dict[str, Tuple[float, datetime]] = {}
+
+
+def _invalidate_alert_index() -> None:
+    global _alert_index
+    _alert_index = None
+
+
 class AlertService:
+    # Jak długo cena z ingestu zastępuje pobranie z Yahoo w pollingu.
+    PRICE_MAX_AGE_SECONDS = 90
+
+    # Hook ingestu nie wyzwala ponownie alertu wyzwolonego w tym oknie
+    # (np. gdy cena przekroczyła próg w innym workerze albo przed restartem).
+    TRIGGER_COOLDOWN_SECONDS = 3600
+
     def __init__(self, db: Session):
         self.db = db
 
@@ -437,6 +1399,7 @@ class AlertService:
         self.db.add(alert)
         self.db.commit()
         self.db.refresh(alert)
+        _invalidate_alert_index()
 
         return alert
 
@@ -449,6 +1412,7 @@ class AlertService:
 
         self.db.commit()
         self.db.refresh(alert)
+        _invalidate_alert_index()
 
         return alert
 
@@ -459,6 +1423,7 @@ class AlertService:
 
         self.db.delete(alert)
         self.db.commit()
+        _invalidate_alert_index()
 
     def _fetch_current_price(self, symbol: str) -> float | None:
         ticker = yf.Ticker(symbol)
@@ -467,31 +1432,106 @@ class AlertService:
             return None
         return float(hist.iloc[-1]["Close"])
 
-    def check_alerts(self) -> list[Alert]:
+    def _get_alert_index(self, rebuild: bool = False) -> AlertIndex:
+        global _alert_index
+        with _alert_index_lock:
+            if _alert_index is None or rebuild:
+                active_alerts = (
+                    self.db.query(Alert)
+                    .filter(Alert.active.is_(True))
+                    .all()
+                )
+                _alert_index = AlertIndex(active_alerts)
+            return _alert_index
 
-        active_alerts = (
-            self.db.query(Alert)
-            .filter(Alert.active.is_(True))
-            .all()
+    def _fresh_price(self, symbol: str) -> float | None:
+        """Cena z ostatniego ingestu, jeśli nie jest starsza niż PRICE_MAX_AGE_SECONDS."""
+        known = _last_prices.get(symbol)
+        if known is None:
+            return None
+        price, seen_at = known
+        if (datetime.utcnow() - seen_at).total_seconds() > self.PRICE_MAX_AGE_SECONDS:
+            return None
+        return price
+
+    def _trigger(
+        self,
+        alert_ids: List[int],
+        now: datetime,
+        cooldown: Optional[timedelta] = None,
+    ) -> list[Alert]:
+        if not alert_ids:
+            return []
+        query = self.db.query(Alert).filter(Alert.id.in_(alert_ids), Alert.active.is_(True))
+        if cooldown is not None:
+            query = query.filter(
+                or_(Alert.last_triggered_at.is_(None), Alert.last_triggered_at < now - cooldown)
+            )
+        alerts = query.all()
+        for alert in alerts:
+            alert.last_triggered_at = now
+        return alerts
+
+    def on_quotes_stored(self, symbol: str, series: QuoteSeries) -> list[Alert]:
+        """
+        Hook ingestu: sprawdza alerty symbolu od razu względem nowej ceny
+        zamknięcia. Starsze dane (backfill historii) są pomijane.
+
+        Wyzwala tylko przy przekroczeniu progu – alert spełniony już przy
+        poprzedniej cenie z ingestu nie jest wyzwalany ponownie (hot tail
+        jest pobierany przy każdym żądaniu). Dodatkowo obowiązuje
+        TRIGGER_COOLDOWN_SECONDS liczony od last_triggered_at.
+        """
+        last_date = series.dates[-1].astype("datetime64[D]").astype(object)
+        if last_date < date.today() - timedelta(days=MarketDataService.HOT_TAIL_DAYS):
+            return []
+
+        price = float(series.close[-1])
+        now = datetime.utcnow()
+        previous = _last_prices.get(symbol)
+        _last_prices[symbol] = (price, now)
+
+        index = self._get_alert_index()
+        alert_ids = index.triggered(symbol, price)
+        if previous is not None:
+            already_met = set(index.triggered(symbol, previous[0]))
+            alert_ids = [alert_id for alert_id in alert_ids if alert_id not in already_met]
+
+        triggered = self._trigger(
+            alert_ids, now, cooldown=timedelta(seconds=self.TRIGGER_COOLDOWN_SECONDS)
         )
+        if triggered:
+            self.db.commit()
+            for alert in triggered:
+                LogService(self.db).add_log(
+                    message=(
+                        f"Wyzwolono alert: {alert.symbol} {alert.condition} "
+                        f"{alert.threshold_price} (cena {price})"
+                    ),
+                    level="WARNING",
+                    source="UC4_ALERTS_TRIGGER",
+                )
+        return triggered
+
+    def check_alerts(self) -> list[Alert]:
+        """
+        Polling (zapasowy względem hooka ingestu): jedna cena na symbol,
+        brana z ostatniego ingestu albo – gdy jej brak – z Yahoo.
+        Przy okazji przebudowuje wspólny indeks alertów z bazy.
+        """
+        index = self._get_alert_index(rebuild=True)
 
         now = datetime.utcnow()
         triggered: list[Alert] = []
 
-        for alert in active_alerts:
-            price = self._fetch_current_price(alert.symbol)
+        for symbol in index.symbols():
+            price = self._fresh_price(symbol)
+            if price is None:
+                price = self._fetch_current_price(symbol)
             if price is None:
                 continue
 
-            condition_ok = (
-                (alert.condition == "above" and price >= alert.threshold_price)
-                or
-                (alert.condition == "below" and price <= alert.threshold_price)
-            )
-
-            if condition_ok:
-                alert.last_triggered_at = now
-                triggered.append(alert)
+            triggered.extend(self._trigger(index.triggered(symbol, price), now))
 
         if triggered:
             self.db.commit()
@@ -499,6 +1539,11 @@ class AlertService:
         return triggered
 
 
+register_quote_listener(
+    lambda db, symbol, series: AlertService(db).on_quotes_stored(symbol, series)
+)
+
+
 # =========================
 # LOGI (UC6)
 # =========================
@@ -515,18 +1560,19 @@ class LogService:
         user_email: Optional[str] = None,
         details: Optional[str] = None,
     ) -> LogEntry:
-        entry = LogEntry(
-            timestamp=datetime.utcnow() + timedelta(hours=1),
+        """
+        Wpis trafia do kolejki LogWritera i jest zapisywany w tle, paczkami –
+        bez commitu w sesji wywołującego. Zwracany LogEntry nie ma jeszcze id.
+        """
+        record = log_record(
+            message=message,
             level=level,
             source=source,
-            message=message,
             user_email=user_email,
             details=details,
         )
-        self.db.add(entry)
-        self.db.commit()
-        self.db.refresh(entry)
-        return entry
+        log_writer.submit(record)
+        return LogEntry(**record)
 
     def list_logs(
         self,
@@ -534,19 +1580,155 @@ class LogService:
         source: Optional[str] = None,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
-    ):
-        q = self.db.query(LogEntry).order_by(LogEntry.timestamp.desc())
+        flush: bool = True,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> List[LogEntry]:
+        return self.list_logs_page(
+            level=level,
+            source=source,
+            date_from=date_from,
+            date_to=date_to,
+            search=search,
+            flush=flush,
+            limit=limit,
+            cursor=cursor,
+        )[0]
+
+    def list_logs_page(
+        self,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        flush: bool = True,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> Tuple[List[LogEntry], Optional[str]]:
+        """
+        Strona logów (od najnowszych) i kursor następnej strony albo None.
+        Kursor z poprzedniej strony zaczyna kolejną tuż za jej ostatnim
+        wpisem (keyset po timestamp, id) – bez OFFSET-u.
+        """
+        # wpisy czekające w kolejce writera też mają być widoczne
+        if flush:
+            log_writer.flush()
+
+        stmt = self.logs_query(
+            level=level,
+            source=source,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            search=search,
+        )
+        if limit is None:
+            return list(self.db.scalars(stmt)), None
+
+        # jeden wiersz więcej mówi, czy jest następna strona
+        logs = list(self.db.scalars(stmt.limit(limit + 1)))
+        if len(logs) <= limit:
+            return logs, None
+        logs = logs[:limit]
+        return logs, encode_log_cursor(logs[-1])
+
+    def log_stats(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        bucket: str = "hour",
+        flush: bool = True,
+    ) -> List[Dict]:
+        """
+        Liczby wpisów per przedział czasu ("hour" / "day"), poziom i źródło –
+        z tabeli log_rollups, bez czytania samych logów. Zakres dat działa
+        z dokładnością do pełnych godzin.
+        """
+        if bucket not in ("hour", "day"):
+            raise ValueError("Bucket must be 'hour' or 'day'")
+        if flush:
+            log_writer.flush()
+
+        stmt = select(LogRollup).order_by(LogRollup.bucket, LogRollup.level, LogRollup.source)
+        if date_from:
+            stmt = stmt.where(LogRollup.bucket >= rollup_bucket(date_from))
+        if date_to:
+            stmt = stmt.where(LogRollup.bucket <= date_to)
+        if level:
+            stmt = stmt.where(LogRollup.level == level)
+        if source:
+            stmt = stmt.where(LogRollup.source == source)
+
+        counts: Dict[Tuple[datetime, str, str], int] = {}
+        for rollup in self.db.scalars(stmt):
+            start = rollup.bucket
+            if bucket == "day":
+                start = start.replace(hour=0)
+            key = (start, rollup.level, rollup.source)
+            counts[key] = counts.get(key, 0) + rollup.count
+
+        return [
+            {"bucket": start, "level": lvl, "source": src or None, "count": count}
+            for (start, lvl, src), count in counts.items()
+        ]
+
+    @staticmethod
+    def logs_query(
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> Select:
+        """
+        SELECT logów z filtrami, od najnowszych (wspólny dla listy i eksportu).
+        `search` – słowa, które muszą wystąpić w message/details (indeks
+        pełnotekstowy, patrz models.log_text_match).
+        """
+        stmt = select(LogEntry).order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
 
         if level:
-            q = q.filter(LogEntry.level == level)
+            stmt = stmt.where(LogEntry.level == level)
 
         if source:
-            q = q.filter(LogEntry.source == source)
+            stmt = stmt.where(LogEntry.source == source)
 
         if date_from:
-            q = q.filter(LogEntry.timestamp >= date_from)
+            stmt = stmt.where(LogEntry.timestamp >= date_from)
 
         if date_to:
-            q = q.filter(LogEntry.timestamp <= date_to)
+            stmt = stmt.where(LogEntry.timestamp <= date_to)
+
+        if search and search.strip():
+            stmt = stmt.where(log_text_match(search))
+
+        if cursor:
+            timestamp, entry_id = decode_log_cursor(cursor)
+            stmt = stmt.where(
+                or_(
+                    LogEntry.timestamp < timestamp,
+                    and_(LogEntry.timestamp == timestamp, LogEntry.id < entry_id),
+                )
+            )
+
+        return stmt
+
+
+def encode_log_cursor(entry: LogEntry) -> str:
+    raw = f"{entry.timestamp.isoformat()}|{entry.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
 
-        return q.all()
\ No newline at end of file
+def decode_log_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Odwrotność encode_log_cursor; ValueError dla niepoprawnego kursora."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, entry_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(entry_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
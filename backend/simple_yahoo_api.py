@@ -3,21 +3,16 @@ from typing import List, Dict, Optional
 
 import yfinance as yf
 
+from quote_series import QuoteSeries, is_intraday
 
-def get_history(
+
+def _download_history(
     symbol: str,
     period: str = "1y",
     interval: str = "1d",
     start: Optional[date] = None,
     end: Optional[date] = None,
-) -> List[Dict]:
-    """
-    Wrapper na yfinance.Ticker.history:
-    - jeśli podane start/end -> używa zakresu dat,
-    - jeśli nie -> używa period (tak jak w starym prototypie).
-    Dzięki temu działa zarówno stare wywołanie get_history(symbol, "1y", "1d"),
-    jak i nowe: get_history(symbol, start=..., end=..., interval=...).
-    """
+):
     ticker = yf.Ticker(symbol)
 
     # Jeśli podano zakres dat, użyj go
@@ -33,35 +28,89 @@ def get_history(
         else:
             end_str = end
 
-        df = ticker.history(start=start_str, end=end_str, interval=interval)
+        return ticker.history(start=start_str, end=end_str, interval=interval)
+
+    # Wsteczne kompatybilne zachowanie – tylko period
+    return ticker.history(period=period, interval=interval)
+
+
+def get_history_columns(
+    symbol: str,
+    period: str = "1y",
+    interval: str = "1d",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> QuoteSeries:
+    """
+    Jak get_history, ale zwraca kolumny NumPy (QuoteSeries) zamiast listy
+    słowników – konwersja DataFrame odbywa się wektorowo, bez iterrows().
+    """
+    df = _download_history(symbol, period=period, interval=interval, start=start, end=end)
+    return QuoteSeries.from_frame(df, intraday=is_intraday(interval))
+
+
+def get_history(
+    symbol: str,
+    period: str = "1y",
+    interval: str = "1d",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> List[Dict]:
+    """
+    Wrapper na yfinance.Ticker.history:
+    - jeśli podane start/end -> używa zakresu dat,
+    - jeśli nie -> używa period (tak jak w starym prototypie).
+    Dzięki temu działa zarówno stare wywołanie get_history(symbol, "1y", "1d"),
+    jak i nowe: get_history(symbol, start=..., end=..., interval=...).
+    """
+    return get_history_columns(
+        symbol, period=period, interval=interval, start=start, end=end
+    ).to_records()
+
+
+def get_history_batch(
+    symbols: List[str],
+    interval: str = "1d",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    period: str = "1y",
+) -> Dict[str, QuoteSeries]:
+    """
+    Pobiera historię wielu tickerów jednym wywołaniem yf.download.
+    Symbole, dla których Yahoo nic nie zwróciło, mają pusty QuoteSeries.
+    """
+    if not symbols:
+        return {}
+
+    if start is not None or end is not None:
+        range_kwargs = {
+            "start": start.isoformat() if isinstance(start, (date, datetime)) else start,
+            "end": end.isoformat() if isinstance(end, (date, datetime)) else end,
+        }
     else:
-        # Wsteczne kompatybilne zachowanie – tylko period
-        df = ticker.history(period=period, interval=interval)
-
-    df = df.reset_index()
-
-    results: List[Dict] = []
-    for _, row in df.iterrows():
-        dt = row["Date"]
-        # pandas.Timestamp -> date
-        if hasattr(dt, "date"):
-            dt = dt.date()
-
-        def _to_float_or_none(v):
-            # NaN != NaN, więc tak łapiemy NaN bez importowania pandas
-            if v is None or v != v:
-                return None
-            return float(v)
-
-        results.append(
-            {
-                "date": dt,
-                "open": _to_float_or_none(row["Open"]),
-                "high": _to_float_or_none(row["High"]),
-                "low": _to_float_or_none(row["Low"]),
-                "close": float(row["Close"]),
-                "volume": _to_float_or_none(row["Volume"]),
-            }
-        )
-
-    return results
\ No newline at end of file
+        range_kwargs = {"period": period}
+
+    df = yf.download(
+        tickers=list(symbols),
+        interval=interval,
+        group_by="ticker",
+        auto_adjust=True,  # tak samo jak Ticker.history
+        threads=True,
+        progress=False,
+        **range_kwargs,
+    )
+
+    intraday = is_intraday(interval)
+    results: Dict[str, QuoteSeries] = {}
+    tickers_in_frame = (
+        set(df.columns.get_level_values(0)) if df.columns.nlevels > 1 else set()
+    )
+    for symbol in symbols:
+        if symbol in tickers_in_frame:
+            results[symbol] = QuoteSeries.from_frame(df[symbol], intraday=intraday)
+        elif df.columns.nlevels == 1 and len(symbols) == 1:
+            # starsze yfinance zwracają płaskie kolumny dla jednego tickera
+            results[symbol] = QuoteSeries.from_frame(df, intraday=intraday)
+        else:
+            results[symbol] = QuoteSeries.empty()
+    return results
@@ -1,5 +1,6 @@
 import sys
 import os
+from datetime import date, timedelta
 
 # 🔥 Najpierw dodajemy ścieżkę backendu do Pythona
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))   # .../market-analyzer/backend
@@ -8,11 +9,15 @@ sys.path.append(BASE_DIR)
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 # 🔥 Teraz importy działają
 from main import app
-from db import Base, get_db
+from db import Base, get_db, get_async_db
+from async_services import configure_upstream_sessions
+from log_writer import configure_log_writer
+from quote_series import QuoteSeries
 
 # Baza testowa (SQLite)
 TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -22,6 +27,12 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ta sama baza dla endpointów async
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 # Reset bazy testowej
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
@@ -34,10 +45,38 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+configure_upstream_sessions(TestingSessionLocal)
+configure_log_writer(TestingSessionLocal)
 
 
 @pytest.fixture
 def client():
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+
+def make_bars(start: date, closes, spread=None, volume=None) -> QuoteSeries:
+    """
+    Dzienne świece testowe od `start` (kolejne dni kalendarzowe) z cenami
+    zamknięcia `closes` (pojedyncza liczba = jedna świeca). Ze `spread`:
+    open = close, high/low = close ± spread; bez niego open/high/low puste.
+    """
+    if isinstance(closes, (int, float)):
+        closes = [closes]
+    return QuoteSeries.from_records(
+        {
+            "date": start + timedelta(days=i),
+            "open": None if spread is None else close,
+            "high": None if spread is None else close + spread,
+            "low": None if spread is None else close - spread,
+            "close": close,
+            "volume": volume,
+        }
+        for i, close in enumerate(closes)
+    )
@@ -0,0 +1,43 @@
+from services import AlertIndex, AlertService
+from tests.conftest import TestingSessionLocal
+
+
+def test_check_alerts_fetches_price_once_per_symbol(monkeypatch):
+    db = TestingSessionLocal()
+    service = AlertService(db)
+
+    hit_above = service.create_alert("IDXA", "above", 100)
+    miss_above = service.create_alert("IDXA", "above", 120)
+    hit_below = service.create_alert("IDXA", "below", 115)
+    miss_below = service.create_alert("IDXB", "below", 10)
+
+    prices = {"IDXA": 110.0, "IDXB": 20.0}
+    calls = []
+
+    def fake_price(symbol):
+        calls.append(symbol)
+        return prices.get(symbol)
+
+    monkeypatch.setattr(service, "_fetch_current_price", fake_price)
+
+    triggered_ids = {a.id for a in service.check_alerts()}
+
+    assert {hit_above.id, hit_below.id} <= triggered_ids
+    assert miss_above.id not in triggered_ids
+    assert miss_below.id not in triggered_ids
+    assert calls.count("IDXA") == 1
+    assert calls.count("IDXB") == 1
+
+
+def test_alert_index_boundaries():
+    class A:
+        def __init__(self, id, condition, threshold_price):
+            self.id, self.symbol = id, "X"
+            self.condition, self.threshold_price = condition, threshold_price
+
+    index = AlertIndex([A(1, "above", 10), A(2, "above", 20), A(3, "below", 10), A(4, "below", 5)])
+
+    assert sorted(index.triggered("X", 10)) == [1, 3]
+    assert index.triggered("X", 7) == [3]
+    assert sorted(index.triggered("X", 25)) == [1, 2]
+    assert index.triggered("Y", 10) == []
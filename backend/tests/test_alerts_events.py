@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+import services
+import simple_yahoo_api
+from models import Alert
+from services import AlertService, MarketDataService
+from tests.conftest import TestingSessionLocal, make_bars
+
+
+def _bars_until_today(close):
+    def fake(symbol, start=None, end=None, interval="1d", **kwargs):
+        return make_bars(date.today(), close)
+    return fake
+
+
+def test_ingestion_triggers_alerts_without_polling(monkeypatch):
+    db = TestingSessionLocal()
+    alerts = AlertService(db)
+    hit = alerts.create_alert("EVTA", "above", 50)
+    miss = alerts.create_alert("EVTA", "below", 40)
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", _bars_until_today(60.0))
+    MarketDataService(db).fetch_and_store_history(
+        "EVTA", start=date.today() - timedelta(days=1), end=date.today()
+    )
+
+    db.expire_all()
+    assert db.get(Alert, hit.id).last_triggered_at is not None
+    assert db.get(Alert, miss.id).last_triggered_at is None
+
+    # polling używa świeżej ceny z ingestu zamiast odpytywać Yahoo
+    def no_upstream(symbol):
+        assert symbol != "EVTA"
+        return None
+
+    monkeypatch.setattr(AlertService, "_fetch_current_price", lambda self, symbol: no_upstream(symbol))
+    triggered = AlertService(db).check_alerts()
+    assert hit.id in {a.id for a in triggered}
+
+
+def test_backfill_does_not_trigger_alerts(monkeypatch):
+    db = TestingSessionLocal()
+    alert = AlertService(db).create_alert("EVTB", "above", 1)
+
+    def old_bars(symbol, start=None, end=None, interval="1d", **kwargs):
+        return make_bars(date(2015, 1, 2), 10.0)
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", old_bars)
+    MarketDataService(db).fetch_and_store_history(
+        "EVTB", start=date(2015, 1, 1), end=date(2015, 1, 5)
+    )
+
+    db.expire_all()
+    assert db.get(Alert, alert.id).last_triggered_at is None
+
+
+def test_repeated_ingest_does_not_retrigger_alert(monkeypatch):
+    db = TestingSessionLocal()
+    alerts = AlertService(db)
+    alert = alerts.create_alert("EVTC", "above", 50)
+
+    assert [a.id for a in alerts.on_quotes_stored("EVTC", make_bars(date.today(), 45.0))] == []
+    assert [a.id for a in alerts.on_quotes_stored("EVTC", make_bars(date.today(), 60.0))] == [alert.id]
+    first_trigger = db.get(Alert, alert.id).last_triggered_at
+
+    # ponowne pobranie hot tail – cena nadal powyżej progu, bez przekroczenia
+    assert alerts.on_quotes_stored("EVTC", make_bars(date.today(), 61.0)) == []
+
+    # po restarcie (brak poprzedniej ceny) chroni cooldown
+    services._last_prices.pop("EVTC")
+    assert alerts.on_quotes_stored("EVTC", make_bars(date.today(), 62.0)) == []
+
+    db.expire_all()
+    assert db.get(Alert, alert.id).last_triggered_at == first_trigger
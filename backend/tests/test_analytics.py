@@ -0,0 +1,61 @@
+import statistics
+from datetime import date
+
+import numpy as np
+
+import analytics
+from quote_series import QuoteSeries
+from tests.conftest import make_bars
+
+
+def test_metrics_match_reference_implementation():
+    rng = np.random.default_rng(0)
+    closes = list(100 * np.cumprod(1 + rng.normal(0, 0.01, 300)))
+
+    dates, _, matrix = analytics.align_closes({"A": make_bars(date(2020, 1, 1), closes)})
+    metrics = analytics.column_metrics(analytics.compute_metrics(dates, matrix), 0)
+
+    returns = [closes[i] / closes[i - 1] - 1.0 for i in range(1, len(closes))]
+    peak, drawdown = closes[0], 0.0
+    for c in closes:
+        peak = max(peak, c)
+        drawdown = min(drawdown, (c / peak - 1.0) * 100.0)
+
+    assert np.isclose(metrics["return_pct"], (closes[-1] / closes[0] - 1.0) * 100.0)
+    assert np.isclose(metrics["volatility_pct"], statistics.pstdev(returns) * 100.0)
+    assert np.isclose(metrics["max_drawdown_pct"], drawdown)
+    assert np.isclose(
+        metrics["sharpe_ratio"],
+        statistics.fmean(returns) / statistics.pstdev(returns) * np.sqrt(252),
+    )
+    assert metrics["beta"] is None
+
+
+def test_missing_days_do_not_create_zero_returns():
+    full = make_bars(date(2021, 1, 1), [100, 101, 99, 102])
+    gappy = make_bars(date(2021, 1, 1), [50, 51, 51, 53])
+    gappy = QuoteSeries(
+        dates=np.delete(gappy.dates, 2),
+        **{f: np.delete(getattr(gappy, f), 2) for f in ("open", "high", "low", "close", "volume")},
+    )
+
+    _, _, matrix = analytics.align_closes({"FULL": full, "GAPPY": gappy})
+    returns = analytics.daily_returns(matrix)
+
+    assert np.isnan(returns[2, 1])
+    assert np.isclose(returns[3, 1], 53 / 51 - 1)
+
+
+def test_beta_against_benchmark():
+    bench_closes = [100, 101, 99, 102, 104]
+    double_closes = [50.0]
+    for prev, cur in zip(bench_closes, bench_closes[1:]):
+        double_closes.append(double_closes[-1] * (1 + 2 * (cur / prev - 1)))
+
+    dates, symbols, matrix = analytics.align_closes(
+        {"BENCH": make_bars(date(2021, 1, 1), bench_closes),
+         "DOUBLE": make_bars(date(2021, 1, 1), double_closes)}
+    )
+    metrics = analytics.compute_metrics(dates, matrix, benchmark_col=symbols.index("BENCH"))
+
+    assert np.allclose(metrics["beta"], [1.0, 2.0])
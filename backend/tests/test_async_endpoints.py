@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from datetime import date
+
+import httpx
+
+import async_services
+import simple_yahoo_api
+from main import app
+from tests.conftest import make_bars
+
+
+def test_slow_upstream_does_not_block_other_requests(monkeypatch):
+    release = threading.Event()
+
+    def slow_history(symbol, start=None, end=None, interval="1d", **kwargs):
+        release.wait(5)
+        return make_bars(date(2021, 6, 1), 3.0)
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", slow_history)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            history = asyncio.create_task(
+                client.get(
+                    "/api/history",
+                    params={"symbol": "ASYNC1", "start": "2021-06-01", "end": "2021-06-04"},
+                )
+            )
+            await asyncio.sleep(0.1)
+
+            # pobranie z Yahoo wisi w puli upstream – reszta API odpowiada
+            logs = await asyncio.wait_for(client.get("/api/logs"), timeout=2)
+            assert logs.status_code == 200
+            assert not history.done()
+
+            release.set()
+            return await asyncio.wait_for(history, timeout=5)
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    assert [q["close"] for q in response.json()["quotes"]] == [3.0]
+
+
+def test_covered_history_does_not_use_upstream_pool(client, monkeypatch):
+    monkeypatch.setattr(
+        simple_yahoo_api,
+        "get_history_columns",
+        lambda symbol, start=None, end=None, interval="1d", **kwargs: make_bars(
+            date(2021, 6, 1), [1.0, 2.0, 3.0, 4.0]
+        ),
+    )
+    params = {"symbol": "ASYNC2", "start": "2021-06-01", "end": "2021-06-04"}
+    assert client.get("/api/history", params=params).status_code == 200
+
+    jobs = []
+    original = async_services.run_upstream
+
+    async def counting_run_upstream(fn):
+        jobs.append(fn)
+        return await original(fn)
+
+    monkeypatch.setattr(async_services, "run_upstream", counting_run_upstream)
+
+    # luki liczone na AsyncSession – pełne pokrycie nie zajmuje puli upstream
+    response = client.get("/api/history", params=params)
+    assert response.status_code == 200
+    assert [q["close"] for q in response.json()["quotes"]] == [1.0, 2.0, 3.0, 4.0]
+    assert jobs == []
@@ -0,0 +1,159 @@
+from datetime import date
+
+import redis
+
+from cache import LocalCache, RedisCache, TieredCache
+from quote_series import QuoteSeries
+from tests.conftest import make_bars
+
+
+class _DownRedis:
+    """Klient, który zachowuje się jak niedostępny Redis."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def pipeline(self):
+        self.calls += 1
+        raise redis.ConnectionError("down")
+
+    def set(self, *args, **kwargs):
+        self.calls += 1
+        raise redis.ConnectionError("down")
+
+
+class _MemoryRedis:
+    """Minimalny klient Redis w pamięci (get/pttl w pipeline, set)."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, ex=None, **kwargs):
+        self.data[key] = value
+        return True
+
+    def pipeline(self):
+        data, results = self.data, []
+
+        class Pipeline:
+            def get(self, key):
+                results.append(data.get(key))
+
+            def pttl(self, key):
+                results.append(60_000 if key in data else -2)
+
+            def execute(self):
+                return results
+
+        return Pipeline()
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_entries=2)
+    local.set("a", 1, 60)
+    local.set("b", 2, 60)
+    local.get("a")
+    local.set("c", 3, 60)
+
+    tiered = TieredCache(local)
+    assert tiered.get("a") == 1
+    assert tiered.get("b") is None
+    assert tiered.get("c") == 3
+
+
+def test_cache_degrades_when_redis_is_down():
+    client = _DownRedis()
+    tiered = TieredCache(LocalCache(), RedisCache(client, retry_after=60))
+
+    tiered.set("current:AAPL", {"close": 1.0}, 300)
+    assert tiered.get("current:AAPL") == {"close": 1.0}
+    assert tiered.get("missing") is None
+    tiered.get("missing-too")
+
+    # po pierwszym błędzie Redis jest pomijany do upływu retry_after
+    assert client.calls == 1
+
+
+def test_encoded_values_stay_decoded_in_local_tier():
+    decoded = []
+
+    def decode(raw):
+        decoded.append(raw)
+        return QuoteSeries.from_bytes(raw)
+
+    series = make_bars(date(2021, 1, 4), 1.5, spread=0.5, volume=100.0)
+    remote = RedisCache(_MemoryRedis())
+    writer = TieredCache(LocalCache(), remote)
+    writer.set("series:ENC:g1", series, 300, encode=QuoteSeries.to_bytes)
+    assert writer.get("series:ENC:g1", decode=decode) is series
+
+    # inny worker: jedno dekodowanie bajtów z Redisa, potem gotowy obiekt z LRU
+    reader = TieredCache(LocalCache(), remote)
+    first = reader.get("series:ENC:g1", decode=decode)
+    assert reader.get("series:ENC:g1", decode=decode) is first
+    assert first.close.tolist() == [1.5]
+    assert len(decoded) == 1
+
+
+def test_clear_flushes_local_tier():
+    tiered = TieredCache(LocalCache())
+    tiered.set("history:X", [1, 2], 300)
+    tiered.clear()
+    assert tiered.get("history:X") is None
+
+
+def test_generation_bump_invalidates_keys():
+    tiered = TieredCache(LocalCache())
+    before = tiered.generation("symbol:AAPL")
+
+    assert tiered.bump_generation("symbol:AAPL") == before + 1
+    assert tiered.generation("symbol:AAPL") == before + 1
+    assert tiered.generation("symbol:MSFT") == 0
+
+
+def test_history_cache_is_invalidated_by_ingestion(monkeypatch):
+    import simple_yahoo_api
+    from services import MarketDataService
+    from tests.conftest import TestingSessionLocal
+
+    closes = iter([1.0, 2.0])
+
+    def fake(symbol, start=None, end=None, interval="1d", **kwargs):
+        return make_bars(date.today(), next(closes))
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", fake)
+    monkeypatch.setattr(MarketDataService, "HOT_TAIL_REFRESH_SECONDS", 0)
+    service = MarketDataService(TestingSessionLocal())
+
+    service.fetch_and_store_history("GENTEST", start=date.today(), end=date.today())
+    assert [q["close"] for q in service.get_history_from_db("GENTEST")] == [1.0]
+
+    # hot tail jest pobierany ponownie -> nowe dane muszą być widoczne od razu
+    service.fetch_and_store_history("GENTEST", start=date.today(), end=date.today())
+    assert [q["close"] for q in service.get_history_from_db("GENTEST")] == [2.0]
+
+
+def test_refetching_identical_bars_keeps_generation(monkeypatch):
+    import simple_yahoo_api
+    import services
+    from cache import get_generation
+    from services import MarketDataService
+    from tests.conftest import TestingSessionLocal
+
+    monkeypatch.setattr(
+        simple_yahoo_api,
+        "get_history_columns",
+        lambda symbol, start=None, end=None, interval="1d", **kwargs: make_bars(date.today(), 5.0),
+    )
+    notified = []
+    monkeypatch.setattr(services, "_quote_listeners", [lambda db, symbol, series: notified.append(symbol)])
+    monkeypatch.setattr(MarketDataService, "HOT_TAIL_REFRESH_SECONDS", 0)
+    service = MarketDataService(TestingSessionLocal())
+
+    service.fetch_and_store_history("GENSAME", start=date.today(), end=date.today())
+    generation = get_generation("symbol:GENSAME")
+
+    # te same świece z hot tail – bez zmiany wierszy nic nie jest unieważniane
+    service.fetch_and_store_history("GENSAME", start=date.today(), end=date.today())
+    assert get_generation("symbol:GENSAME") == generation
+    assert notified == ["GENSAME"]
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+from datetime import date
+
+import simple_yahoo_api
+from async_services import AsyncMarketDataService
+from tests.conftest import TestingAsyncSessionLocal, make_bars
+
+
+def test_concurrent_fetch_reports_failures_per_symbol(monkeypatch):
+    # bariera przepuści wątki tylko, jeśli wszystkie 3 pobrania trwają naraz
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_history(symbol, start=None, end=None, interval="1d", **kwargs):
+        barrier.wait()
+        if symbol == "CCBROKEN":
+            raise RuntimeError("upstream error")
+        return make_bars(date(2022, 5, 2), 5.0)
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", fake_history)
+
+    async def fetch():
+        async with TestingAsyncSessionLocal() as db:
+            return await AsyncMarketDataService(db).fetch_series_concurrent(
+                ["CCONE", "CCTWO", "CCBROKEN"], start=date(2022, 5, 2), end=date(2022, 5, 6)
+            )
+
+    series, errors = asyncio.run(fetch())
+
+    assert set(series) == {"CCONE", "CCTWO"}
+    assert series["CCONE"].close.tolist() == [5.0]
+    assert errors == {"CCBROKEN": "upstream error"}
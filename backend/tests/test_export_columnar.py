@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from async_services import AsyncExportService
+from services import ExportService, MarketDataService
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal, make_bars
+
+
+def _store(db, symbol, count):
+    service = MarketDataService(db)
+    instrument = service.get_or_create_instrument(symbol)
+    closes = [round(100.5 + i * 0.01, 2) for i in range(count)]
+    service._store_quotes(instrument.id, make_bars(date(2000, 1, 1), closes, spread=0.5, volume=1_000_000.0))
+    db.commit()
+
+
+def _export(method, *args):
+    async def collect():
+        async with TestingAsyncSessionLocal() as db:
+            return [chunk async for chunk in getattr(AsyncExportService(db), method)(*args)]
+
+    return asyncio.run(collect())
+
+
+def test_bundle_has_dictionary_encoded_symbol_column(monkeypatch):
+    db = TestingSessionLocal()
+    _store(db, "COLA", 30)
+    _store(db, "COLB", 20)
+    db.close()
+    monkeypatch.setattr(ExportService, "EXPORT_BATCH_SIZE", 16)
+
+    data = b"".join(_export("iter_history_columnar", ["COLB", "COLA"], "arrow"))
+    table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+
+    assert table.schema.field("symbol").type == pa.dictionary(pa.int32(), pa.string())
+    assert table.num_rows == 50
+    assert table.column("symbol").to_pylist() == ["COLA"] * 30 + ["COLB"] * 20
+    assert table.column("date")[0].as_py() == date(2000, 1, 1)
+
+
+def test_parquet_is_much_smaller_than_csv():
+    db = TestingSessionLocal()
+    _store(db, "COLBIG", 5000)
+    db.close()
+
+    parquet = b"".join(_export("iter_history_columnar", ["COLBIG"], "parquet"))
+    csv = "".join(_export("iter_history_csv", "COLBIG")).encode()
+
+    assert pq.read_table(pa.BufferReader(parquet)).num_rows == 5000
+    assert len(parquet) * 3 < len(csv)
+
+
+def test_export_endpoint_returns_parquet_bundle(client):
+    response = client.get(
+        "/api/export/parquet",
+        params={"symbols": "colx,coly", "start": "2023-03-01", "end": "2023-03-05"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(pa.BufferReader(response.content))
+    assert set(table.column("symbol").to_pylist()) == {"COLX", "COLY"}
+
+
+def test_unknown_export_format_is_rejected(client):
+    response = client.get(
+        "/api/export/xlsx",
+        params={"symbols": "AAPL", "start": "2023-03-01", "end": "2023-03-05"},
+    )
+    assert response.status_code == 422
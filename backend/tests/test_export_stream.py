@@ -0,0 +1,64 @@
+import asyncio
+import gzip
+from datetime import date
+
+from async_services import AsyncExportService, gzip_chunks_async
+from services import ExportService, MarketDataService
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal, make_bars
+
+
+def _store(symbol, start, count):
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    instrument = service.get_or_create_instrument(symbol)
+    service._store_quotes(
+        instrument.id, make_bars(start, [1.5 + i for i in range(count)], spread=0.5, volume=10.0)
+    )
+    db.commit()
+    return db
+
+
+def test_history_csv_is_streamed_in_chunks(monkeypatch):
+    db = _store("CSVSTREAM", date(2015, 1, 1), 25)
+    monkeypatch.setattr(ExportService, "EXPORT_BATCH_SIZE", 10)
+
+    db.close()
+
+    async def export():
+        async with TestingAsyncSessionLocal() as adb:
+            return [chunk async for chunk in AsyncExportService(adb).iter_history_csv("CSVSTREAM")]
+
+    chunks = asyncio.run(export())
+
+    # nagłówek + 3 paczki z kursora (10 + 10 + 5)
+    assert len(chunks) == 4
+    lines = "".join(chunks).splitlines()
+    assert lines[0] == "date,open,high,low,close,volume"
+    assert lines[1] == "2015-01-01,1.5,2.0,1.0,1.5,10.0"
+    assert len(lines) == 26
+
+
+def test_gzip_chunks_roundtrip():
+    chunks = ["a,b\n", "", "1,2\n" * 1000]
+
+
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def compress():
+        return b"".join([data async for data in gzip_chunks_async(source())])
+
+    assert gzip.decompress(asyncio.run(compress())).decode() == "".join(chunks)
+
+
+def test_export_endpoint_gzip_matches_plain(client):
+    params = {"symbol": "CSVGZIP", "start": "2023-02-01", "end": "2023-02-10"}
+
+    plain = client.get("/api/export/csv", params=params)
+    packed = client.get("/api/export/csv", params={**params, "gzip": "true"})
+
+    assert packed.status_code == 200
+    assert packed.headers["content-type"] == "application/gzip"
+    assert gzip.decompress(packed.content).decode() == plain.text
+    assert plain.text.startswith("date,open,high,low,close,volume")
@@ -0,0 +1,80 @@
+import asyncio
+from datetime import date
+
+import simple_yahoo_api
+from async_services import AsyncMarketDataService
+from tests.conftest import TestingAsyncSessionLocal, make_bars
+
+
+def _fake_batch(calls, missing=()):
+    def fake(symbols, start=None, end=None, interval="1d", **kwargs):
+        calls.append((list(symbols), start, end))
+        return {
+            symbol: make_bars(start, [10.0] * (end - start).days)
+            for symbol in symbols
+            if symbol not in missing
+        }
+    return fake
+
+
+def _fetch_batch(symbols, start, end):
+    async def fetch():
+        async with TestingAsyncSessionLocal() as db:
+            return await AsyncMarketDataService(db).fetch_and_store_history_batch(symbols, start, end)
+
+    return asyncio.run(fetch())
+
+
+def test_batch_fetch_uses_single_upstream_call(monkeypatch):
+    calls = []
+    monkeypatch.setattr(simple_yahoo_api, "get_history_batch", _fake_batch(calls))
+
+    result = _fetch_batch(
+        ["BATCH1", "BATCH2"], start=date(2021, 3, 1), end=date(2021, 3, 5)
+    )
+
+    assert [symbols for symbols, _, _ in calls] == [["BATCH1", "BATCH2"]]
+    assert [q["close"] for q in result["BATCH1"]] == [10.0] * 5
+    assert [q["close"] for q in result["BATCH2"]] == [10.0] * 5
+
+    # zakres jest już pokryty – drugie wywołanie nie idzie do Yahoo
+    _fetch_batch(
+        ["BATCH1", "BATCH2"], start=date(2021, 3, 1), end=date(2021, 3, 5)
+    )
+    assert len(calls) == 1
+
+
+def test_batch_fetch_downloads_only_each_groups_gaps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(simple_yahoo_api, "get_history_batch", _fake_batch(calls, missing={"BATCHBAD"}))
+    _fetch_batch(["BATCH3"], start=date(2021, 4, 5), end=date(2021, 4, 9))
+    calls.clear()
+
+    _fetch_batch(
+        ["BATCH3", "BATCH4", "BATCHBAD"], start=date(2021, 4, 1), end=date(2021, 4, 9)
+    )
+
+    # BATCH3 dociąga tylko 1–4 kwietnia, nowe symbole cały zakres
+    assert sorted(calls) == [
+        (["BATCH3"], date(2021, 4, 1), date(2021, 4, 5)),
+        (["BATCH4", "BATCHBAD"], date(2021, 4, 1), date(2021, 4, 10)),
+    ]
+
+    # symbol pominięty przez Yahoo nie jest oznaczony jako pobrany
+    calls.clear()
+    _fetch_batch(
+        ["BATCH3", "BATCH4", "BATCHBAD"], start=date(2021, 4, 1), end=date(2021, 4, 9)
+    )
+    assert calls == [(["BATCHBAD"], date(2021, 4, 1), date(2021, 4, 10))]
+
+
+def test_history_batch_endpoint(client):
+    response = client.get(
+        "/api/history/batch",
+        params={"symbols": "AAPL,MSFT", "start": "2023-01-01", "end": "2023-01-10"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["symbols"] == ["AAPL", "MSFT"]
+    assert set(data["series"]) == {"AAPL", "MSFT"}
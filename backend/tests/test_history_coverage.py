@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+
+import simple_yahoo_api
+from cache import clear_cache
+from quote_series import QuoteSeries
+from services import MarketDataService
+from tests.conftest import TestingSessionLocal, make_bars
+
+
+def _fake_history(calls):
+    def fake(symbol, start=None, end=None, interval="1d", **kwargs):
+        calls.append((start, end))
+        return make_bars(start, range(1, (end - start).days + 1), spread=0.5, volume=100.0)
+    return fake
+
+
+def test_fetch_only_requests_missing_ranges(monkeypatch):
+    calls = []
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", _fake_history(calls))
+
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+
+    service.fetch_and_store_history("COVTEST", start=date(2020, 1, 10), end=date(2020, 1, 20))
+    quotes = service.fetch_and_store_history("COVTEST", start=date(2020, 1, 1), end=date(2020, 1, 31))
+
+    assert calls == [
+        (date(2020, 1, 10), date(2020, 1, 21)),
+        (date(2020, 1, 1), date(2020, 1, 10)),
+        (date(2020, 1, 21), date(2020, 2, 1)),
+    ]
+    assert len(quotes) == 31
+
+    # cały zakres jest już pokryty – brak kolejnych wywołań Yahoo
+    service.fetch_and_store_history("COVTEST", start=date(2020, 1, 5), end=date(2020, 1, 25))
+    assert len(calls) == 3
+
+
+def test_hot_tail_is_refetched_after_refresh_interval(monkeypatch):
+    calls = []
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", _fake_history(calls))
+
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    today = date.today()
+
+    service.fetch_and_store_history("HOTTAIL", start=today - timedelta(days=10), end=today)
+    # ogon pobrany przed chwilą – kolejne żądanie nie idzie do Yahoo
+    service.fetch_and_store_history("HOTTAIL", start=today - timedelta(days=10), end=today)
+    assert len(calls) == 1
+
+    clear_cache()  # wpis świeżości ogona wygasł
+    service.fetch_and_store_history("HOTTAIL", start=today - timedelta(days=10), end=today)
+
+    tail_start = today - timedelta(days=MarketDataService.HOT_TAIL_DAYS - 1)
+    assert calls[-1] == (tail_start, today + timedelta(days=1))
+
+
+def test_empty_download_is_not_marked_covered(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        simple_yahoo_api,
+        "get_history_columns",
+        lambda symbol, start=None, end=None, interval="1d", **kwargs: calls.append((start, end)) or QuoteSeries.empty(),
+    )
+    service = MarketDataService(TestingSessionLocal())
+
+    service.fetch_and_store_history("COVEMPTY", start=date(2020, 3, 2), end=date(2020, 3, 6))
+    service.fetch_and_store_history("COVEMPTY", start=date(2020, 3, 2), end=date(2020, 3, 6))
+
+    assert len(calls) == 2
+
+
+def test_old_gap_is_covered_past_trailing_holiday(monkeypatch):
+    calls = []
+    fake = _fake_history(calls)
+    # 1 stycznia nie ma sesji – Yahoo zwraca świece tylko do 31 grudnia
+    monkeypatch.setattr(
+        simple_yahoo_api,
+        "get_history_columns",
+        lambda symbol, start=None, end=None, **kwargs: fake(symbol, start, min(end, date(2020, 1, 1))),
+    )
+    service = MarketDataService(TestingSessionLocal())
+
+    service.fetch_and_store_history("COVHOLIDAY", start=date(2019, 12, 30), end=date(2020, 1, 1))
+    service.fetch_and_store_history("COVHOLIDAY", start=date(2019, 12, 30), end=date(2020, 1, 1))
+
+    assert len(calls) == 1
@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+import simple_yahoo_api
+from models import HistoricalQuote, QuoteRollup
+from quote_series import QuoteSeries
+from services import MarketDataService
+from tests.conftest import TestingSessionLocal, make_bars
+
+
+def test_resample_aggregates_ohlcv_per_period():
+    series = QuoteSeries(
+        dates=np.array(["2024-01-03", "2024-01-04", "2024-01-05", "2024-01-08"], dtype="datetime64[D]"),
+        open=np.array([np.nan, 2.0, 3.0, 4.0]),
+        high=np.array([5.0, 9.0, np.nan, 4.5]),
+        low=np.array([1.0, 0.5, 2.0, np.nan]),
+        close=np.array([1.5, 2.5, 3.5, 4.2]),
+        volume=np.array([100.0, np.nan, 300.0, np.nan]),
+    )
+
+    weeks = series.resample("week").to_records()
+
+    assert weeks[0] == {"date": date(2024, 1, 1), "open": 2.0, "high": 9.0,
+                        "low": 0.5, "close": 3.5, "volume": 400.0}
+    assert weeks[1] == {"date": date(2024, 1, 8), "open": 4.0, "high": 4.5,
+                        "low": None, "close": 4.2, "volume": None}
+    assert series.resample("quarter").dates.tolist() == [date(2024, 1, 1)]
+
+
+def test_rollups_follow_stored_daily_bars():
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    instrument = service.get_or_create_instrument("ROLL1")
+
+    # styczeń + luty
+    service._store_quotes(instrument.id, make_bars(date(2023, 1, 1), range(1, 60), spread=0.5, volume=10.0))
+    db.commit()
+    months = service.get_history_rollup("ROLL1", "month")
+    assert [(m.period_start, m.open, m.close) for m in months] == [
+        (date(2023, 1, 1), 1.0, 31.0),
+        (date(2023, 2, 1), 32.0, 59.0),
+    ]
+
+    # korekta końca lutego + nowy marzec – przeliczone tylko dotknięte okresy
+    service._store_quotes(
+        instrument.id, make_bars(date(2023, 2, 28), range(100, 105), spread=0.5, volume=10.0)
+    )
+    db.commit()
+    months = service.get_history_rollup("ROLL1", "month", start=date(2023, 2, 15))
+    assert [(m.period_start, m.close, m.high, m.volume) for m in months] == [
+        (date(2023, 2, 1), 100.0, 100.5, 280.0),
+        (date(2023, 3, 1), 104.0, 104.5, 40.0),
+    ]
+    years = service.get_history_rollup("ROLL1", "year")
+    assert [(y.open, y.low, y.close) for y in years] == [(1.0, 0.5, 104.0)]
+
+
+def test_rollups_are_backfilled_for_existing_history():
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    instrument = service.get_or_create_instrument("ROLL2")
+    db.add_all([
+        HistoricalQuote(instrument_id=instrument.id, date=date(2010, 1, 1) + timedelta(days=i), close=float(i))
+        for i in range(800)
+    ])
+    db.commit()
+
+    quarters = service.get_history_rollup("ROLL2", "quarter")
+
+    assert len(quarters) == 9
+    assert db.query(QuoteRollup).filter(QuoteRollup.instrument_id == instrument.id).count() > 0
+
+
+def test_history_endpoint_returns_requested_resolution(client, monkeypatch):
+    monkeypatch.setattr(
+        simple_yahoo_api,
+        "get_history_columns",
+        lambda symbol, start=None, end=None, interval="1d", **kwargs: make_bars(
+            start, range(1, (end - start).days + 1), spread=0.5, volume=10.0
+        ),
+    )
+    params = {"symbol": "ROLL3", "start": "2021-01-01", "end": "2021-12-31"}
+
+    daily = client.get("/api/history", params=params).json()["quotes"]
+    monthly = client.get("/api/history", params={**params, "resolution": "month"}).json()["quotes"]
+
+    assert len(daily) == 365
+    assert [q["date"] for q in monthly][:2] == ["2021-01-01", "2021-02-01"]
+    assert len(monthly) == 12
+    assert monthly[0]["volume"] == 310.0
+    assert client.get("/api/history", params={**params, "resolution": "decade"}).status_code == 422
+
+
+
+def test_history_endpoint_fetches_whole_first_period(client, monkeypatch):
+    calls = []
+
+    def fake_history(symbol, start=None, end=None, interval="1d", **kwargs):
+        calls.append((start, end))
+        return make_bars(start, [1.0] * (end - start).days, spread=0.5, volume=10.0)
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", fake_history)
+    params = {"symbol": "ROLL4", "start": "2021-03-15", "end": "2021-04-30", "resolution": "month"}
+
+    monthly = client.get("/api/history", params=params).json()["quotes"]
+
+    # marzec pobrany od 1. dnia – pierwsza świeca nie jest liczona z połowy miesiąca
+    assert calls[0][0] == date(2021, 3, 1)
+    assert [(q["date"], q["volume"]) for q in monthly] == [("2021-03-01", 310.0), ("2021-04-01", 300.0)]
+
+
+def test_week_spanning_new_year_uses_bars_from_both_years():
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    december = service.get_or_create_instrument("ROLLNY1")
+    january = service.get_or_create_instrument("ROLLNY2")
+
+    # ta sama paczka świec zapisana w obu kolejnościach (ingest / backfill)
+    december_bars = make_bars(date(2025, 12, 29), range(10, 13), spread=0.5, volume=10.0)
+    january_bars = make_bars(date(2026, 1, 2), 13.0, spread=0.5, volume=10.0)
+    service._store_quotes(december.id, december_bars)
+    service._store_quotes(december.id, january_bars)
+    service._store_quotes(january.id, january_bars)
+    service._store_quotes(january.id, december_bars)
+    db.commit()
+
+    for symbol in ("ROLLNY1", "ROLLNY2"):
+        weeks = service.get_history_rollup(symbol, "week")
+        assert [(w.period_start, w.open, w.close, w.volume) for w in weeks] == [
+            (date(2025, 12, 29), 10.0, 13.0, 40.0)
+        ]
+        years = service.get_history_rollup(symbol, "year")
+        assert [(y.period_start, y.close) for y in years] == [
+            (date(2025, 1, 1), 12.0), (date(2026, 1, 1), 13.0)
+        ]
@@ -0,0 +1,21 @@
+from datetime import date
+
+from models import HistoricalQuote
+from services import MarketDataService
+from tests.conftest import TestingSessionLocal, make_bars
+
+
+def test_bulk_upsert_inserts_and_updates_in_chunks():
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    instrument = service.get_or_create_instrument("UPSERT1")
+    count = MarketDataService.UPSERT_CHUNK_SIZE * 2 + 7
+
+    service._store_quotes(instrument.id, make_bars(date(2010, 1, 1), [1.0] * count))
+    db.commit()
+    service._store_quotes(instrument.id, make_bars(date(2010, 1, 1), [2.0] * count))
+    db.commit()
+
+    quotes = db.query(HistoricalQuote).filter_by(instrument_id=instrument.id).all()
+    assert len(quotes) == count
+    assert {q.close for q in quotes} == {2.0}
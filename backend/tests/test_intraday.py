@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+import numpy as np
+
+import simple_yahoo_api
+from models import HistoricalQuote, IntradayBar, Instrument
+from quote_series import QuoteSeries
+from services import MarketDataService
+from tests.conftest import TestingSessionLocal
+
+
+def _fake_intraday(close=10.0):
+    def fake(symbol, start=None, end=None, interval="1d", **kwargs):
+        assert interval == "5m"
+        times = [f"{start}T14:30", f"{start}T14:35", f"{start}T14:40"]
+        return QuoteSeries(
+            dates=np.array(times, dtype="datetime64[s]"),
+            open=np.array([1.0, 2.0, 3.0]),
+            high=np.array([1.5, 2.5, 3.5]),
+            low=np.array([0.5, 1.5, 2.5]),
+            close=np.array([close, close + 1, close + 2]),
+            volume=np.array([100.0, np.nan, 300.0]),
+        )
+    return fake
+
+
+def test_intraday_bars_go_to_their_own_table(monkeypatch):
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", _fake_intraday())
+
+    db = TestingSessionLocal()
+    bars = MarketDataService(db).fetch_and_store_history(
+        "INTRA1", start=date(2024, 1, 2), end=date(2024, 1, 2), interval="5m"
+    )
+
+    assert [b.timestamp for b in bars] == [
+        datetime(2024, 1, 2, 14, 30),
+        datetime(2024, 1, 2, 14, 35),
+        datetime(2024, 1, 2, 14, 40),
+    ]
+    assert [b.volume for b in bars] == [100, None, 300]
+
+    instrument = db.query(Instrument).filter(Instrument.symbol == "INTRA1").one()
+    assert db.query(HistoricalQuote).filter(HistoricalQuote.instrument_id == instrument.id).count() == 0
+
+
+def test_intraday_refetch_updates_bars_in_place(monkeypatch):
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    instrument = service.get_or_create_instrument("INTRA2")
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", _fake_intraday(10.0))
+    service._store_intraday_bars(instrument.id, "5m", simple_yahoo_api.get_history_columns(
+        "INTRA2", start=date(2024, 1, 3), interval="5m"))
+    service._store_intraday_bars(instrument.id, "5m", _fake_intraday(20.0)(
+        "INTRA2", start=date(2024, 1, 3), interval="5m"))
+    db.commit()
+
+    rows = db.query(IntradayBar).filter(IntradayBar.instrument_id == instrument.id).all()
+    assert sorted(r.close for r in rows) == [20.0, 21.0, 22.0]
+
+
+def test_intraday_endpoint_returns_timestamps(client, monkeypatch):
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", _fake_intraday())
+
+    r = client.get(
+        "/api/history/intraday",
+        params={"symbol": "INTRA3", "start": "2024-01-04", "end": "2024-01-04", "interval": "5m"},
+    )
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["interval"] == "5m"
+    assert [b["timestamp"] for b in body["bars"]] == [
+        "2024-01-04T14:30:00", "2024-01-04T14:35:00", "2024-01-04T14:40:00"
+    ]
+
+
+def test_intraday_endpoint_rejects_daily_interval(client):
+    r = client.get(
+        "/api/history/intraday",
+        params={"symbol": "INTRA4", "start": "2024-01-04", "end": "2024-01-04", "interval": "1d"},
+    )
+    assert r.status_code == 422
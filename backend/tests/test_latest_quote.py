@@ -0,0 +1,44 @@
+from datetime import date
+
+from models import HistoricalQuote, Instrument, LatestQuote, Position
+from services import MarketDataService, PortfolioService
+from tests.conftest import TestingSessionLocal, make_bars
+
+
+def test_snapshot_tracks_newest_bar_only():
+    db = TestingSessionLocal()
+    market = MarketDataService(db)
+    instrument = market.get_or_create_instrument("SNAP1")
+
+    market._store_quotes(instrument.id, make_bars(date(2024, 5, 10), 20.0))
+    market._store_quotes(instrument.id, make_bars(date(2024, 5, 1), 10.0))  # backfill
+    db.commit()
+
+    snapshot = db.get(LatestQuote, instrument.id)
+    assert (snapshot.date, snapshot.close) == (date(2024, 5, 10), 20.0)
+
+
+def test_portfolio_summary_uses_snapshot_and_legacy_fallback():
+    db = TestingSessionLocal()
+    market = MarketDataService(db)
+    portfolio = PortfolioService(db).get_or_create_default_portfolio()
+
+    with_snapshot = market.get_or_create_instrument("SNAP2")
+    market._store_quotes(with_snapshot.id, make_bars(date(2024, 5, 10), 30.0))
+
+    # instrument z historią, ale bez snapshotu (dane sprzed zmiany)
+    legacy = Instrument(symbol="SNAP3")
+    db.add(legacy)
+    db.flush()
+    db.add(HistoricalQuote(instrument_id=legacy.id, date=date(2024, 1, 1), close=5.0))
+    db.add(HistoricalQuote(instrument_id=legacy.id, date=date(2024, 1, 2), close=7.0))
+
+    db.add(Position(portfolio_id=portfolio.id, instrument_id=with_snapshot.id, quantity=2, avg_open_price=1))
+    db.add(Position(portfolio_id=portfolio.id, instrument_id=legacy.id, quantity=3, avg_open_price=1))
+    db.commit()
+
+    summary = PortfolioService(db).get_portfolio_summary(portfolio.id)
+    prices = {p["instrument"]: p["current_price"] for p in summary["positions"]}
+
+    assert prices["SNAP2"] == 30.0
+    assert prices["SNAP3"] == 7.0
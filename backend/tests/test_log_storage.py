@@ -0,0 +1,100 @@
+from datetime import date, datetime
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from log_storage import LogStorage, add_months
+from models import LogEntry, log_text_match
+from tests.conftest import TestingSessionLocal
+
+
+def _add(db, source, *timestamps):
+    db.add_all(
+        LogEntry(timestamp=ts, level="INFO", source=source, message=str(ts))
+        for ts in timestamps
+    )
+    db.commit()
+
+
+def _timestamps(db, source):
+    return sorted(
+        e.timestamp for e in db.query(LogEntry).filter(LogEntry.source == source)
+    )
+
+
+def test_add_months_wraps_years():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+
+
+def test_postgres_table_is_partitioned_by_timestamp():
+    ddl = str(CreateTable(LogEntry.__table__).compile(dialect=postgresql.dialect()))
+
+    assert "PRIMARY KEY (id, timestamp)" in ddl
+    assert "PARTITION BY RANGE (timestamp)" in ddl
+
+
+def test_retention_removes_whole_expired_months():
+    db = TestingSessionLocal()
+    _add(
+        db,
+        "RETENTION",
+        datetime(2023, 12, 31, 23, 59),
+        datetime(2024, 1, 15),
+        datetime(2024, 2, 1),
+        datetime(2024, 4, 10),
+    )
+    storage = LogStorage(db)
+    storage.DELETE_CHUNK_SIZE = 1  # kilka paczek DELETE
+
+    expired = storage.apply_retention(months=2, today=date(2024, 4, 20))
+
+    assert expired == [date(2023, 12, 1), date(2024, 1, 1)]
+    assert _timestamps(db, "RETENTION") == [datetime(2024, 2, 1), datetime(2024, 4, 10)]
+    db.close()
+
+
+def test_clear_only_touches_given_range():
+    db = TestingSessionLocal()
+    _add(db, "CLEAR_RANGE", datetime(2024, 5, 1), datetime(2024, 5, 10), datetime(2024, 5, 20))
+
+    result = LogStorage(db).clear(
+        date_from=datetime(2024, 5, 5), date_to=datetime(2024, 5, 10)
+    )
+
+    assert result["deleted"] == 1
+    assert _timestamps(db, "CLEAR_RANGE") == [datetime(2024, 5, 1), datetime(2024, 5, 20)]
+    db.close()
+
+
+def test_clear_logs_endpoint_accepts_range(client):
+    response = client.delete(
+        "/api/logs",
+        params={"date_from": "2001-01-01T00:00:00", "date_to": "2001-01-31T00:00:00"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["deleted"] == 0
+
+
+def test_search_index_is_created_for_existing_logs_table():
+    db = TestingSessionLocal()
+    # baza sprzed indeksu – tabela logs bez logs_fts i triggerów
+    for statement in (
+        "DROP TRIGGER logs_fts_ai",
+        "DROP TRIGGER logs_fts_ad",
+        "DROP TRIGGER logs_fts_au",
+        "DROP TABLE logs_fts",
+    ):
+        db.execute(text(statement))
+    db.commit()
+    _add(db, "LS_FTS", datetime(2024, 6, 1, 12))
+    storage = LogStorage(db)
+
+    assert storage.ensure_search_index() is True
+    assert storage.ensure_search_index() is False
+
+    matches = db.scalars(select(LogEntry.source).where(log_text_match("2024-06-01"))).all()
+    assert matches == ["LS_FTS"]
+    db.close()
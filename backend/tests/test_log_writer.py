@@ -0,0 +1,93 @@
+import threading
+import time
+
+from log_writer import LogWriter, log_record
+from models import LogEntry
+from tests.conftest import TestingSessionLocal
+
+
+def _messages(source):
+    db = TestingSessionLocal()
+    try:
+        return [
+            e.message
+            for e in db.query(LogEntry).filter(LogEntry.source == source).order_by(LogEntry.id)
+        ]
+    finally:
+        db.close()
+
+
+def test_entries_are_written_in_batches_on_flush():
+    writer = LogWriter(TestingSessionLocal, batch_size=50, flush_interval=60)
+    for i in range(120):
+        writer.submit(log_record(message=f"wpis {i}", source="LW_BATCH"))
+
+    # dwie pełne paczki poszły same, reszta czeka na flush
+    assert writer.flush()
+    assert _messages("LW_BATCH") == [f"wpis {i}" for i in range(120)]
+    writer.close()
+
+
+def test_close_writes_pending_entries():
+    writer = LogWriter(TestingSessionLocal, batch_size=100, flush_interval=60)
+    writer.submit(log_record(message="przed zamknięciem", source="LW_CLOSE"))
+    writer.close()
+
+    assert _messages("LW_CLOSE") == ["przed zamknięciem"]
+
+
+def test_full_queue_drops_entries_and_reports_them():
+    release = threading.Event()
+
+    def slow_session():
+        release.wait(5)
+        return TestingSessionLocal()
+
+    writer = LogWriter(slow_session, batch_size=1, max_queue=1, policy="drop")
+    results = [writer.submit(log_record(message="pierwszy", source="LW_DROP"))]
+    # writer wisi na zapisie pierwszego wpisu – drugi zajmuje kolejkę
+    while writer._queue.qsize():
+        time.sleep(0.01)
+    results.append(writer.submit(log_record(message="drugi", source="LW_DROP")))
+    results.append(writer.submit(log_record(message="trzeci", source="LW_DROP")))
+
+    assert results == [True, True, False]
+    release.set()
+    writer.close()
+
+    db = TestingSessionLocal()
+    warning = db.query(LogEntry).filter(LogEntry.source == "LOG_WRITER").one()
+    db.close()
+    assert _messages("LW_DROP") == ["pierwszy", "drugi"]
+    assert "Pominięto 1" in warning.message
+
+
+def test_failed_batch_is_counted_as_dropped(caplog):
+    sessions = []
+
+    def flaky_session():
+        db = TestingSessionLocal()
+        if not sessions:
+            def fail(*args, **kwargs):
+                raise RuntimeError("baza niedostępna")
+            db.execute = fail
+        sessions.append(db)
+        return db
+
+    writer = LogWriter(flaky_session, batch_size=100, flush_interval=60)
+    writer.submit(log_record(message="stracony 1", source="LW_FAIL"))
+    writer.submit(log_record(message="stracony 2", source="LW_FAIL"))
+    assert writer.flush()
+    assert "nie zapisano 2 wpisów" in caplog.text
+
+    writer.submit(log_record(message="zapisany", source="LW_FAIL"))
+    writer.close()
+
+    db = TestingSessionLocal()
+    warnings = [
+        e.message
+        for e in db.query(LogEntry).filter(LogEntry.source == "LOG_WRITER").order_by(LogEntry.id)
+    ]
+    db.close()
+    assert _messages("LW_FAIL") == ["zapisany"]
+    assert any(message.startswith("Pominięto 2 ") for message in warnings)
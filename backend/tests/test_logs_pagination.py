@@ -0,0 +1,59 @@
+from log_writer import log_record, log_writer
+
+
+def _add_logs(source, count):
+    for i in range(count):
+        log_writer.submit(log_record(message=f"{source} {i}", source=source))
+    log_writer.flush()
+
+
+def test_keyset_pages_cover_all_entries_once(client):
+    _add_logs("PAGINATION", 7)
+
+    messages = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"source": "PAGINATION", "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/logs", params=params)
+        assert response.status_code == 200
+        messages += [log["message"] for log in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == 3
+    # od najnowszych, bez powtórzeń i dziur
+    assert messages == [f"PAGINATION {i}" for i in reversed(range(7))]
+
+
+def test_cursor_header_is_exposed_to_other_origins(client):
+    _add_logs("PAGINATION_CORS", 2)
+
+    response = client.get(
+        "/api/logs",
+        params={"source": "PAGINATION_CORS", "limit": 1},
+        headers={"Origin": "http://localhost:5173"},
+    )
+
+    assert response.headers.get("X-Next-Cursor")
+    assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/logs", params={"cursor": "???"})
+    assert response.status_code == 400
+
+
+def test_export_streams_all_matching_rows(client):
+    _add_logs("EXPORT_STREAM", 5)
+
+    response = client.get("/api/logs/export", params={"source": "EXPORT_STREAM"})
+
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "id,timestamp,level,source,message,user_email"
+    assert len(lines) == 6
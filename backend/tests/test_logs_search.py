@@ -0,0 +1,42 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from log_writer import log_record, log_writer
+from models import LogEntry, log_text_match
+
+
+def test_search_matches_message_and_details(client):
+    log_writer.submit(log_record(message="Pobrano historię ZZSRCH od 2024", source="SEARCH"))
+    log_writer.submit(log_record(
+        message="Błąd hooka ingestu", details="timeout dla ZZSRCH", source="SEARCH"
+    ))
+    log_writer.submit(log_record(message="Pobrano historię QQSRCH", source="SEARCH"))
+
+    response = client.get("/api/logs", params={"search": "zzsrch"})
+    assert response.status_code == 200
+    assert sorted(log["message"] for log in response.json()) == [
+        "Błąd hooka ingestu",
+        "Pobrano historię ZZSRCH od 2024",
+    ]
+
+    # wszystkie słowa muszą wystąpić; znaki specjalne nie psują zapytania
+    response = client.get("/api/logs", params={"search": 'pobrano "QQSRCH'})
+    assert [log["message"] for log in response.json()] == ["Pobrano historię QQSRCH"]
+
+
+def test_search_applies_to_export(client):
+    log_writer.submit(log_record(message="Eksport XXEXPSRCH", source="SEARCH"))
+
+    response = client.get("/api/logs/export", params={"search": "XXEXPSRCH"})
+
+    lines = response.text.strip().splitlines()
+    assert len(lines) == 2
+    assert "XXEXPSRCH" in lines[1]
+
+
+def test_postgres_search_uses_indexed_expression():
+    stmt = select(LogEntry.id).where(log_text_match("AAPL"))
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert "to_tsvector('simple', coalesce(message, '') || ' ' || coalesce(details, ''))" in sql
+    assert "plainto_tsquery('simple'" in sql
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from log_writer import log_record, log_writer
+
+
+def _submit(timestamp, level, source):
+    record = log_record(message="stat", level=level, source=source)
+    record["timestamp"] = timestamp
+    log_writer.submit(record)
+
+
+def test_stats_are_counted_per_hour_level_and_source(client):
+    _submit(datetime(2019, 3, 1, 10, 5), "INFO", "UC1_CURRENT")
+    _submit(datetime(2019, 3, 1, 10, 55), "INFO", "UC1_CURRENT")
+    _submit(datetime(2019, 3, 1, 10, 30), "ERROR", None)
+    log_writer.flush()
+    # druga paczka dolicza się do tych samych liczników
+    _submit(datetime(2019, 3, 1, 11, 0), "INFO", "UC1_CURRENT")
+    _submit(datetime(2019, 3, 1, 10, 1), "INFO", "UC1_CURRENT")
+
+    params = {"date_from": "2019-03-01T00:00:00", "date_to": "2019-03-01T23:59:59"}
+    response = client.get("/api/logs/stats", params=params)
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"bucket": "2019-03-01T10:00:00", "level": "ERROR", "source": None, "count": 1},
+        {"bucket": "2019-03-01T10:00:00", "level": "INFO", "source": "UC1_CURRENT", "count": 3},
+        {"bucket": "2019-03-01T11:00:00", "level": "INFO", "source": "UC1_CURRENT", "count": 1},
+    ]
+
+    daily = client.get("/api/logs/stats", params={**params, "bucket": "day", "level": "INFO"})
+    assert daily.json() == [
+        {"bucket": "2019-03-01T00:00:00", "level": "INFO", "source": "UC1_CURRENT", "count": 4},
+    ]
+
+
+def test_clearing_a_range_clears_its_stats(client):
+    _submit(datetime(2019, 4, 2, 8, 0), "INFO", "STATS_CLEAR")
+    log_writer.flush()
+
+    client.delete(
+        "/api/logs",
+        params={"date_from": "2019-04-01T00:00:00", "date_to": "2019-04-30T00:00:00"},
+    )
+
+    response = client.get("/api/logs/stats", params={"source": "STATS_CLEAR"})
+    assert response.json() == []
@@ -0,0 +1,86 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from quote_series import QuoteSeries
+
+
+def _frame():
+    index = pd.DatetimeIndex(
+        ["2024-01-02 09:30", "2024-01-02 15:59", "2024-01-03 09:30"],
+        tz="America/New_York",
+        name="Datetime",
+    )
+    return pd.DataFrame(
+        {
+            "Open": [1.0, np.nan, 3.0],
+            "High": [1.5, 2.5, 3.5],
+            "Low": [0.5, 1.5, np.nan],
+            "Close": [1.2, 2.2, 3.2],
+            "Volume": [100, 200, 300],
+        },
+        index=index,
+    )
+
+
+def test_from_frame_converts_nan_to_none():
+    series = QuoteSeries.from_frame(_frame())
+
+    assert series.dates.dtype == np.dtype("datetime64[D]")
+    records = series.to_records()
+    assert records[0] == {
+        "date": date(2024, 1, 2),
+        "open": 1.0,
+        "high": 1.5,
+        "low": 0.5,
+        "close": 1.2,
+        "volume": 100.0,
+    }
+    assert records[1]["open"] is None
+    assert records[2]["low"] is None
+
+
+def test_rows_without_close_are_dropped():
+    df = _frame()
+    df.loc[df.index[1], "Close"] = np.nan
+
+    assert len(QuoteSeries.from_frame(df)) == 2
+
+
+def test_deduplicated_keeps_last_bar_per_day():
+    series = QuoteSeries.from_frame(_frame()).deduplicated()
+
+    assert series.dates.tolist() == [date(2024, 1, 2), date(2024, 1, 3)]
+    assert series.close.tolist() == [2.2, 3.2]
+
+
+def test_binary_roundtrip_keeps_values_and_gaps():
+    series = QuoteSeries.from_frame(_frame())
+
+    for compress in (True, False):
+        decoded = QuoteSeries.from_bytes(series.to_bytes(compress=compress))
+        assert decoded.to_records() == series.to_records()
+
+
+def test_binary_encoding_is_smaller_than_json():
+    import json
+
+    n = 5000
+    series = QuoteSeries(
+        dates=np.arange(n).astype("datetime64[D]"),
+        **{f: np.round(np.linspace(100, 200, n), 2) for f in ("open", "high", "low", "close", "volume")},
+    )
+    as_json = json.dumps(
+        [{**r, "date": str(r["date"])} for r in series.to_records()]
+    ).encode()
+
+    assert len(series.to_bytes()) * 3 < len(as_json)
+
+
+def test_intraday_frame_keeps_utc_timestamps():
+    series = QuoteSeries.from_frame(_frame(), intraday=True)
+
+    assert series.dates.dtype == np.dtype("datetime64[s]")
+    assert series.dates[0] == np.datetime64("2024-01-02T14:30:00")
+    assert len(series.deduplicated()) == 3
@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from services import MarketDataService
+from tests.conftest import TestingSessionLocal, make_bars
+
+
+def test_overlapping_ranges_share_one_cached_series(monkeypatch):
+    db = TestingSessionLocal()
+    service = MarketDataService(db)
+    instrument = service.get_or_create_instrument("SLICE1")
+    service._store_quotes(instrument.id, make_bars(date(2019, 1, 1), range(30)))
+    db.commit()
+
+    loads = []
+    original = MarketDataService._load_series
+
+    def counting_load(self, instrument_id):
+        loads.append(instrument_id)
+        return original(self, instrument_id)
+
+    monkeypatch.setattr(MarketDataService, "_load_series", counting_load)
+
+    first = service.get_history_from_db("SLICE1", date(2019, 1, 1), date(2019, 1, 10))
+    second = service.get_history_from_db("SLICE1", date(2019, 1, 5), date(2019, 1, 20))
+    latest = service.get_latest_quote("SLICE1")
+
+    assert [q["close"] for q in first] == [float(i) for i in range(10)]
+    assert [q["date"] for q in second] == [date(2019, 1, 5) + timedelta(days=i) for i in range(16)]
+    assert (latest.date, latest.close) == (date(2019, 1, 30), 29.0)
+    assert loads == [instrument.id]
+
+
+def test_slice_bounds_are_inclusive():
+    series = make_bars(date(2020, 2, 1), range(5))
+
+    assert len(series.slice(date(2020, 2, 2), date(2020, 2, 4))) == 3
+    assert len(series.slice(end=date(2020, 1, 31))) == 0
+    assert len(series.slice()) == 5
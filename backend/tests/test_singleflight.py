@@ -0,0 +1,86 @@
+import threading
+import time
+from datetime import date
+
+import simple_yahoo_api
+from services import MarketDataService
+from singleflight import SingleFlight
+from tests.conftest import TestingSessionLocal, make_bars
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("key", slow)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [1]
+    assert results == ["value"] * 5
+    # klucz zwolniony – kolejne wywołanie wykonuje funkcję od nowa
+    assert flights.do("key", lambda: "next") == "next"
+
+
+def test_error_is_shared_and_key_released():
+    flights = SingleFlight()
+
+    def broken():
+        raise RuntimeError("upstream error")
+
+    try:
+        flights.do("key", broken)
+    except RuntimeError as e:
+        assert str(e) == "upstream error"
+    assert flights.do("key", lambda: 42) == 42
+
+
+def test_concurrent_history_requests_fetch_upstream_once(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def fake_history(symbol, start=None, end=None, interval="1d", **kwargs):
+        calls.append((start, end))
+        release.wait(5)
+        return make_bars(date(2021, 3, 1), 7.0)
+
+    monkeypatch.setattr(simple_yahoo_api, "get_history_columns", fake_history)
+    # instrument zakładamy wcześniej, żeby wątki nie ścigały się o insert
+    MarketDataService(TestingSessionLocal()).get_or_create_instrument("SFLIGHT")
+
+    results = []
+
+    def request():
+        db = TestingSessionLocal()
+        try:
+            quotes = MarketDataService(db).fetch_and_store_history(
+                "SFLIGHT", start=date(2021, 3, 1), end=date(2021, 3, 5)
+            )
+            results.append([q.close for q in quotes])
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert results == [[7.0]] * 4
@@ -0,0 +1,83 @@
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import simple_yahoo_api
+from services import MarketDataService
+from tests.conftest import TestingSessionLocal, make_bars
+from tsstore import TimeSeriesStore, configure_time_series_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TimeSeriesStore(str(tmp_path))
+    configure_time_series_store(store)
+    yield store
+    configure_time_series_store(None)
+
+
+def test_merge_appends_and_overwrites_tail_in_place(store):
+    store.replace("TSAPP", make_bars(date(2020, 1, 1), range(10)), generation=1)
+
+    # poprawka ostatnich 3 dni + 2 nowe dni – bez przepisywania całości
+    assert store.merge("TSAPP", make_bars(date(2020, 1, 8), range(100, 105)), generation=2, base_generation=1)
+
+    series = store.read("TSAPP", generation=2)
+    assert isinstance(series.close, np.memmap)
+    assert len(series) == 12
+    assert series.close.tolist() == [float(i) for i in range(7)] + [100.0 + i for i in range(5)]
+    assert os.listdir(os.path.join(store.root, "TSAPP")).count("g0") == 1
+
+
+def test_backfill_rewrites_columns_into_new_directory(store):
+    store.replace("TSBACK", make_bars(date(2020, 2, 1), range(5)), generation=1)
+    before = store.read("TSBACK")
+
+    assert store.merge("TSBACK", make_bars(date(2020, 1, 25), range(50, 53)), generation=2, base_generation=1)
+
+    series = store.read("TSBACK")
+    assert series.dates[0] == np.datetime64("2020-01-25")
+    assert len(series) == 8
+    assert sorted(d for d in os.listdir(os.path.join(store.root, "TSBACK")) if d.startswith("g")) == ["g1"]
+    # stary odczyt działa dalej na swoich mapowaniach
+    assert before.close.tolist() == [float(i) for i in range(5)]
+
+
+def test_entry_from_other_generation_is_not_returned(store):
+    store.replace("TSGEN", make_bars(date(2020, 1, 1), range(3)), generation=4)
+
+    assert store.read("TSGEN", generation=5) is None
+    assert not store.merge("TSGEN", make_bars(date(2020, 1, 4), 0.0), generation=6, base_generation=5)
+    assert store.read("TSMISSING") is None
+
+
+def test_history_reads_come_from_store_after_first_load(store, monkeypatch):
+    monkeypatch.setattr(
+        simple_yahoo_api,
+        "get_history_columns",
+        lambda symbol, start=None, end=None, interval="1d", **kwargs: make_bars(
+            start, range((end - start).days)
+        ),
+    )
+    loads = []
+    original = MarketDataService._load_series
+
+    def counting_load(self, instrument_id):
+        loads.append(instrument_id)
+        return original(self, instrument_id)
+
+    monkeypatch.setattr(MarketDataService, "_load_series", counting_load)
+
+    service = MarketDataService(TestingSessionLocal())
+    service.fetch_and_store_history("TSSVC", start=date(2021, 3, 1), end=date(2021, 3, 10))
+    assert len(service.get_history_from_db("TSSVC")) == 10
+    assert len(loads) == 1
+
+    # kolejny ingest trafia do magazynu – bez ponownego czytania z bazy
+    service.fetch_and_store_history("TSSVC", start=date(2021, 3, 1), end=date(2021, 3, 15))
+    quotes = service.get_history_from_db("TSSVC", start=date(2021, 3, 9))
+    assert [q["date"] for q in quotes] == [date(2021, 3, 9) + timedelta(days=i) for i in range(7)]
+    assert service.get_latest_quote("TSSVC").date == date(2021, 3, 15)
+    assert len(loads) == 1
@@ -0,0 +1,239 @@
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from quote_series import FIELDS, QuoteSeries
+
+try:
+    import fcntl
+except ImportError:  # Windows – wystarcza lock w obrębie procesu
+    fcntl = None
+
+# Katalog lokalnego magazynu szeregów – pusty TS_STORE_DIR wyłącza magazyn.
+# Musi być wspólny dla wszystkich workerów na hoście (zapis idzie przy ingeście).
+TS_STORE_DIR = os.getenv("TS_STORE_DIR", "")
+
+# kolumny na dysku: surowe tablice little-endian, jedna świeca = jeden element
+COLUMNS = (("dates", np.dtype("<M8[D]")),) + tuple(
+    (field, np.dtype("<f8")) for field in FIELDS
+)
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+
+
+class TimeSeriesStore:
+    """
+    Lokalny magazyn dziennych szeregów OHLCV: dla każdego symbolu katalog
+    z plikami kolumn (daty + float64), czytanymi przez np.memmap – odczyt
+    całej historii to mapowanie stron z page cache, bez zapytania do bazy.
+
+    Układ: <root>/<symbol>/index.json + g<n>/<kolumna>.col (n rośnie przy
+    przepisaniu całości). index.json (liczba świec, pierwsza/ostatnia data,
+    bieżący katalog g<n>, generacja) jest
+    podmieniany atomowo po zapisie danych, więc czytelnik mapuje tylko
+    `count` elementów i nigdy nie widzi niedopisanego ogona.
+
+    Zapisy:
+      - nowe świece za ostatnią datą są dopisywane na końcu plików,
+      - poprawki ogona (hot tail) nadpisują go w miejscu, o ile daty się
+        nie przesuwają,
+      - pozostałe przypadki (backfill starszej historii, daty wstawione
+        w środek) zapisują komplet kolumn do nowego katalogu g<n+1>;
+        czytelnicy starych plików trzymają swoje mapowania.
+
+    `generation` w indeksie to generacja symbolu z cache (bump_generation
+    przy każdym ingeście) – wpis z inną generacją jest nieaktualny i nie
+    jest zwracany. Magazyn jest tylko kopią bazy: katalog można w każdej
+    chwili usunąć, zostanie odbudowany przy odczytach.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        # symbol -> (tożsamość pliku index.json, indeks, zmapowany szereg)
+        self._views: Dict[str, Tuple[Tuple[int, int], Dict, QuoteSeries]] = {}
+
+    # --- odczyt ---
+
+    def read(self, symbol: str, generation: Optional[int] = None) -> Optional[QuoteSeries]:
+        """
+        Szereg symbolu jako widoki na zmapowane pliki albo None, gdy symbolu
+        nie ma w magazynie (lub zapisano go w innej generacji niż `generation`).
+        """
+        directory = self._symbol_dir(symbol)
+        for _ in range(3):
+            try:
+                return self._read(symbol, directory, generation)
+            except FileNotFoundError:
+                # równoległy zapis podmienił generację plików – czytamy od nowa
+                continue
+        return None
+
+    def _read(self, symbol: str, directory: str, generation: Optional[int]) -> Optional[QuoteSeries]:
+        index_path = os.path.join(directory, INDEX_FILE)
+        try:
+            stat = os.stat(index_path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+
+        cached = self._views.get(symbol)
+        if cached is not None and cached[0] == identity:
+            _, index, series = cached
+        else:
+            index = self._read_index(index_path)
+            series = self._map(directory, index)
+            self._views[symbol] = (identity, index, series)
+
+        if generation is not None and index.get("generation") != generation:
+            return None
+        return series
+
+    @staticmethod
+    def _read_index(path: str) -> Dict:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _map(directory: str, index: Dict) -> QuoteSeries:
+        count = index["count"]
+        if not count:
+            return QuoteSeries.empty()
+        data_dir = os.path.join(directory, f"g{index['data']}")
+        columns = {
+            name: np.memmap(
+                os.path.join(data_dir, f"{name}.col"), dtype=dtype, mode="r", shape=(count,)
+            )
+            for name, dtype in COLUMNS
+        }
+        return QuoteSeries(**columns)
+
+    # --- zapis ---
+
+    def replace(self, symbol: str, series: QuoteSeries, generation: int) -> None:
+        """Zapisuje cały szereg symbolu (np. wczytany z bazy) jako generację `generation`."""
+        series = series.deduplicated()
+        with self._locked(symbol) as directory:
+            index = self._current_index(directory)
+            self._rewrite(directory, index, series, generation)
+
+    def merge(
+        self,
+        symbol: str,
+        series: QuoteSeries,
+        generation: int,
+        base_generation: int,
+    ) -> bool:
+        """
+        Dokłada świece z ingestu (nowe wartości wygrywają). Działa tylko, gdy
+        magazyn ma symbol w generacji `base_generation` – inaczej wpis zostaje
+        nieaktualny i odczyt przeładuje go z bazy. True = zapisano.
+        """
+        series = series.deduplicated()
+        with self._locked(symbol) as directory:
+            index = self._current_index(directory)
+            if index is None or index.get("generation") != base_generation:
+                return False
+            if not len(series):
+                self._write_index(directory, {**index, "generation": generation})
+                return True
+
+            current = self._map(directory, index)
+            count = len(current)
+            pos = int(np.searchsorted(current.dates, series.dates[0], side="left"))
+            tail = QuoteSeries.concat([current.slice(start=series.dates[0]), series]).deduplicated()
+
+            # daty obecnego ogona zostają na miejscach -> zapis w miejscu + dopisanie
+            if np.array_equal(tail.dates[:count - pos], current.dates[pos:]):
+                self._write_at(directory, index["data"], pos, tail)
+                self._write_index(directory, {
+                    **index,
+                    "count": pos + len(tail),
+                    "first": str(current.dates[0] if pos else tail.dates[0]),
+                    "last": str(tail.dates[-1]),
+                    "generation": generation,
+                })
+                return True
+
+            head = current.slice(end=current.dates[pos - 1]) if pos else QuoteSeries.empty()
+            self._rewrite(directory, index, QuoteSeries.concat([head, tail]), generation)
+            return True
+
+    def _rewrite(self, directory: str, index: Optional[Dict], series: QuoteSeries, generation: int) -> None:
+        data = index["data"] + 1 if index is not None else 0
+        data_dir = os.path.join(directory, f"g{data}")
+        shutil.rmtree(data_dir, ignore_errors=True)  # pozostałość przerwanego zapisu
+        os.makedirs(data_dir)
+        self._write_at(directory, data, 0, series)
+        self._write_index(directory, {
+            "count": len(series),
+            "first": str(series.dates[0]) if len(series) else None,
+            "last": str(series.dates[-1]) if len(series) else None,
+            "data": data,
+            "generation": generation,
+        })
+        if index is not None:
+            # otwarte mapowania starych plików działają dalej (unlink)
+            shutil.rmtree(os.path.join(directory, f"g{index['data']}"), ignore_errors=True)
+
+    @staticmethod
+    def _write_at(directory: str, data: int, pos: int, series: QuoteSeries) -> None:
+        data_dir = os.path.join(directory, f"g{data}")
+        for name, dtype in COLUMNS:
+            path = os.path.join(data_dir, f"{name}.col")
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(pos * dtype.itemsize)
+                f.write(np.ascontiguousarray(getattr(series, name), dtype=dtype).tobytes())
+
+    @staticmethod
+    def _write_index(directory: str, index: Dict) -> None:
+        path = os.path.join(directory, INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, path)
+
+    def _current_index(self, directory: str) -> Optional[Dict]:
+        path = os.path.join(directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        return self._read_index(path)
+
+    def _symbol_dir(self, symbol: str) -> str:
+        # symbole typu ^GSPC albo EURUSD=X – kodujemy, żeby nazwa była bezpieczna
+        return os.path.join(self.root, quote(symbol, safe=""))
+
+    @contextmanager
+    def _locked(self, symbol: str):
+        """Lock zapisu symbolu: w procesie i (flock) między workerami."""
+        directory = self._symbol_dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            with open(os.path.join(directory, LOCK_FILE), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield directory
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_store: Optional[TimeSeriesStore] = TimeSeriesStore(TS_STORE_DIR) if TS_STORE_DIR else None
+
+
+def configure_time_series_store(store: Optional[TimeSeriesStore]) -> None:
+    """Włącza/podmienia magazyn (None = wyłączony, np. w testach)."""
+    global _store
+    _store = store
+
+
+def get_time_series_store() -> Optional[TimeSeriesStore]:
+    return _store
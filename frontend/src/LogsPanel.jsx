@@ -6,12 +6,26 @@ export default function LogsPanel() {
   const [logs, setLogs] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  // kolejna strona: kursor z nagłówka X-Next-Cursor + filtry, z którymi ją pobrano
+  const [nextCursor, setNextCursor] = useState(null);
+  const [lastQuery, setLastQuery] = useState("");
 
   const [level, setLevel] = useState("");
   const [source, setSource] = useState("");
   const [dateFrom, setDateFrom] = useState("");
   const [dateTo, setDateTo] = useState("");
 
+  const fetchPage = async (query, cursor) => {
+    const params = new URLSearchParams(query);
+    if (cursor) params.append("cursor", cursor);
+
+    const res = await fetch(`${BACKEND_URL}/api/logs?${params.toString()}`);
+    if (!res.ok) throw new Error("Błąd pobierania logów");
+    const data = await res.json();
+    setNextCursor(res.headers.get("X-Next-Cursor"));
+    return data;
+  };
+
   const fetchLogs = async () => {
     setLoading(true);
     setError("");
@@ -22,14 +36,29 @@ export default function LogsPanel() {
       if (dateFrom) params.append("date_from", new Date(dateFrom).toISOString());
       if (dateTo) params.append("date_to", new Date(dateTo).toISOString());
 
-      const res = await fetch(`${BACKEND_URL}/api/logs?${params.toString()}`);
-      if (!res.ok) throw new Error("Błąd pobierania logów");
-      const data = await res.json();
-      setLogs(data);
+      const query = params.toString();
+      setLastQuery(query);
+      setLogs(await fetchPage(query, null));
     } catch (e) {
       console.error(e);
       setError(e.message || "Błąd pobierania logów");
       setLogs([]);
+      setNextCursor(null);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const fetchMoreLogs = async () => {
+    if (!nextCursor) return;
+    setLoading(true);
+    setError("");
+    try {
+      const data = await fetchPage(lastQuery, nextCursor);
+      setLogs((current) => [...current, ...data]);
+    } catch (e) {
+      console.error(e);
+      setError(e.message || "Błąd pobierania logów");
     } finally {
       setLoading(false);
     }
@@ -260,6 +289,23 @@ export default function LogsPanel() {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <button
+              onClick={fetchMoreLogs}
+              disabled={loading}
+              style={{
+                margin: "8px 0",
+                padding: "8px 16px",
+                borderRadius: 4,
+                border: "none",
+                background: "#111",
+                color: "white",
+                cursor: "pointer",
+              }}
+            >
+              {loading ? "Ładowanie..." : "Załaduj starsze logi"}
+            </button>
+          )}
         </div>
       )}
     </div>